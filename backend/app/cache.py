@@ -0,0 +1,146 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .models import SalesQuery
+
+CACHE_MAX_ENTRIES = int(os.getenv("SALES_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_BYTES = int(os.getenv("SALES_CACHE_MAX_BYTES", str(64 * 2**20)))
+# Supabase data can change underneath us; the CSV dataset only changes with a reload
+CACHE_TTL_SUPABASE = float(os.getenv("SALES_CACHE_TTL_SUPABASE", "30"))
+CACHE_TTL_CSV = float(os.getenv("SALES_CACHE_TTL_CSV", "300"))
+# Cache-Control of /api/sales and /api/meta responses; both carry ETags, so
+# revalidating a copy costs the client a 304 rather than the whole body
+SALES_CACHE_CONTROL = os.getenv("SALES_CACHE_CONTROL", "no-cache")
+META_CACHE_CONTROL = os.getenv("META_CACHE_CONTROL", "public, max-age=60")
+
+FILTER_FIELDS = (
+    "customer_name",
+    "phone",
+    "region",
+    "gender",
+    "age_min",
+    "age_max",
+    "product_category",
+    "tag",
+    "payment_method",
+    "date_from",
+    "date_to",
+)
+
+
+def query_key(params: SalesQuery, exclude: Iterable[str] = ()) -> str:
+    """
+    Canonical cache key for a query: list filters sorted and de-duplicated,
+    empty values dropped, so equivalent requests share one entry.
+    """
+    skipped = set(exclude)
+    canonical: Dict[str, Any] = {}
+    for field, value in params.model_dump().items():
+        if field in skipped or value is None or value == "":
+            continue
+        if isinstance(value, list):
+            value = sorted({item for item in value if item})
+            if not value:
+                continue
+        canonical[field] = value
+    return json.dumps(canonical, sort_keys=True, default=str)
+
+
+def filter_key(params: SalesQuery) -> str:
+    """Canonical key of the filters alone (no sort, paging or response options)."""
+    other = set(SalesQuery.model_fields) - set(FILTER_FIELDS)
+    return query_key(params, exclude=other)
+
+
+def estimate_size(value: Any) -> int:
+    """Rough resident size of a cached value, used for the byte budget."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if hasattr(value, "__dict__"):
+        return estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """Thread-safe LRU cache bounded by entry count and bytes, with a per-cache TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        ttl: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        # key -> (expires_at, size, value); most recently used last
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, size: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (expires_at, size, value)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
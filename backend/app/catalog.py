@@ -0,0 +1,296 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from . import repository_supabase
+from .data_loader import Engine, dataset_version, find_data_path, get_supabase_client, load_data_from_csv, load_engine, loaded_engine
+from .engine import FACETS
+from .metrics import count_fallback, flight_samples, registry
+from .repository_supabase import SUPABASE_META_TTL, get_catalog_from_supabase, get_metadata_from_supabase, get_ranges_from_supabase
+from .serialization import EncodedBody
+from .singleflight import SingleFlight
+from .snapshot import source_stamp
+from .supabase_async import SUPABASE_UNREACHABLE, supabase_breaker
+from .utils import distinct_tags, distinct_values
+
+# Bump when the catalog layout changes, so older files on disk are ignored
+CATALOG_VERSION = 1
+
+DEFAULT_META = {
+    "regions": ["Central", "East", "North", "South", "West"],
+    "genders": ["Female", "Male"],
+    "product_categories": ["Beauty", "Clothing", "Electronics"],
+    "tags": [
+        "accessories",
+        "beauty",
+        "casual",
+        "cotton",
+        "fashion",
+        "formal",
+        "fragrance-free",
+        "gadgets",
+        "makeup",
+        "organic",
+        "portable",
+        "skincare",
+        "smart",
+        "unisex",
+        "wireless",
+    ],
+    "payment_methods": ["Cash", "Credit Card", "Debit Card", "Net Banking", "UPI", "Wallet"],
+}
+
+# MetaResponse list -> facet (SalesQuery field) its counts are reported under
+META_FACETS = {
+    "regions": "region",
+    "genders": "gender",
+    "product_categories": "product_category",
+    "tags": "tag",
+    "payment_methods": "payment_method",
+}
+
+
+def catalog_disk_enabled() -> bool:
+    return os.getenv("META_CATALOG_DISK", "1").lower() not in {"0", "false", "no"}
+
+
+class Catalog:
+    """
+    Everything /api/meta serves for one version of the dataset, encoded once.
+
+    ``source`` identifies that version: the CSV's source stamp, or the
+    repository_supabase.table_version the Supabase catalog was read at.
+    """
+
+    def __init__(self, data: Dict[str, Any], backend: str, source: Any, built: float, engine_version: Optional[int] = None):
+        self.data = data
+        self.backend = backend
+        self.source = source
+        self.built = built
+        # Engine the catalog was computed from, if any
+        self.engine_version = engine_version
+        # Encoded once; compressed copies are added as clients ask for them
+        self.response = EncodedBody(orjson.dumps(data))
+
+    def stale(self) -> bool:
+        if self.backend == "supabase":
+            return self.source != repository_supabase.table_version or time.time() - self.built > SUPABASE_META_TTL
+        engine = loaded_engine()
+        return engine is not None and engine.version != self.engine_version and engine.source != self.source
+
+
+def _range(low: Any, high: Any) -> Optional[Dict[str, Any]]:
+    return None if low is None else {"min": low, "max": high}
+
+
+def _day(value: Any) -> Optional[str]:
+    return None if value is None else str(value)[:10]
+
+
+def _catalog_data(lists: Dict[str, List[str]], counts: Optional[Dict[str, Dict[str, int]]], summary: Dict[str, Any], version: str) -> Dict[str, Any]:
+    return {
+        **lists,
+        # Facet -> value -> rows, for the whole dataset; None when the backend can't count
+        "counts": counts,
+        "rows": summary.get("rows"),
+        "age": _range(summary.get("age_min"), summary.get("age_max")),
+        "date": _range(_day(summary.get("date_min")), _day(summary.get("date_max"))),
+        "version": version,
+    }
+
+
+def catalog_from_engine(engine: Engine) -> Catalog:
+    """The catalog of the local dataset, read off the engine's column statistics."""
+    counts = {
+        facet: dict(sorted(engine.value_stats[column].counts.items()))
+        for facet, column in FACETS.items()
+        if column in engine.value_stats
+    }
+    lists = {
+        "regions": engine.distinct_values("customer_region"),
+        "genders": engine.distinct_values("gender"),
+        "product_categories": engine.distinct_values("product_category"),
+        "tags": engine.tag_values(),
+        "payment_methods": engine.distinct_values("payment_method"),
+    }
+    summary: Dict[str, Any] = {"rows": engine.size}
+    for column, stats in engine.range_stats.items():
+        described = stats.describe()
+        summary[f"{column}_min"], summary[f"{column}_max"] = described["min"], described["max"]
+    data = _catalog_data(lists, counts, summary, f"csv:{dataset_version(engine)}")
+    return Catalog(data, "csv", engine.source, time.time(), engine.version)
+
+
+def _csv_distincts() -> Dict[str, List[str]]:
+    """Distinct values of the dataset CSV, if there is one, to widen the Supabase lists."""
+    engine = loaded_engine()
+    try:
+        if engine is not None and engine.size:
+            data = catalog_from_engine(engine).data
+            return {key: data[key] for key in META_FACETS}
+        df = load_data_from_csv()
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Metadata merge with CSV failed: {e}")
+        return {}
+    return {
+        "regions": distinct_values(df, "customer_region"),
+        "genders": distinct_values(df, "gender"),
+        "product_categories": distinct_values(df, "product_category"),
+        "tags": distinct_tags(df, "tags"),
+        "payment_methods": distinct_values(df, "payment_method"),
+    }
+
+
+def catalog_from_supabase() -> Catalog:
+    """
+    The catalog of the Supabase sales table. Value lists are merged with the
+    CSV's and DEFAULT_META, as /api/meta always has; counts and the row total
+    need exec_sql and are left out without it.
+    """
+    version = repository_supabase.table_version
+    try:
+        summary = get_catalog_from_supabase()
+        counts = {facet: dict(sorted(values.items())) for facet, values in summary.pop("counts").items()}
+        found = {key: list(counts.get(facet, {})) for key, facet in META_FACETS.items()}
+    except SUPABASE_UNREACHABLE:
+        # Not a missing exec_sql: the fallback reads would fail too, so build from the CSV
+        raise
+    except Exception as e:
+        print(f"Supabase catalog query failed, using distinct values only: {e}")
+        found = get_metadata_from_supabase()
+        counts = None
+        summary = get_ranges_from_supabase()
+
+    csv = _csv_distincts()
+    lists = {
+        key: sorted(set(found.get(key, [])) | set(csv.get(key, [])) | set(DEFAULT_META[key]))
+        for key in DEFAULT_META
+    }
+    built = time.time()
+    return Catalog(_catalog_data(lists, counts, summary, f"supabase:{built:.0f}"), "supabase", version, built)
+
+
+def _disk_path(backend: str) -> Optional[Path]:
+    if not catalog_disk_enabled():
+        return None
+    try:
+        csv_path = find_data_path()
+    except FileNotFoundError:
+        return None
+    return csv_path.with_name(f"{csv_path.name}.{backend}-catalog.json")
+
+
+def _write_disk(catalog: Catalog) -> None:
+    path = _disk_path(catalog.backend)
+    if path is None:
+        return
+    document = {"version": CATALOG_VERSION, "source": catalog.source, "built": catalog.built, "data": catalog.data}
+    staging = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        staging.write_bytes(orjson.dumps(document))
+        os.replace(staging, path)
+    except OSError as e:
+        print(f"Could not write metadata catalog to {path}: {e}")
+
+
+def _read_disk(backend: str) -> Optional[Catalog]:
+    """
+    The catalog saved by an earlier run. A CSV catalog is only used while the
+    CSV is unchanged; a Supabase one is served and refreshed straight away.
+    """
+    path = _disk_path(backend)
+    if path is None:
+        return None
+    try:
+        document = json.loads(path.read_text())
+        if document.get("version") != CATALOG_VERSION:
+            return None
+        if backend == "csv":
+            if document["source"] != source_stamp(find_data_path()):
+                return None
+            return Catalog(document["data"], backend, document["source"], document["built"])
+        # Table versions are per process; force a refresh
+        return Catalog(document["data"], backend, None, document["built"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+_catalog: Optional[Catalog] = None
+# Backends whose disk catalog has been looked for already
+_disk_checked: set = set()
+_builds = SingleFlight()
+_refreshing = threading.Lock()
+
+
+def _supabase_catalogs() -> bool:
+    # While Supabase's circuit is open the local catalog is built and served instead
+    return get_supabase_client() is not None and not supabase_breaker.is_open()
+
+
+def _build() -> Catalog:
+    global _catalog
+    catalog = None
+    if _supabase_catalogs():
+        try:
+            catalog = catalog_from_supabase()
+        except Exception as e:
+            print(f"Supabase catalog build failed, falling back to CSV: {e}")
+            count_fallback("meta")
+    if catalog is None:
+        catalog = catalog_from_engine(load_engine())
+    _catalog = catalog
+    _write_disk(catalog)
+    return catalog
+
+
+def build_catalog() -> Catalog:
+    """Build and publish the catalog for the active backend. Concurrent callers share one build."""
+    return _builds.do("catalog", _build)
+
+
+def _refresh() -> None:
+    try:
+        build_catalog()
+    except Exception as e:
+        print(f"Metadata catalog refresh failed: {e}")
+    finally:
+        _refreshing.release()
+
+
+def refresh_in_background() -> None:
+    """Rebuild the catalog on a background thread, unless a refresh is already running or nothing was built yet."""
+    if _catalog is None or not _refreshing.acquire(blocking=False):
+        return
+    threading.Thread(target=_refresh, name="meta-catalog", daemon=True).start()
+
+
+def current_catalog() -> Optional[Catalog]:
+    """
+    The catalog to answer /api/meta with right now, without blocking on a
+    build: the one in memory (or on disk, on first use), refreshed in the
+    background when stale. None when there is none yet.
+    """
+    global _catalog
+    backend = "supabase" if _supabase_catalogs() else "csv"
+    catalog = _catalog
+    if catalog is None or catalog.backend != backend:
+        if backend in _disk_checked:
+            return None
+        _disk_checked.add(backend)
+        catalog = _read_disk(backend)
+        if catalog is None:
+            return None
+        _catalog = catalog
+    if catalog.stale():
+        refresh_in_background()
+    return catalog
+
+
+registry.register_collector(lambda: flight_samples("meta_catalog", _builds.stats()))
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# Gauge value per state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of a dependency from the outcome of its calls.
+
+    closed: calls go through. Once at least ``min_calls`` calls finished in the
+    last ``window`` seconds and ``error_rate`` of them failed, the circuit opens.
+    open: calls are refused with CircuitOpenError for ``cooldown`` seconds.
+    half_open: up to ``probes`` calls go through; the circuit closes once that
+    many succeed and opens again on the first failure.
+
+    Callers bracket each call with ``before()`` and ``after()``; what counts as
+    a failure (errors, server errors, slow answers) is up to them. ``min_calls``
+    of 0 disables the breaker.
+    """
+
+    def __init__(self, window: float, min_calls: int, error_rate: float, cooldown: float, probes: int = 1):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.probes = max(probes, 1)
+        self.state = CLOSED
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {CLOSED: 0, HALF_OPEN: 0, OPEN: 0}
+        # (finished at, failed) of recent calls, oldest first
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """Whether calls would be refused right now. Unlike ``before()`` this claims no probe slot."""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.cooldown
+
+    def before(self) -> bool:
+        """
+        Admit a call, or raise CircuitOpenError. Returns whether the call is a
+        half-open probe, to be passed on to ``after()``.
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._move(HALF_OPEN)
+                self._probing = self._probe_successes = 0
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and self._probing < self.probes:
+                self._probing += 1
+                return True
+            self.rejected += 1
+        raise CircuitOpenError("Circuit open: recent calls failed")
+
+    def after(self, probe: bool, failed: bool) -> None:
+        """Record the outcome of a call admitted by ``before()``."""
+        if self.min_calls <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._probing -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed:
+                    self._open(now)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._calls.clear()
+                    self._failures = 0
+                    self._move(CLOSED)
+                return
+            # Calls admitted before the circuit opened don't decide anything any more
+            if self.state != CLOSED:
+                return
+            self._calls.append((now, failed))
+            self._failures += failed
+            while self._calls and now - self._calls[0][0] > self.window:
+                self._failures -= self._calls.popleft()[1]
+            if len(self._calls) >= self.min_calls and self._failures >= self.error_rate * len(self._calls):
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._opened_at = now
+        self._calls.clear()
+        self._failures = 0
+        self._move(OPEN)
+
+    def _move(self, state: str) -> None:
+        if state != self.state:
+            print(f"Circuit breaker {self.state} -> {state}")
+            self.state = state
+            self.transitions[state] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "rejected": self.rejected,
+                "transitions": dict(self.transitions),
+                "calls": len(self._calls),
+                "failures": self._failures,
+            }
@@ -1,10 +1,20 @@
 import os
+import sys
+import threading
 from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+
+from .engine import SalesEngine
+from .repository_sqlite import SQLITE_BUILD_ROWS, SqliteEngine
+from .metrics import cache_samples, flight_samples, registry
+from .singleflight import SingleFlight
+from .snapshot import read_snapshot, snapshot_dir, snapshot_enabled, source_stamp, write_snapshot
+from .supabase_async import SUPABASE_TIMEOUT, supabase_http_client
 
 # Expected column remapping to normalized snake_case names
 COLUMN_MAP: Dict[str, str] = {
@@ -38,16 +48,45 @@ COLUMN_MAP: Dict[str, str] = {
 }
 
 DATA_FILENAME = "truestate_assignment_dataset.csv"
+# Explicit dataset location; skips the search in find_data_path (benchmarks point this at generated data)
+DATA_PATH = os.getenv("DATA_PATH", "")
+DATE_FORMAT = "%Y-%m-%d"
+
+# Where sales queries run: "auto" (Supabase when SUPABASE_URL/KEY are set, else the
+# in-memory engine), "memory", "sqlite" (on-disk database built from the CSV) or "supabase"
+SALES_BACKEND = os.getenv("SALES_BACKEND", "auto").lower()
+
+# Compact in-memory schema, keyed by the normalized column names in COLUMN_MAP
+CATEGORY_COLUMNS = [
+    "customer_region",
+    "gender",
+    "product_category",
+    "payment_method",
+    "order_status",
+    "delivery_type",
+    "store_id",
+    "store_location",
+    "brand",
+]
+# Downcast to the smallest integer type that fits (float32 if values are fractional or missing)
+INTEGER_COLUMNS = ["quantity", "age", "discount_percentage"]
+FLOAT32_COLUMNS = ["price_per_unit", "total_amount", "final_amount"]
+STRING_COLUMNS = ["phone_number"]
 
 
 @lru_cache(maxsize=1)
 def get_supabase_client() -> Optional[Client]:
-    """Get Supabase client if credentials are available."""
+    """Get Supabase client if credentials are available and the Supabase backend is selected."""
+    if SALES_BACKEND not in {"auto", "supabase"}:
+        return None
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_KEY")
     
     if url and key:
-        return create_client(url, key)
+        # One client per process: its HTTP session is a shared keep-alive pool,
+        # with every call passing through the Supabase circuit breaker
+        options = ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT, httpx_client=supabase_http_client())
+        return create_client(url, key, options=options)
     return None
 
 
@@ -62,8 +101,66 @@ def _standardize_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df.rename(columns=rename_map)
 
 
-def load_data_from_csv() -> pd.DataFrame:
-    """Load data from CSV file (fallback method)."""
+def _csv_dtypes() -> Dict[str, str]:
+    """read_csv dtypes for the raw CSV headers, so strings never materialize as object columns."""
+    dtypes = {}
+    for raw, column in COLUMN_MAP.items():
+        if column in CATEGORY_COLUMNS:
+            dtypes[raw] = "category"
+        elif column in STRING_COLUMNS:
+            dtypes[raw] = "str"
+    return dtypes
+
+
+def _compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    for column in INTEGER_COLUMNS:
+        if column in df.columns:
+            series = pd.to_numeric(df[column], errors="coerce", downcast="integer")
+            if series.dtype.kind == "f":
+                series = series.astype("float32")
+            df[column] = series
+    for column in FLOAT32_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float32")
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and df[column].dtype != "category":
+            df[column] = df[column].astype("category")
+    return df
+
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    parsed = pd.to_datetime(series, format=DATE_FORMAT, errors="coerce")
+    if parsed.isna().sum() > series.isna().sum():
+        # Source does not follow DATE_FORMAT; fall back to per-value inference
+        parsed = pd.to_datetime(series, errors="coerce")
+    return parsed
+
+
+def _memory_report(df: pd.DataFrame) -> Tuple[int, int]:
+    """
+    Return (bytes used, bytes the same frame would take with object strings
+    and 64-bit numbers) so the loader can report what the compact schema saves.
+    """
+    used = int(df.memory_usage(deep=True, index=False).sum())
+    baseline = 0
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            value_sizes = np.array([sys.getsizeof(str(value)) for value in series.cat.categories], dtype=np.int64)
+            codes = series.cat.codes.to_numpy()
+            baseline += len(series) * 8 + int(value_sizes[codes[codes >= 0]].sum())
+        elif series.dtype.kind in "iuf":
+            baseline += len(series) * 8
+        else:
+            baseline += int(series.memory_usage(deep=True, index=False))
+    return used, baseline
+
+
+def find_data_path() -> Path:
+    """Locate the dataset CSV."""
+    if DATA_PATH:
+        return Path(DATA_PATH)
+
     # Try multiple locations for the dataset
     possible_paths = [
         Path(__file__).resolve().parents[2] / DATA_FILENAME,  # Original path (root)
@@ -86,41 +183,166 @@ def load_data_from_csv() -> pd.DataFrame:
         except Exception:
             pass
         raise FileNotFoundError(f"Dataset not found. Searched in: {[str(p) for p in possible_paths]}")
+    return data_path
 
-    df = pd.read_csv(data_path, low_memory=False)
+
+def read_csv_rows(source: Any) -> pd.DataFrame:
+    """Parse a dataset CSV (path or file object) into the normalized, compact-dtype frame."""
+    return _normalize_rows(pd.read_csv(source, dtype=_csv_dtypes(), low_memory=False))
+
+
+def iter_csv_chunks(source: Any, rows: int) -> Iterator[pd.DataFrame]:
+    """Like read_csv_rows, ``rows`` rows at a time, for CSVs too large to parse in one go."""
+    with pd.read_csv(source, dtype=_csv_dtypes(), low_memory=False, chunksize=rows) as reader:
+        for chunk in reader:
+            yield _normalize_rows(chunk.reset_index(drop=True))
+
+
+def _normalize_rows(df: pd.DataFrame) -> pd.DataFrame:
     df = _standardize_columns(df)
+    df = _compact_dtypes(df)
 
     if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        df["date"] = _parse_dates(df["date"])
     if "tags" in df.columns:
         df["tags"] = df["tags"].fillna("").astype(str)
     if "customer_name" in df.columns:
         df["customer_name"] = df["customer_name"].fillna("")
     if "phone_number" in df.columns:
         df["phone_number"] = df["phone_number"].fillna("")
+    return df
+
 
+def load_data_from_csv() -> pd.DataFrame:
+    """
+    Load data from CSV file (fallback method).
+
+    The normalized frame is cached as a binary snapshot next to the CSV and
+    memory-mapped on later starts, until the CSV's mtime or size changes. The
+    CSV stamp the frame corresponds to is kept in ``df.attrs["source"]``.
+    """
+    data_path = find_data_path()
+    # Taken before reading, so rows appended meanwhile are picked up by the next sync
+    stamp = source_stamp(data_path)
+
+    if snapshot_enabled():
+        snapshot = read_snapshot(data_path, stamp)
+        if snapshot is not None:
+            print(f"Loaded {len(snapshot)} rows from snapshot {snapshot_dir(data_path)}")
+            snapshot.attrs["source"] = stamp
+            return snapshot
+
+    df = read_csv_rows(data_path)
+
+    used, baseline = _memory_report(df)
+    print(
+        f"Loaded {len(df)} rows using {used / 2**20:.1f} MiB "
+        f"(saved {(baseline - used) / 2**20:.1f} MiB with compact dtypes)"
+    )
+    if snapshot_enabled() and source_stamp(data_path) == stamp:
+        write_snapshot(df, data_path, stamp)
+    df.attrs["source"] = stamp
     return df
 
 
-@lru_cache(maxsize=1)
+_loads = SingleFlight()
+
+
 def load_data() -> pd.DataFrame:
     """
-    Load data from Supabase if available, otherwise fall back to CSV.
-    This function is cached to avoid repeated loads.
+    Load the local dataset from the CSV. With Supabase configured this is only
+    needed when queries fall back to (or are hedged onto) the local engine.
+    This function is cached to avoid repeated loads, and concurrent first
+    callers share a single load instead of each parsing the CSV.
     """
-    supabase = get_supabase_client()
-    
-    if supabase:
-        # Use Supabase - much faster!
-        print("Loading data from Supabase...")
-        try:
-            # Note: We don't load all data at once anymore
-            # Repository will query Supabase directly
-            # This just returns an empty DataFrame as a marker
-            return pd.DataFrame()
-        except Exception as e:
-            print(f"Supabase load failed: {e}, falling back to CSV")
-    
-    # Fallback to CSV
+    return _loads.do("data", _load_data)
+
+
+def reset_loaded_data() -> None:
+    """Forget the cached frame, so the next load_data() reads the source again."""
+    _load_data.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def _load_data() -> pd.DataFrame:
     print("Loading data from CSV...")
     return load_data_from_csv()
+
+
+# Query engine over the local dataset, for the configured backend
+Engine = Union[SalesEngine, SqliteEngine]
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def build_engine() -> Engine:
+    """
+    A new engine over the dataset: the SQLite database for SALES_BACKEND=sqlite
+    (built from the CSV in chunks if it is missing or stale), otherwise the
+    in-memory engine over load_data().
+    """
+    if SALES_BACKEND == "sqlite":
+        path = find_data_path()
+        return SqliteEngine.open(path, lambda: iter_csv_chunks(path, SQLITE_BUILD_ROWS))
+    return SalesEngine(load_data())
+
+
+def load_engine() -> Engine:
+    """
+    The current query engine (see build_engine), built once.
+
+    Engines are never modified in place: ingestion publishes a new one with
+    ``publish_engine``, so a request that fetched an in-memory engine keeps a
+    consistent view even if new data lands while it runs. SQLite handles all
+    read the one database file; only their version and counts are fixed.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = build_engine()
+    return _engine
+
+
+def dataset_version(engine: Engine) -> str:
+    """
+    The version of the data ``engine`` holds: the CSV stamp it is current with,
+    the same in every worker and across restarts, or failing that its version.
+    """
+    source = engine.source
+    return f"{source['mtime_ns']}:{source['size']}" if source else f"engine-{engine.version}"
+
+
+def loaded_engine() -> Optional[Engine]:
+    """The current engine, or None if nothing has needed one yet."""
+    return _engine
+
+
+def publish_engine(engine: Engine) -> None:
+    """Make ``engine`` the one new requests get. Requests already running keep theirs."""
+    global _engine
+    with _engine_lock:
+        _engine = engine
+
+
+def _dataset_samples() -> List[Tuple[str, Dict[str, str], float]]:
+    engine = _engine
+    if engine is None:
+        return []
+    if isinstance(engine, SqliteEngine):
+        return [
+            ("dataset_rows", {}, engine.size),
+            ("dataset_disk_bytes", {}, engine.disk_usage()),
+            *cache_samples("sqlite_counts", engine.count_cache.stats()),
+        ]
+    return [
+        ("dataset_rows", {}, engine.size),
+        ("dataset_memory_bytes", {}, engine.memory_usage()),
+        *cache_samples("engine_row_ids", engine.row_id_cache.stats()),
+    ]
+
+
+registry.register_collector(_dataset_samples)
+
+registry.register_collector(lambda: flight_samples("load_data", _loads.stats()))
@@ -0,0 +1,922 @@
+import copy
+import itertools
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import QueryCache, filter_key
+from .metrics import record_stage, stage
+from .models import AggregateQuery, SalesQuery
+from .pagination import Cursor, decode_cursor, encode_cursor
+from .planner import BITMAP_COST, COMPARE_COST_PER_BYTE, TEXT_COST, Filter, Plan, RangeStats, Rows, ValueStats, rows_length
+from .rollups import DailyRollup, aggregate_rows
+
+# Filtered + sorted row-id sets, reused while paging through one result
+ROW_ID_CACHE_MAX_ENTRIES = int(os.getenv("ROW_ID_CACHE_MAX_ENTRIES", "64"))
+ROW_ID_CACHE_MAX_BYTES = int(os.getenv("ROW_ID_CACHE_MAX_BYTES", str(256 * 2**20)))
+
+# Filters and result compaction run over row-block shards on a thread pool;
+# numpy releases the GIL in these loops, so shards use separate cores while
+# sharing the frame's arrays. Datasets under two shards' worth of rows stay on
+# the request thread.
+ENGINE_THREADS = int(os.getenv("ENGINE_THREADS", str(os.cpu_count() or 1)))
+SHARD_MIN_ROWS = int(os.getenv("ENGINE_SHARD_MIN_ROWS", "250000"))
+
+_versions = itertools.count(1)
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ENGINE_THREADS, thread_name_prefix="engine-shard")
+    return _executor
+
+
+def _row_shards(size: int) -> List[Tuple[int, int]]:
+    """Contiguous (lo, hi) row blocks, one per thread, each at least SHARD_MIN_ROWS long."""
+    count = max(1, min(ENGINE_THREADS, size // max(SHARD_MIN_ROWS, 1)))
+    edges = np.linspace(0, size, count + 1).astype(int)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+# SalesQuery multi-select field -> low-cardinality column backed by a bitmap index
+INDEXED_FILTERS: Dict[str, str] = {
+    "region": "customer_region",
+    "gender": "gender",
+    "product_category": "product_category",
+    "payment_method": "payment_method",
+}
+
+SORT_COLUMNS: Dict[str, str] = {
+    "date": "date",
+    "quantity": "quantity",
+    "customer_name": "customer_name",
+}
+
+# Facet name (SalesQuery field) -> index key in SalesEngine.indexes
+FACETS: Dict[str, str] = {**INDEXED_FILTERS, "tag": "tags"}
+
+# Columns filtered by >= / <= bounds, with min/max and histograms for the planner
+RANGE_COLUMNS = ("age", "date")
+
+
+class BitmapIndex:
+    """
+    Maps every distinct value of a column to a boolean row mask.
+
+    Also keeps the value code of every (row, value) pair, so per-value counts
+    under any row mask are a single ``bincount``.
+    """
+
+    def __init__(
+        self,
+        bitmaps: Dict[str, np.ndarray],
+        size: int,
+        codes: np.ndarray,
+        rows: Optional[np.ndarray] = None,
+    ):
+        self.bitmaps = bitmaps
+        self.size = size
+        self.labels = list(bitmaps)
+        self.codes = codes
+        # Row of each code; None means codes are aligned with rows one-to-one
+        self.rows = rows
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "BitmapIndex":
+        codes, uniques = pd.factorize(series)
+        bitmaps = {value: codes == i for i, value in enumerate(uniques)}
+        return cls(bitmaps, len(series), codes)
+
+    @staticmethod
+    def _explode_tags(series: pd.Series) -> pd.Series:
+        """One entry per (row, tag), indexed by row position."""
+        exploded = (
+            series.reset_index(drop=True)
+            .fillna("")
+            .astype(str)
+            .str.split(",")
+            .explode()
+            .str.strip()
+        )
+        return exploded[exploded != ""]
+
+    @classmethod
+    def from_tags(cls, series: pd.Series) -> "BitmapIndex":
+        """Index a comma-separated tags column: one bitmap per distinct tag."""
+        size = len(series)
+        exploded = cls._explode_tags(series)
+        rows = exploded.index.to_numpy()
+        codes, uniques = pd.factorize(exploded)
+        bitmaps = {}
+        for i, tag in enumerate(uniques):
+            bitmap = np.zeros(size, dtype=bool)
+            bitmap[rows[codes == i]] = True
+            bitmaps[tag] = bitmap
+        return cls(bitmaps, size, codes, rows)
+
+    def extend(self, series: pd.Series) -> "BitmapIndex":
+        """New index covering the existing rows plus ``series`` appended after them."""
+        return self._extended(series.reset_index(drop=True), None, len(series))
+
+    def extend_tags(self, series: pd.Series) -> "BitmapIndex":
+        exploded = self._explode_tags(series)
+        return self._extended(exploded, exploded.index.to_numpy(), len(series))
+
+    def _extended(self, values: pd.Series, rows: Optional[np.ndarray], added: int) -> "BitmapIndex":
+        # Existing bitmaps are copied with the new rows' bits appended; old codes keep their meaning
+        lookup = {label: i for i, label in enumerate(self.labels)}
+        batch_codes, uniques = pd.factorize(values)
+        mapped = np.asarray([lookup.setdefault(value, len(lookup)) for value in uniques], dtype=np.int64)
+        codes = np.full(len(batch_codes), -1, dtype=np.int64)
+        present = batch_codes >= 0
+        codes[present] = mapped[batch_codes[present]]
+        batch_rows = np.arange(added) if rows is None else rows
+
+        bitmaps = {}
+        for label, i in lookup.items():
+            tail = np.zeros(added, dtype=bool)
+            tail[batch_rows[codes == i]] = True
+            head = self.bitmaps.get(label)
+            bitmaps[label] = np.concatenate([head if head is not None else np.zeros(self.size, dtype=bool), tail])
+
+        all_codes = np.concatenate([self.codes, codes.astype(self.codes.dtype, copy=False)])
+        all_rows = None if self.rows is None else np.concatenate([self.rows, batch_rows + self.size])
+        return BitmapIndex(bitmaps, self.size + added, all_codes, all_rows)
+
+    def values(self) -> List[str]:
+        return sorted(str(value) for value in self.bitmaps)
+
+    def counts(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Rows per value, restricted to ``mask`` when given."""
+        codes = self.codes
+        if mask is not None:
+            codes = codes[mask if self.rows is None else mask[self.rows]]
+        tally = np.bincount(codes[codes >= 0], minlength=len(self.labels))
+        return {str(label): int(count) for label, count in zip(self.labels, tally)}
+
+    def bitmaps_for(self, values: Iterable[str]) -> List[np.ndarray]:
+        return [self.bitmaps[value] for value in values if value in self.bitmaps]
+
+
+class NgramIndex:
+    """
+    Inverted n-gram index for substring search over a text column.
+
+    Postings are kept per distinct value rather than per row, so repeated names
+    cost nothing extra. A search intersects the postings of the needle's n-grams,
+    verifies the surviving candidates with a plain ``in`` check and maps the
+    matching values back to rows through the column codes.
+    """
+
+    def __init__(self, series: pd.Series, case_sensitive: bool = False, n: int = 3):
+        self.n = n
+        self.case_sensitive = case_sensitive
+        codes, uniques = pd.factorize(self._normalize(series))
+        self.codes = codes
+        self.values: List[str] = list(uniques)
+        grouped = defaultdict(list)
+        for value_id, value in enumerate(self.values):
+            for gram in {value[i:i + n] for i in range(len(value) - n + 1)}:
+                grouped[gram].append(value_id)
+        self.postings: Dict[str, np.ndarray] = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in grouped.items()
+        }
+
+    def _normalize(self, series: pd.Series) -> pd.Series:
+        text = series.fillna("").astype(str)
+        return text if self.case_sensitive else text.str.lower()
+
+    def extend(self, series: pd.Series) -> "NgramIndex":
+        """
+        New index covering the existing rows plus ``series`` appended after
+        them. Only values not seen before get n-grams and postings.
+        """
+        text = self._normalize(series)
+        lookup = {value: i for i, value in enumerate(self.values)}
+        batch_codes, uniques = pd.factorize(text)
+        values = list(self.values)
+        grouped = defaultdict(list)
+        mapped = []
+        for value in uniques:
+            value_id = lookup.get(value)
+            if value_id is None:
+                value_id = lookup[value] = len(values)
+                values.append(value)
+                for gram in {value[i:i + self.n] for i in range(len(value) - self.n + 1)}:
+                    grouped[gram].append(value_id)
+            mapped.append(value_id)
+
+        extended = copy.copy(self)
+        extended.values = values
+        mapped_ids = np.asarray(mapped, dtype=np.int64)
+        codes = mapped_ids[batch_codes] if len(mapped_ids) else batch_codes
+        extended.codes = np.concatenate([self.codes, codes.astype(self.codes.dtype, copy=False)])
+        extended.postings = dict(self.postings)
+        for gram, ids in grouped.items():
+            posting = np.asarray(ids, dtype=np.int32)
+            existing = self.postings.get(gram)
+            extended.postings[gram] = posting if existing is None else np.concatenate([existing, posting])
+        return extended
+
+    def _candidates(self, needle: str) -> Iterable[int]:
+        grams = sorted(
+            {needle[i:i + self.n] for i in range(len(needle) - self.n + 1)},
+            key=lambda gram: len(self.postings.get(gram, ())),
+        )
+        candidates = self.postings.get(grams[0])
+        if candidates is None:
+            return ()
+        for gram in grams[1:]:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return ()
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if len(candidates) == 0:
+                return ()
+        return candidates.tolist()
+
+    def search(self, needle: str) -> np.ndarray:
+        """Boolean row mask of rows whose value contains ``needle``."""
+        return self.matching_values(needle)[self.codes]
+
+    def matching_values(self, needle: str) -> np.ndarray:
+        """
+        Boolean mask over the distinct values (plus a trailing False for missing
+        rows); indexing it with ``codes`` gives the row mask.
+        """
+        if not self.case_sensitive:
+            needle = needle.lower()
+        # One spare slot so rows with code -1 (missing) map to False
+        matched = np.zeros(len(self.values) + 1, dtype=bool)
+        if len(needle) < self.n:
+            # Too short to have n-grams: scan the distinct values instead of the rows
+            matched[:-1] = np.fromiter((needle in value for value in self.values), dtype=bool, count=len(self.values))
+        else:
+            for value_id in self._candidates(needle):
+                if needle in self.values[value_id]:
+                    matched[value_id] = True
+        return matched
+
+
+def _concat_rows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    ``rows`` appended to ``df`` with ``df``'s columns. Categorical columns keep
+    their existing codes; values not seen before become new categories.
+    """
+    rows = rows.reindex(columns=df.columns).reset_index(drop=True)
+    head = {}
+    for column in df.columns:
+        dtype = df[column].dtype
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        values = rows[column].astype(object)
+        unseen = [value for value in pd.unique(values.dropna()) if value not in dtype.categories]
+        series = df[column].cat.add_categories(unseen) if unseen else df[column]
+        head[column] = series
+        rows[column] = values.astype(series.dtype)
+    base = df.assign(**head) if head else df
+    combined = pd.concat([base, rows], ignore_index=True)
+    combined.attrs = {}
+    return combined
+
+
+class SalesEngine:
+    """
+    Columnar query engine over the CSV dataset.
+
+    Indexes are built once when the data is loaded. Each SalesQuery filter is
+    resolved to a boolean row mask, the masks are combined with bitwise AND, and
+    rows are only materialized for the requested page.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        # Stamp (mtime_ns, size) of the file the frame was read from, if any
+        self.source: Optional[Dict[str, int]] = df.attrs.get("source")
+        self.df = df.reset_index(drop=True)
+        self.size = len(self.df)
+        self.shards = _row_shards(self.size)
+        # Distinguishes datasets in cache keys that outlive a single engine
+        self.version = next(_versions)
+        self.row_id_cache = QueryCache(ROW_ID_CACHE_MAX_ENTRIES, ROW_ID_CACHE_MAX_BYTES)
+        self.indexes: Dict[str, BitmapIndex] = {
+            column: BitmapIndex.from_series(self.df[column])
+            for column in INDEXED_FILTERS.values()
+            if column in self.df.columns
+        }
+        if "tags" in self.df.columns:
+            self.indexes["tags"] = BitmapIndex.from_tags(self.df["tags"])
+        self.rollup = DailyRollup.from_frame(self.df)
+        self.text_indexes: Dict[str, NgramIndex] = {}
+        if "customer_name" in self.df.columns:
+            self.text_indexes["customer_name"] = NgramIndex(self.df["customer_name"])
+        if "phone_number" in self.df.columns:
+            self.text_indexes["phone_number"] = NgramIndex(self.df["phone_number"], case_sensitive=True)
+        # (column, ascending) -> row ids in sort order, computed once per dataset
+        self.orders: Dict[Tuple[str, bool], np.ndarray] = {}
+        # Built on first cursor request: inverse permutations and transaction id -> row
+        self._ranks: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._rows_by_transaction: Optional[pd.Index] = None
+        self._memory_usage: Optional[int] = None
+        for column in SORT_COLUMNS.values():
+            if column in self.df.columns:
+                self.orders[(column, True)] = self._permutation(self.df[column], ascending=True)
+                self.orders[(column, False)] = self._permutation(self.df[column], ascending=False)
+        self._build_stats()
+
+    def _build_stats(self) -> None:
+        """
+        Per-column statistics the filter planner estimates selectivity from:
+        rows per value (from the bitmap indexes), rows per distinct text value
+        and range histograms. Cheap next to building the indexes.
+        """
+        self.value_stats: Dict[str, ValueStats] = {
+            column: ValueStats(index.counts(), self.size) for column, index in self.indexes.items()
+        }
+        self.range_stats: Dict[str, RangeStats] = {
+            column: RangeStats(self.df[column].to_numpy()) for column in RANGE_COLUMNS if column in self.df.columns
+        }
+        self.text_rows: Dict[str, np.ndarray] = {
+            column: np.bincount(index.codes[index.codes >= 0], minlength=len(index.values))
+            for column, index in self.text_indexes.items()
+        }
+
+    @staticmethod
+    def _permutation(series: pd.Series, ascending: bool) -> np.ndarray:
+        """Stable sort order of a column with missing values last, like sort_values(na_position="last")."""
+        codes, uniques = pd.factorize(series, sort=True)
+        keys = codes.astype(np.int64)
+        missing = keys < 0
+        if not ascending:
+            keys = len(uniques) - 1 - keys
+        keys[missing] = len(uniques)
+        order = np.argsort(keys, kind="stable")
+        return order.astype(np.int32 if len(order) < 2**31 else np.int64)
+
+    @classmethod
+    def _merged_order(cls, order: np.ndarray, existing: pd.Series, added: pd.Series, ascending: bool) -> np.ndarray:
+        """
+        ``order`` (a _permutation of ``existing``) extended with the rows of
+        ``added`` appended after them: the new rows are sorted on their own and
+        inserted by binary search, so the existing order is never re-sorted.
+        """
+        size = len(existing)
+        batch_order = cls._permutation(added, ascending).astype(np.int64)
+        batch_values = added.to_numpy()[batch_order]
+        batch_missing = pd.isna(batch_values)
+
+        sorted_values = existing.to_numpy()[order]
+        # Missing values sit at the tail of every order
+        present = len(sorted_values) - int(np.count_nonzero(pd.isna(sorted_values)))
+        head = sorted_values[:present]
+        keys = batch_values[~batch_missing]
+        if ascending:
+            positions = np.searchsorted(head, keys, side="right")
+        else:
+            positions = present - np.searchsorted(head[::-1], keys, side="left")
+
+        merged = np.insert(order.astype(np.int64), positions, batch_order[~batch_missing] + size)
+        merged = np.concatenate([merged, batch_order[batch_missing] + size])
+        return merged.astype(np.int32 if len(merged) < 2**31 else np.int64)
+
+    def append(self, rows: pd.DataFrame, source: Optional[Dict[str, int]] = None) -> "SalesEngine":
+        """
+        New engine over this dataset with ``rows`` (already normalized) appended,
+        and ``source`` as the stamp of the file it now reflects, if given.
+
+        Bitmap and n-gram indexes, sort orders and the daily rollup are extended
+        from this engine's instead of being rebuilt. This engine is left
+        untouched, so requests still holding it keep a consistent view.
+        """
+        engine = copy.copy(self)
+        if source is not None:
+            engine.source = source
+        engine.df = _concat_rows(self.df, rows)
+        engine.size = len(engine.df)
+        engine.shards = _row_shards(engine.size)
+        engine.version = next(_versions)
+        engine.row_id_cache = QueryCache(ROW_ID_CACHE_MAX_ENTRIES, ROW_ID_CACHE_MAX_BYTES)
+        added = engine.df.iloc[self.size:].reset_index(drop=True)
+
+        engine.indexes = {
+            column: index.extend_tags(added[column]) if column == "tags" else index.extend(added[column])
+            for column, index in self.indexes.items()
+        }
+        engine.rollup = self.rollup.append(added)
+        engine.text_indexes = {column: index.extend(added[column]) for column, index in self.text_indexes.items()}
+        engine.orders = {
+            (column, ascending): self._merged_order(order, self.df[column], added[column], ascending)
+            for (column, ascending), order in self.orders.items()
+        }
+        engine._ranks = {}
+        engine._rows_by_transaction = None
+        engine._memory_usage = None
+        engine._build_stats()
+        return engine
+
+    def memory_usage(self) -> int:
+        """
+        Approximate bytes held by the dataset frame, measured once per engine.
+        String columns are extrapolated from a sample of rows, since summing
+        every string's size takes seconds on large datasets.
+        """
+        if self._memory_usage is None:
+            total = 0
+            step = max(1, self.size // 10000)
+            for column in self.df.columns:
+                series = self.df[column]
+                if series.dtype.kind in "biufM" or isinstance(series.dtype, pd.CategoricalDtype):
+                    total += int(series.memory_usage(deep=True, index=False))
+                else:
+                    sample = series.iloc[::step]
+                    total += int(sample.memory_usage(deep=True, index=False) * self.size / max(len(sample), 1))
+            self._memory_usage = total
+        return self._memory_usage
+
+    def _tag_values(self, tags: List[str]) -> List[str]:
+        """Indexed tags equal to any of ``tags``, case-insensitive."""
+        wanted = {tag.strip().lower() for tag in tags}
+        return [value for value in self.indexes["tags"].bitmaps if str(value).lower() in wanted]
+
+    def _map_shards(self, func: Callable[[int, int], Any], size: Optional[int] = None) -> List[Any]:
+        """
+        Run ``func(lo, hi)`` over contiguous row blocks of ``size`` (default:
+        the dataset) on the engine thread pool; results come back in block order.
+        """
+        bounds = self.shards if size is None else _row_shards(size)
+        if len(bounds) == 1:
+            return [func(*bounds[0])]
+        return list(_get_executor().map(lambda block: func(*block), bounds))
+
+    def _filters(self, params: SalesQuery) -> List[Filter]:
+        """
+        One Filter per active SalesQuery filter. Predicates take either a row
+        block or survivor row ids; whatever does not depend on the rows (n-gram
+        lookups, bitmap selection, bounds) is resolved up front, together with
+        the filter's matching row count from the column statistics.
+        """
+        columns = self.df.columns
+        filters: List[Filter] = []
+
+        def text(field: str, column: str, needle: str) -> None:
+            index = self.text_indexes[column]
+            matched, codes = index.matching_values(needle), index.codes
+            rows = int(self.text_rows[column][matched[:-1]].sum())
+            filters.append(Filter(field, column, lambda rows: matched[codes[rows]], rows, True, TEXT_COST))
+
+        def union(field: str, column: str, values: List[str], exact: bool) -> None:
+            bitmaps = self.indexes[column].bitmaps_for(values)
+
+            def predicate(rows: Rows) -> np.ndarray:
+                if not bitmaps:
+                    return np.zeros(rows_length(rows), dtype=bool)
+                result = bitmaps[0][rows]
+                if isinstance(rows, slice):
+                    result = result.copy()
+                for bitmap in bitmaps[1:]:
+                    result |= bitmap[rows]
+                return result
+
+            matching = min(self.value_stats[column].rows(values), self.size)
+            cost = BITMAP_COST * max(len(bitmaps), 1)
+            filters.append(Filter(field, column, predicate, matching, exact, cost))
+
+        def compare(field: str, column: str, values: np.ndarray, op: Callable, bound: Any, rows: int, exact: bool) -> None:
+            cost = COMPARE_COST_PER_BYTE * values.dtype.itemsize
+            filters.append(Filter(field, column, lambda ids: op(values[ids], bound), rows, exact, cost))
+
+        if params.customer_name and "customer_name" in self.text_indexes:
+            text("customer_name", "customer_name", params.customer_name)
+
+        if params.phone and "phone_number" in self.text_indexes:
+            text("phone", "phone_number", params.phone)
+
+        for field, column in INDEXED_FILTERS.items():
+            values = getattr(params, field)
+            if values and column in self.indexes:
+                # Values are distinct per row, so summed counts are exact
+                union(field, column, list(dict.fromkeys(values)), exact=True)
+
+        if "age" in columns:
+            ages, stats = self.df["age"].to_numpy(), self.range_stats["age"]
+            if params.age_min is not None:
+                compare("age_min", "age", ages, np.greater_equal, params.age_min, *stats.at_least(params.age_min))
+            if params.age_max is not None:
+                compare("age_max", "age", ages, np.less_equal, params.age_max, *stats.at_most(params.age_max))
+
+        if params.tag and "tags" in self.indexes:
+            # A row can carry several of the tags, so only a single tag's count is exact
+            values = self._tag_values(params.tag)
+            union("tag", "tags", values, exact=len(values) <= 1)
+
+        if "date" in columns:
+            dates, stats = self.df["date"].to_numpy(), self.range_stats["date"]
+            # Compared as integers, which numpy does several times faster than datetimes;
+            # NaT is the smallest int64, so only "<=" has to rule it out explicitly
+            keys = dates.view(np.int64)
+            nat = np.iinfo(np.int64).min
+
+            def key(value: Any) -> int:
+                return int(np.datetime64(pd.to_datetime(value)).astype(dates.dtype).astype(np.int64))
+
+            if params.date_from:
+                compare("date_from", "date", keys, np.greater_equal, key(params.date_from), *stats.at_least(params.date_from))
+            if params.date_to:
+                op = np.less_equal
+                if stats.missing:
+                    op = lambda values, bound: (values <= bound) & (values != nat)
+                compare("date_to", "date", keys, op, key(params.date_to), *stats.at_most(params.date_to))
+
+        return filters
+
+    def plan(self, params: SalesQuery) -> Plan:
+        return Plan(self._filters(params), self.size)
+
+    def distinct_values(self, column: str) -> List[str]:
+        """Distinct non-missing values of a column, from its bitmap index when it has one."""
+        index = self.indexes.get(column)
+        if index is not None:
+            return index.values()
+        if column not in self.df.columns:
+            return []
+        return sorted(self.df[column].dropna().astype(str).unique())
+
+    def tag_values(self) -> List[str]:
+        """Distinct tags, read straight from the tag index."""
+        index = self.indexes.get("tags")
+        return index.values() if index else []
+
+    def filter_masks(self, params: SalesQuery) -> Dict[str, np.ndarray]:
+        """
+        One row mask per filter that can reject rows, keyed by the SalesQuery
+        field it came from. Filters known to match every row are left out.
+        """
+        return {f.field: self._full_mask(f) for f in self.plan(params).active}
+
+    @staticmethod
+    def combined_mask(masks: Dict[str, np.ndarray]) -> Optional[np.ndarray]:
+        """A query's row mask from its ``filter_masks``: their AND, or None when nothing filters."""
+        if not masks:
+            return None
+        return np.logical_and.reduce(list(masks.values()))
+
+    def _full_mask(self, f: Filter) -> np.ndarray:
+        mask = np.empty(self.size, dtype=bool)
+
+        def fill(lo: int, hi: int) -> None:
+            mask[lo:hi] = f.predicate(slice(lo, hi))
+
+        self._map_shards(fill)
+        return mask
+
+    @staticmethod
+    def _signature(params: SalesQuery, field: str) -> Tuple[str, Any]:
+        """What a filter matches: its field and (order-insensitive) value, equal across queries."""
+        value = getattr(params, field)
+        if isinstance(value, list):
+            value = tuple(sorted(set(value)))
+        return field, value
+
+    def batch_masks(self, queries: List[SalesQuery]) -> List[Tuple[Optional[np.ndarray], Optional[Dict[str, np.ndarray]]]]:
+        """
+        Filter masks for several queries at once, as (row mask, per-filter masks
+        for facet_counts or None), ready for query / query_keyset / facet_counts.
+
+        A filter (field and value) used by more than one query is evaluated once
+        over the whole dataset and shared, and the filters every query has are
+        combined once. Each query then only checks its own remaining filters, on
+        the ids of the rows that survived the shared ones. Queries sharing
+        nothing run their usual plan.
+        """
+        plans = [self.plan(params) for params in queries]
+        signatures = [[self._signature(params, f.field) for f in plan.active] for params, plan in zip(queries, plans)]
+        uses = Counter(signature for plan, found in zip(plans, signatures) if plan.steps for signature in set(found))
+        filtered = [set(found) for plan, found in zip(plans, signatures) if plan.steps]
+        everywhere = set.intersection(*filtered) if len(filtered) > 1 else set()
+        full: Dict[Tuple[str, Any], np.ndarray] = {}
+
+        def full_mask(signature: Tuple[str, Any], f: Filter) -> np.ndarray:
+            if signature not in full:
+                full[signature] = self._full_mask(f)
+            return full[signature]
+
+        core: Optional[np.ndarray] = None
+        results = []
+        with stage("filter"):
+            for params, plan, found in zip(queries, plans, signatures):
+                facet_masks = None
+                if params.facets:
+                    facet_masks = {f.field: full_mask(signature, f) for f, signature in zip(plan.active, found)}
+                if plan.unfiltered:
+                    results.append((None, facet_masks))
+                    continue
+                if plan.empty is not None:
+                    results.append((np.zeros(self.size, dtype=bool), facet_masks))
+                    continue
+
+                steps = list(zip(plan.steps, found))
+                shared = [(f, s) for f, s in steps if uses[s] > 1 or s in full]
+                if not shared:
+                    results.append((self._run_plan(plan)[0], facet_masks))
+                    continue
+                parts = [full_mask(s, f) for f, s in shared if s not in everywhere]
+                if everywhere:
+                    if core is None:
+                        core = np.logical_and.reduce([full_mask(s, f) for f, s in shared if s in everywhere])
+                    parts.append(core)
+                # Shared masks are only read from here on, never written
+                mask = np.logical_and.reduce(parts) if len(parts) > 1 else parts[0]
+
+                rest = [f for f, s in steps if uses[s] <= 1 and s not in full]
+                if rest:
+                    ids = np.flatnonzero(mask)
+                    for f in rest:
+                        if not len(ids):
+                            break
+                        ids = ids[f.predicate(ids)]
+                    mask = np.zeros(self.size, dtype=bool)
+                    mask[ids] = True
+                results.append((mask, facet_masks))
+        return results
+
+    def _run_plan(self, plan: Plan) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """
+        Evaluate a plan into one row mask (None when nothing is filtered).
+        Also returns, per step and summed over shards: seconds spent, rows
+        scanned as a block, rows evaluated by survivor id and rows passing.
+        """
+        measured = np.zeros((len(plan.steps), 4))
+        if plan.unfiltered:
+            return None, measured
+        mask = np.zeros(self.size, dtype=bool)
+        if plan.empty is not None:
+            return mask, measured
+        steps = plan.steps
+
+        def fill(lo: int, hi: int) -> np.ndarray:
+            shard = np.zeros((len(steps), 4))
+            block: Optional[np.ndarray] = None
+            ids: Optional[np.ndarray] = None
+            for i, f in enumerate(steps):
+                start = time.perf_counter()
+                if ids is None:
+                    result = f.predicate(slice(lo, hi))
+                    block = result if block is None else np.logical_and(block, result, out=block)
+                    survivors = int(np.count_nonzero(block))
+                    shard[i, 1] = hi - lo
+                    if survivors and i + 1 < len(steps) and plan.gather_after(i, hi - lo, survivors):
+                        ids = np.flatnonzero(block) + lo
+                else:
+                    shard[i, 2] = len(ids)
+                    ids = ids[f.predicate(ids)]
+                    survivors = len(ids)
+                shard[i, 0] = time.perf_counter() - start
+                shard[i, 3] = survivors
+                if not survivors:
+                    break
+            if ids is not None:
+                mask[ids] = True
+            elif block is not None:
+                mask[lo:hi] = block
+            return shard
+
+        measured = np.sum(self._map_shards(fill), axis=0)
+        return mask, measured
+
+    def filter_mask(self, params: SalesQuery) -> Optional[np.ndarray]:
+        """
+        Combine every active filter into one row mask, in the order the
+        planner picked. Returns None when nothing is filtered (including when
+        every filter is known to match all rows).
+        """
+        with stage("filter"):
+            plan = self.plan(params)
+            mask, measured = self._run_plan(plan)
+        for f, seconds in zip(plan.steps, measured[:, 0].tolist()):
+            record_stage(f"filter.{f.field}", seconds)
+        return mask
+
+    def explain(self, params: SalesQuery) -> Dict[str, Any]:
+        """
+        The filter plan chosen for ``params``: estimates per step, what running
+        it measured, and the statistics of the columns involved.
+        """
+        plan = self.plan(params)
+        mask, measured = self._run_plan(plan)
+        actual = [
+            {
+                "rows_scanned": int(scanned),
+                "rows_by_id": int(by_id),
+                "rows_after": int(passed),
+                "ms": round(seconds * 1000, 3),
+            }
+            for seconds, scanned, by_id, passed in measured.tolist()
+        ]
+        report = plan.explain(actual)
+        report["matched"] = self.size if mask is None else int(np.count_nonzero(mask))
+        stats: Dict[str, Any] = {**self.value_stats, **self.range_stats}
+        report["stats"] = {}
+        for f in plan.active + plan.skipped:
+            if f.column in stats:
+                report["stats"][f.column] = stats[f.column].describe()
+            elif f.column in self.text_rows:
+                report["stats"][f.column] = {"cardinality": len(self.text_rows[f.column])}
+        return report
+
+    def _count(self, mask: np.ndarray) -> int:
+        return sum(self._map_shards(lambda lo, hi: int(np.count_nonzero(mask[lo:hi]))))
+
+    def _compact(self, order: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """``order`` restricted to rows passing ``mask``: each shard filters one slice of the order."""
+        parts = self._map_shards(lambda lo, hi: order[lo:hi][mask[order[lo:hi]]], len(order))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def facet_counts(self, params: SalesQuery, masks: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Per-value row counts for every facet under the current filters, where
+        each facet ignores its own filter (so picking a region still shows the
+        counts of the other regions). Filter masks are computed once and reused,
+        or taken from ``masks`` (see batch_masks).
+        """
+        if masks is None:
+            masks = self.filter_masks(params)
+        facets: Dict[str, Dict[str, int]] = {}
+        for field, key in FACETS.items():
+            index = self.indexes.get(key)
+            if index is None:
+                continue
+            others = [mask for name, mask in masks.items() if name != field]
+            facets[field] = index.counts(np.logical_and.reduce(others) if others else None)
+        return facets
+
+    @staticmethod
+    def _first_hits(order: np.ndarray, mask: np.ndarray, limit: int) -> np.ndarray:
+        """Walk a pre-sorted permutation and stop once ``limit`` rows pass the mask."""
+        hits: List[np.ndarray] = []
+        found = 0
+        start = 0
+        chunk = max(limit * 4, 4096)
+        while start < len(order) and found < limit:
+            block = order[start:start + chunk]
+            matched = block[mask[block]]
+            hits.append(matched)
+            found += len(matched)
+            start += chunk
+            chunk *= 2
+        if not hits:
+            return order[:0]
+        return np.concatenate(hits)[:limit]
+
+    def _order_key(self, params: SalesQuery) -> Tuple[str, bool]:
+        return SORT_COLUMNS.get(params.sort_by, "date"), params.order == "asc"
+
+    def _order_for(self, params: SalesQuery) -> np.ndarray:
+        order = self.orders.get(self._order_key(params))
+        return np.arange(self.size) if order is None else order
+
+    def query(self, params: SalesQuery, mask: Optional[np.ndarray] = None) -> Tuple[pd.DataFrame, int]:
+        """
+        Filter, sort and paginate. Returns (page rows, total matching rows).
+        ``mask`` is the query's filter mask if already computed (see batch_masks).
+        """
+        if mask is None:
+            mask = self.filter_mask(params)
+        order = self._order_for(params)
+
+        start = (params.page - 1) * params.page_size
+        limit = start + params.page_size
+        if mask is None:
+            # Unfiltered pages are a direct slice of the pre-sorted order
+            page_ids, total = order[start:limit], self.size
+        elif not self.row_id_cache.enabled:
+            with stage("count"):
+                total = self._count(mask)
+            with stage("sort"):
+                page_ids = self._first_hits(order, mask, limit)[start:]
+        else:
+            # Counting is free once the matching ids are in sort order
+            with stage("sort"):
+                row_ids = self.sorted_row_ids(params, mask, order)
+            page_ids, total = row_ids[start:limit], len(row_ids)
+        with stage("paginate"):
+            return self.df.take(page_ids), total
+
+    def sorted_row_ids(
+        self,
+        params: SalesQuery,
+        mask: Optional[np.ndarray] = None,
+        order: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """All matching row ids in sort order, cached per filter + sort (not per page)."""
+        key = f"{params.sort_by}:{params.order}:{filter_key(params)}"
+        row_ids = self.row_id_cache.get(key)
+        if row_ids is not None:
+            return row_ids
+        if order is None:
+            order = self._order_for(params)
+        if mask is None:
+            mask = self.filter_mask(params)
+        row_ids = order if mask is None else self._compact(order, mask)
+        self.row_id_cache.set(key, row_ids, row_ids.nbytes)
+        return row_ids
+
+    def _transaction_id(self, row: int):
+        if "transaction_id" in self.df.columns:
+            return self.df["transaction_id"].iat[row]
+        return row
+
+    def _row_for_transaction(self, transaction_id) -> int:
+        if "transaction_id" not in self.df.columns:
+            row = int(transaction_id)
+        else:
+            if self._rows_by_transaction is None:
+                self._rows_by_transaction = pd.Index(self.df["transaction_id"])
+            matches = self._rows_by_transaction.get_indexer_for([transaction_id])
+            row = int(matches[0]) if len(matches) else -1
+        if not 0 <= row < self.size:
+            raise ValueError("Invalid cursor")
+        return row
+
+    def _cursor_row(self, cursor: Cursor) -> int:
+        """
+        The row a cursor stopped at: its recorded position while that row still
+        holds the cursor's transaction, else the first row with that id.
+        """
+        row = cursor.row
+        if row is not None and 0 <= row < self.size and self._transaction_id(row) == cursor.transaction_id:
+            return row
+        return self._row_for_transaction(cursor.transaction_id)
+
+    def _rank(self, params: SalesQuery) -> np.ndarray:
+        """Position of every row within a sort order (inverse permutation)."""
+        key = self._order_key(params)
+        ranks = self._ranks.get(key)
+        if ranks is None:
+            order = self._order_for(params)
+            ranks = np.empty(self.size, dtype=order.dtype)
+            ranks[order] = np.arange(self.size, dtype=order.dtype)
+            self._ranks[key] = ranks
+        return ranks
+
+    def query_keyset(self, params: SalesQuery, mask: Optional[np.ndarray] = None) -> Tuple[pd.DataFrame, int, Optional[str]]:
+        """
+        Cursor pagination. The cursor's row is located in the pre-sorted
+        order and the scan resumes right after it, so every page
+        costs the same regardless of depth. The total is counted on the first
+        page and carried forward in the cursor. ``mask`` is as for query().
+        """
+        cursor = decode_cursor(params.cursor) if params.cursor else None
+        if mask is None:
+            mask = self.filter_mask(params)
+        order = self._order_for(params)
+
+        start = 0
+        if cursor is not None:
+            start = int(self._rank(params)[self._cursor_row(cursor)]) + 1
+
+        if cursor is not None and cursor.total is not None:
+            total = cursor.total
+        elif mask is None:
+            total = self.size
+        else:
+            with stage("count"):
+                total = self._count(mask)
+
+        # Fetch one extra row to know whether another page follows
+        with stage("sort"):
+            remaining = order[start:]
+            limit = params.page_size + 1
+            hits = remaining[:limit] if mask is None else self._first_hits(remaining, mask, limit)
+            page_ids = hits[:params.page_size]
+
+        next_cursor = None
+        if len(hits) > params.page_size:
+            last = int(page_ids[-1])
+            column = self._order_key(params)[0]
+            sort_value = self.df[column].iat[last] if column in self.df.columns else None
+            next_cursor = encode_cursor(sort_value, self._transaction_id(last), total, row=last)
+        with stage("paginate"):
+            return self.df.take(page_ids), total, next_cursor
+
+    def iter_batches(self, params: SalesQuery, batch_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        The full filtered and sorted result in frames of ``batch_rows`` rows, for
+        exports. Only the matching row ids are held; each batch is gathered from
+        the frame as it is consumed. Always yields at least one (possibly empty) frame.
+        """
+        order = self._order_for(params)
+        mask = self.filter_mask(params)
+        ids = order if mask is None else self._compact(order, mask)
+        for start in range(0, max(len(ids), 1), batch_rows):
+            yield self.df.take(ids[start:start + batch_rows])
+
+    def aggregate(self, params: AggregateQuery) -> Tuple[List[Dict[str, Any]], str]:
+        """Grouped sums, counts and averages. Returns (rows, "rollup" or "rows")."""
+        if self.rollup.covers(params, params.group_by):
+            return self.rollup.aggregate(params, params.group_by), "rollup"
+        return aggregate_rows(self.df, self.filter_mask(params), params.group_by), "rows"
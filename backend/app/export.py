@@ -0,0 +1,80 @@
+import io
+import os
+from typing import Any, Dict, List, Optional
+
+import orjson
+import pandas as pd
+
+from .serialization import JSON_DATE_FORMAT, frame_to_records
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow export is optional
+    pa = None
+
+# Rows per batch read from the frame or fetched from Supabase while exporting
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+SUPABASE_EXPORT_BATCH_ROWS = int(os.getenv("SUPABASE_EXPORT_BATCH_ROWS", "1000"))
+
+# format -> (media type, file extension)
+EXPORT_FORMATS: Dict[str, tuple] = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+class BatchEncoder:
+    """
+    Turns a stream of row batches into export bytes, one chunk per batch.
+
+    Only the current batch is ever materialized; the CSV header and the Arrow
+    schema are taken from the first batch.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if fmt == "arrow" and pa is None:
+            raise ValueError("Arrow export requires pyarrow to be installed")
+        self.fmt = fmt
+        self.first = True
+        self._sink: Optional[io.BytesIO] = None
+        self._writer = None
+        self._schema = None
+
+    def encode(self, frame: pd.DataFrame) -> bytes:
+        first, self.first = self.first, False
+        if self.fmt == "csv":
+            return frame.to_csv(index=False, header=first, date_format=JSON_DATE_FORMAT).encode()
+        if self.fmt == "ndjson":
+            return b"".join(orjson.dumps(row) + b"\n" for row in frame_to_records(frame))
+        return self._encode_arrow(frame)
+
+    def encode_rows(self, rows: List[Dict[str, Any]]) -> bytes:
+        """Encode a batch of Supabase row dicts."""
+        return self.encode(pd.DataFrame(rows))
+
+    def _encode_arrow(self, frame: pd.DataFrame) -> bytes:
+        if self._writer is None:
+            self._sink = io.BytesIO()
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            self._schema = table.schema
+            self._writer = pa.ipc.new_stream(self._sink, self._schema)
+        else:
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def finish(self) -> bytes:
+        """Trailing bytes once every batch has been encoded (Arrow end-of-stream marker)."""
+        if self._writer is None:
+            return b""
+        self._writer.close()
+        return self._drain()
@@ -0,0 +1,198 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import anyio
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock on the CSV
+    fcntl = None
+
+from .catalog import refresh_in_background
+from .data_loader import (
+    Engine,
+    build_engine,
+    find_data_path,
+    get_supabase_client,
+    load_engine,
+    loaded_engine,
+    publish_engine,
+    read_csv_rows,
+    reset_loaded_data,
+)
+from .engine import SalesEngine
+from .repository_supabase import insert_supabase_rows
+from .serialization import frame_to_records
+from .snapshot import snapshot_enabled, source_stamp, write_snapshot
+
+# Shared secret for POST /api/ingest; ingestion is disabled while unset
+INGEST_TOKEN = os.getenv("INGEST_TOKEN", "")
+# Seconds between checks of the dataset CSV for rows appended by other processes (0 disables)
+DATA_WATCH_INTERVAL = float(os.getenv("DATA_WATCH_INTERVAL", "10"))
+
+# Serializes engine updates within this process; the CSV itself is flock'ed across processes
+_lock = threading.Lock()
+# Writes snapshots one at a time, in ingest order, so the newest one is swapped in last
+_snapshots = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
+
+class _FileLock:
+    def __init__(self, handle):
+        self.handle = handle
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+        return self.handle
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+
+
+def _header(path: Path) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.readline()
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with open(path, "rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        if handle.tell() == 0:
+            return True
+        handle.seek(-1, os.SEEK_END)
+        return handle.read(1) == b"\n"
+
+
+def _read_tail(path: Path, start: int, end: int) -> bytes:
+    """Complete lines between byte offsets ``start`` and ``end``; a partly written last line is left for later."""
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+    return data[:data.rfind(b"\n") + 1]
+
+
+def _publish(engine: Engine, path: Path) -> None:
+    publish_engine(engine)
+    refresh_in_background()
+    # Persist for restarts and other workers, unless even newer rows already landed
+    # (the SQLite database already holds the rows)
+    if isinstance(engine, SalesEngine) and snapshot_enabled() and engine.source == source_stamp(path):
+        _snapshots.submit(_write_snapshot, engine.df, path, engine.source)
+
+
+def _write_snapshot(df: pd.DataFrame, path: Path, stamp: Dict[str, int]) -> None:
+    # Queued behind another write: skip it if later rows made it stale meanwhile
+    if stamp == source_stamp(path):
+        write_snapshot(df, path, stamp)
+
+
+def _catch_up(engine: Engine, path: Path) -> Engine:
+    """
+    Bring ``engine`` in line with the CSV on disk. Appended bytes are parsed and
+    folded in incrementally; any other change (rewrite, truncation) reloads.
+    """
+    stamp = source_stamp(path)
+    if engine.source is None or stamp == engine.source:
+        return engine
+
+    known = engine.source["size"]
+    if stamp["size"] <= known:
+        print("Dataset CSV was rewritten, reloading")
+        reset_loaded_data()
+        return build_engine()
+
+    tail = _read_tail(path, known, stamp["size"])
+    if not tail:
+        return engine
+    rows = read_csv_rows(io.BytesIO(_header(path) + tail))
+    updated = engine.append(rows, {"mtime_ns": stamp["mtime_ns"], "size": known + len(tail)})
+    print(f"Appended {len(rows)} rows from the dataset CSV ({updated.size} total)")
+    return updated
+
+
+def sync_with_source() -> None:
+    """Pick up rows other processes appended to the dataset CSV since the engine was built."""
+    engine = loaded_engine()
+    if engine is None or engine.source is None:
+        return
+    path = find_data_path()
+    with _lock:
+        current = loaded_engine()
+        updated = _catch_up(current, path)
+        if updated is not current:
+            _publish(updated, path)
+
+
+async def watch_data_file() -> None:
+    """Background task: poll the dataset CSV every DATA_WATCH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(DATA_WATCH_INTERVAL)
+        try:
+            await anyio.to_thread.run_sync(sync_with_source)
+        except Exception as e:
+            print(f"Dataset sync failed: {e}")
+
+
+def _supabase_rows(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    # frame_to_records blanks missing values; numbers and dates need NULL instead
+    records = frame_to_records(rows)
+    nullable = [column for column in rows.columns if rows[column].dtype.kind in "biufM"]
+    for record in records:
+        for column in nullable:
+            if record[column] == "":
+                record[column] = None
+    return records
+
+
+def ingest_csv(content: bytes) -> Dict[str, Any]:
+    """
+    Add a CSV batch (with the dataset's header line) to the active backend.
+
+    With Supabase the rows are inserted into the sales table. Otherwise they are
+    appended to the dataset CSV and folded into the local engine (in memory or
+    the SQLite database), which is then published as a new snapshot. Raises
+    ValueError for a malformed batch.
+    """
+    if not content.strip():
+        raise ValueError("Empty batch")
+    header, _, body = content.partition(b"\n")
+    if not body.strip():
+        raise ValueError("Batch has no rows")
+    try:
+        rows = read_csv_rows(io.BytesIO(content))
+    except (ValueError, pd.errors.ParserError) as exc:
+        raise ValueError(f"Could not parse batch: {exc}") from exc
+    # Rows one field longer than the header make pandas take the first field as the index
+    if not rows.index.equals(pd.RangeIndex(len(rows))):
+        raise ValueError("Batch rows have more fields than the header")
+
+    if get_supabase_client():
+        inserted = insert_supabase_rows(_supabase_rows(rows))
+        refresh_in_background()
+        return {"rows": inserted, "target": "supabase"}
+
+    path = find_data_path()
+    if header.rstrip(b"\r") != _header(path).rstrip(b"\r\n"):
+        raise ValueError("Batch header must match the dataset CSV header")
+    if not body.endswith(b"\n"):
+        body += b"\n"
+
+    with _lock, open(path, "ab") as handle, _FileLock(handle):
+        # Rows other workers appended first must be in the engine before ours
+        engine = _catch_up(load_engine(), path)
+        if not _ends_with_newline(path):
+            body = b"\n" + body
+        handle.write(body)
+        handle.flush()
+
+        updated = engine.append(rows, source_stamp(path))
+        _publish(updated, path)
+    return {"rows": len(rows), "target": "csv", "total_rows": updated.size}
+
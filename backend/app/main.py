@@ -1,9 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import sales
+from .data_loader import get_supabase_client, load_engine
+from .ingest import DATA_WATCH_INTERVAL, watch_data_file
+from .metrics import MetricsMiddleware
+from .routers import ingest, metrics, sales
+from .supabase_async import SUPABASE_HEDGE_MS
+
+
+async def warm_local_engine() -> None:
+    """Load the local engine ahead of time, so hedged Supabase reads have something to race."""
+    try:
+        await run_in_threadpool(load_engine)
+    except Exception as e:
+        print(f"Local engine warm-up failed, Supabase reads won't be hedged: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Other workers may append to the dataset CSV; fold their rows in as they land
+    watcher = asyncio.create_task(watch_data_file()) if DATA_WATCH_INTERVAL > 0 else None
+    warmup = asyncio.create_task(warm_local_engine()) if SUPABASE_HEDGE_MS > 0 and get_supabase_client() else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    if warmup is not None:
+        warmup.cancel()
+
 
-app = FastAPI(title="Retail Sales Management API", version="0.1.0")
+app = FastAPI(title="Retail Sales Management API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,9 +40,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
+# Outermost, so request latency and Server-Timing cover CORS handling too
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(sales.router, prefix="/api")
+app.include_router(ingest.router, prefix="/api")
+app.include_router(metrics.router)
 
 
 @app.get("/health")
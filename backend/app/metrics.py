@@ -0,0 +1,349 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .circuit import STATE_VALUES
+
+# Latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Requests slower than this many milliseconds get their sampled stacks written out (0 disables)
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Threads whose innermost frame is in one of these are blocked waiting, not working
+IDLE_FILES = {"threading.py", "selectors.py", "queue.py"}
+
+METRIC_HELP = {
+    "http_request_duration_seconds": ("histogram", "Request latency by route, method and status"),
+    "sales_stage_duration_seconds": ("histogram", "Time spent in each query stage (filter.* sums shard CPU time)"),
+    "supabase_fallbacks_total": ("counter", "Supabase calls that failed or were skipped (open circuit) and were served another way"),
+    "supabase_hedges_total": ("counter", "Slow Supabase pages also run on the local engine, by which answered first"),
+    "circuit_state": ("gauge", "Circuit breaker state: 0 closed, 1 half-open, 2 open"),
+    "circuit_transitions_total": ("counter", "Circuit breaker state changes, by the state entered"),
+    "circuit_rejections_total": ("counter", "Calls refused by an open circuit breaker"),
+    "cache_hits_total": ("counter", "Cache lookups that found an entry"),
+    "cache_misses_total": ("counter", "Cache lookups that found nothing or an expired entry"),
+    "cache_evictions_total": ("counter", "Entries evicted to stay within cache bounds"),
+    "cache_entries": ("gauge", "Entries held per cache"),
+    "cache_bytes": ("gauge", "Estimated bytes held per cache"),
+    "singleflight_calls_total": ("counter", "Coalesced calls: leaders executed, followers shared a leader's result"),
+    "singleflight_in_flight": ("gauge", "Coalesced calls currently executing"),
+    "dataset_rows": ("gauge", "Rows in the loaded dataset (in memory or SQLite)"),
+    "dataset_memory_bytes": ("gauge", "Bytes used by the loaded in-memory dataset frame"),
+    "dataset_disk_bytes": ("gauge", "Bytes of the SQLite database file"),
+    "process_resident_memory_bytes": ("gauge", "Resident set size of this worker"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Process-wide histograms and counters, plus collectors that report gauges
+    (and counters kept elsewhere, like cache hits) when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format."""
+        lines: Dict[str, List[str]] = {}
+
+        def add(name: str, labels: Dict[str, str], value: float, suffix: str = "") -> None:
+            text = ",".join(f'{key}="{_escape(str(item))}"' for key, item in labels.items())
+            number = str(int(value)) if float(value).is_integer() else repr(float(value))
+            lines.setdefault(name, []).append(f"{name}{suffix}{{{text}}} {number}" if text else f"{name}{suffix} {number}")
+
+        with self._lock:
+            histograms = [(name, dict(labels), h.buckets, list(h.counts), h.sum, h.count)
+                          for (name, labels), h in self.histograms.items()]
+            counters = [(name, dict(labels), value) for (name, labels), value in self.counters.items()]
+        for name, labels, buckets, counts, total, count in sorted(histograms, key=lambda h: h[0]):
+            bounds = [f"{bound:g}" for bound in buckets] + ["+Inf"]
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                add(name, {**labels, "le": bound}, cumulative, "_bucket")
+            add(name, labels, total, "_sum")
+            add(name, labels, count, "_count")
+        for name, labels, value in sorted(counters, key=lambda c: c[0]):
+            add(name, labels, value)
+        for collector in self.collectors:
+            try:
+                for name, labels, value in collector():
+                    add(name, labels, value)
+            except Exception as e:
+                print(f"Metrics collector {collector.__name__} failed: {e}")
+
+        out = []
+        for name in sorted(lines):
+            kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines[name])
+        return "\n".join(out) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+# Stage name -> seconds for the request being served; None outside requests
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Add ``seconds`` to the current request's ``name`` stage and to its histogram."""
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+    registry.observe("sales_stage_duration_seconds", seconds, stage=name)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as query stage ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def count_fallback(endpoint: str) -> None:
+    registry.increment("supabase_fallbacks_total", endpoint=endpoint)
+
+
+def count_hedge(winner: str) -> None:
+    registry.increment("supabase_hedges_total", winner=winner)
+
+
+def cache_samples(name: str, stats: Dict[str, int]) -> List[Sample]:
+    """Metrics samples for one QueryCache's ``stats()``."""
+    labels = {"cache": name}
+    return [
+        ("cache_hits_total", labels, stats["hits"]),
+        ("cache_misses_total", labels, stats["misses"]),
+        ("cache_evictions_total", labels, stats["evictions"]),
+        ("cache_entries", labels, stats["entries"]),
+        ("cache_bytes", labels, stats["bytes"]),
+    ]
+
+
+def flight_samples(name: str, stats: Dict[str, int]) -> List[Sample]:
+    """Metrics samples for one SingleFlight's ``stats()``."""
+    return [
+        ("singleflight_calls_total", {"flight": name, "role": "leader"}, stats["leaders"]),
+        ("singleflight_calls_total", {"flight": name, "role": "follower"}, stats["followers"]),
+        ("singleflight_in_flight", {"flight": name}, stats["in_flight"]),
+    ]
+
+
+def circuit_samples(name: str, stats: Dict[str, Any]) -> List[Sample]:
+    """Metrics samples for one CircuitBreaker's ``stats()``."""
+    labels = {"breaker": name}
+    samples: List[Sample] = [
+        ("circuit_state", labels, STATE_VALUES[stats["state"]]),
+        ("circuit_rejections_total", labels, stats["rejected"]),
+    ]
+    for state, count in stats["transitions"].items():
+        samples.append(("circuit_transitions_total", {**labels, "to": state}, count))
+    return samples
+
+
+def _process_samples() -> List[Sample]:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return [("process_resident_memory_bytes", {}, int(line.split()[1]) * 1024)]
+    except OSError:
+        pass
+    return []
+
+
+registry.register_collector(_process_samples)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, e.g. ``filter;dur=1.20, serialize;dur=0.31``."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+
+
+class _Sampler:
+    """
+    Samples every thread's stack each PROFILE_INTERVAL_MS while at least one
+    request is being profiled. Stacks from concurrent requests land in each
+    other's profiles; the slow request's own frames usually dominate.
+    """
+
+    def __init__(self):
+        self._active: List[Counter] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> Counter:
+        samples: Counter = Counter()
+        with self._lock:
+            self._active.append(samples)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+        return samples
+
+    def stop(self, samples: Counter) -> None:
+        with self._lock:
+            self._active = [active for active in self._active if active is not samples]
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(PROFILE_INTERVAL_MS / 1000)
+            stacks = [
+                _folded(frame)
+                for ident, frame in sys._current_frames().items()
+                if ident != own and Path(frame.f_code.co_filename).name not in IDLE_FILES
+            ]
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for samples in self._active:
+                    samples.update(stacks)
+
+
+def _folded(frame) -> str:
+    """A stack in flamegraph "folded" form, outermost frame first."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+_sampler = _Sampler()
+
+
+# Writes slow-request profiles off the event loop, one at a time
+_profile_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+
+def _write_profile(samples: Counter, method: str, path: str, elapsed_ms: float) -> Path:
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = path.strip("/").replace("/", "_") or "root"
+    target = directory / f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{slug}-{elapsed_ms:.0f}ms.folded"
+    target.write_text("".join(f"{stack} {count}\n" for stack, count in samples.most_common()))
+    return target
+
+
+def _save_profile(samples: Counter, method: str, path: str, elapsed_ms: float) -> None:
+    try:
+        target = _write_profile(samples, method, path, elapsed_ms)
+    except OSError as e:
+        print(f"Could not write profile for slow request {method} {path}: {e}")
+        return
+    print(f"Slow request {method} {path} took {elapsed_ms:.0f}ms, profile in {target}")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that opens a stage-timing scope per HTTP request, records
+    the request latency histogram, adds a ``Server-Timing`` header and, when
+    PROFILE_SLOW_MS is set, saves a sampled profile of requests slower than it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        samples = _sampler.start() if PROFILE_SLOW_MS > 0 else None
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings["total"] = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings).encode()))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _timings.reset(token)
+            route = scope.get("route")
+            # Only matched routes are labelled, and by template when they take
+            # path parameters, so label cardinality stays bounded
+            if route is None:
+                path = "unmatched"
+            else:
+                path = route.path if scope.get("path_params") else scope["path"]
+            registry.observe(
+                "http_request_duration_seconds", elapsed, path=path, method=scope["method"], status=str(status)
+            )
+            if samples is not None:
+                _sampler.stop(samples)
+                if elapsed * 1000 >= PROFILE_SLOW_MS and samples:
+                    # A slow disk must not hold up the event loop
+                    _profile_writer.submit(_save_profile, samples, scope["method"], scope["path"], elapsed * 1000)
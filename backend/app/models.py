@@ -17,7 +17,7 @@ class SalesQuery(BaseModel):
         age_min (Optional[int]): Minimum age filter (inclusive, must be >= 0).
         age_max (Optional[int]): Maximum age filter (inclusive, must be >= 0).
         product_category (Optional[str]): Filter results by product category.
-        tag (Optional[str]): Filter results by tag using contains matching.
+        tag (Optional[str]): Filter results by tag using exact, case-insensitive tag matching.
         payment_method (Optional[str]): Filter results by payment method.
         date_from (Optional[date]): Start date for date range filter (inclusive).
         date_to (Optional[date]): End date for date range filter (inclusive).
@@ -27,9 +27,14 @@ class SalesQuery(BaseModel):
             Defaults to 'desc'.
         page (int): Page number for pagination (1-indexed). Defaults to 1, must be >= 1.
         page_size (int): Number of items per page. Defaults to 10, must be between 1 and 100.
+        pagination (str): 'offset' (page/page_size) or 'cursor' (keyset). Defaults to 'offset'.
+        cursor (Optional[str]): Opaque next_cursor from the previous response in cursor mode.
+        facets (bool): Also return per-value counts for every filter dimension. Defaults to False.
+        explain (bool): Also return the filter plan the in-memory engine (or SQLite) chose. Defaults to False.
     Raises:
         ValueError: If 'order' is not 'asc' or 'desc'.
         ValueError: If 'sort_by' is not one of 'date', 'quantity', or 'customer_name'.
+        ValueError: If 'pagination' is not 'offset' or 'cursor'.
     """
     customer_name: Optional[str] = Field(None, description="Search by customer name (contains, case-insensitive)")
     phone: Optional[str] = Field(None, description="Search by phone number (contains)")
@@ -38,7 +43,7 @@ class SalesQuery(BaseModel):
     age_min: Optional[int] = Field(None, ge=0, description="Minimum age")
     age_max: Optional[int] = Field(None, ge=0, description="Maximum age")
     product_category: Optional[List[str]] = Field(None, description="Filter by product category (multi-select)")
-    tag: Optional[List[str]] = Field(None, description="Filter by tag (multi-select contains)")
+    tag: Optional[List[str]] = Field(None, description="Filter by tag (multi-select, exact tag)")
     payment_method: Optional[List[str]] = Field(None, description="Filter by payment method (multi-select)")
     date_from: Optional[date] = Field(None, description="Start date (inclusive)")
     date_to: Optional[date] = Field(None, description="End date (inclusive)")
@@ -46,6 +51,10 @@ class SalesQuery(BaseModel):
     order: str = Field("desc", description="Sort order: asc|desc")
     page: int = Field(1, ge=1, description="Page number (1-indexed)")
     page_size: int = Field(10, ge=1, le=100, description="Items per page")
+    pagination: str = Field("offset", description="Pagination mode: offset|cursor")
+    cursor: Optional[str] = Field(None, description="Keyset cursor from a previous response (cursor mode)")
+    facets: bool = Field(False, description="Include facet counts for each filter dimension")
+    explain: bool = Field(False, description="Include the local engine's filter plan (in-memory statistics or SQLite query plans)")
 
     @field_validator('order', mode="before")
     def validate_order(cls, v: str) -> str:
@@ -59,6 +68,12 @@ class SalesQuery(BaseModel):
             raise ValueError("sort_by must be one of: date, quantity, customer_name")
         return v
 
+    @field_validator('pagination', mode="after")
+    def validate_pagination(cls, v: str) -> str:
+        if v not in {"offset", "cursor"}:
+            raise ValueError("pagination must be 'offset' or 'cursor'")
+        return v
+
     @field_validator("region", "gender", "product_category", "payment_method", "tag", mode="before")
     def coerce_to_list(cls, v):
         if v is None:
@@ -79,6 +94,13 @@ class SalesResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    total_exact: bool = True
+    next_cursor: Optional[str] = None
+    # Facet (region, gender, product_category, tag, payment_method) -> value -> matching rows,
+    # each computed without that facet's own filter
+    facets: Optional[Dict[str, Dict[str, int]]] = None
+    # explain=true on a local engine: the in-memory filter plan or SQLite's query plans
+    plan: Optional[Dict[str, Any]] = None
 
 
 class MetaResponse(BaseModel):
@@ -87,3 +109,48 @@ class MetaResponse(BaseModel):
     product_categories: List[str]
     tags: List[str]
     payment_methods: List[str]
+    # Facet (region, gender, product_category, tag, payment_method) -> value -> rows in the
+    # whole dataset; None when the backend can't count them
+    counts: Optional[Dict[str, Dict[str, int]]] = None
+    rows: Optional[int] = None
+    # {"min": ..., "max": ...} of age and of date (as YYYY-MM-DD)
+    age: Optional[Dict[str, int]] = None
+    date: Optional[Dict[str, str]] = None
+    # Changes whenever the dataset the catalog was computed from does
+    version: Optional[str] = None
+
+
+AGGREGATE_GROUPS = ("region", "category", "payment_method", "store", "day", "week", "month")
+
+
+class AggregateQuery(SalesQuery):
+    """
+    SalesQuery filters plus the dimensions to group by. Valid group_by values:
+    'region', 'category', 'payment_method', 'store', and one of 'day', 'week'
+    or 'month' to bucket by date. Sorting and paging fields are ignored.
+    """
+    group_by: List[str] = Field(default_factory=list, description="Group by: region|category|payment_method|store|day|week|month")
+
+    @field_validator("group_by", mode="before")
+    def coerce_group_by(cls, v):
+        if v is None:
+            return []
+        if isinstance(v, str):
+            v = [v]
+        parts = [part.strip() for item in v if isinstance(item, str) for part in item.split(",")]
+        return list(dict.fromkeys(part for part in parts if part))
+
+    @field_validator("group_by", mode="after")
+    def validate_group_by(cls, v: List[str]) -> List[str]:
+        unknown = [item for item in v if item not in AGGREGATE_GROUPS]
+        if unknown:
+            raise ValueError(f"group_by must be among: {', '.join(AGGREGATE_GROUPS)}")
+        if sum(item in ("day", "week", "month") for item in v) > 1:
+            raise ValueError("group_by can include only one of day, week, month")
+        return v
+
+
+class AggregateResponse(BaseModel):
+    group_by: List[str]
+    rows: List[Dict[str, Any]]
+    source: str
@@ -0,0 +1,55 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class Cursor(NamedTuple):
+    """
+    Keyset position: the last row seen and the total counted on the first page.
+    Local engines also record the row's position, since transaction ids in a
+    CSV need not be unique; Supabase resumes by (sort value, transaction id).
+    """
+
+    sort_value: Any
+    transaction_id: Any
+    total: Optional[int]
+    total_exact: bool = True
+    row: Optional[int] = None
+
+
+def _plain(value: Any) -> Any:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def encode_cursor(
+    sort_value: Any, transaction_id: Any, total: Optional[int], total_exact: bool = True, row: Optional[int] = None
+) -> str:
+    payload = json.dumps(
+        [_plain(sort_value), _plain(transaction_id), total, total_exact, row],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Decode a cursor from a previous response. Raises ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        # Cursors from before row positions were recorded have four fields
+        sort_value, transaction_id, total, total_exact, *rest = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    row = rest[0] if rest else None
+    if transaction_id is None or not (total is None or isinstance(total, int)) or not (row is None or isinstance(row, int)):
+        raise ValueError("Invalid cursor")
+    return Cursor(sort_value, transaction_id, total, bool(total_exact), row)
@@ -0,0 +1,224 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+# Rows a predicate is evaluated on: a contiguous block or the ids of surviving rows
+Rows = Union[slice, np.ndarray]
+
+# Rough per-row costs in nanoseconds (numpy, one core). They order filters and
+# decide when a shard stops scanning whole blocks and switches to evaluating
+# the remaining filters on the ids of the rows that survived so far.
+COMPARE_COST_PER_BYTE = 0.1  # numeric comparison, per byte of the column's item size
+BITMAP_COST = 0.1  # per bitmap OR'ed into a multi-select filter
+TEXT_COST = 1.6  # n-gram match looked up through the column's value codes
+GATHER_COST = 2.0  # fetching one survivor's value by id and compacting the ids
+GATHER_FACTOR = 4  # random access slowdown of the predicate itself
+TO_IDS_COST = 1.2  # per block row, turning a mask into survivor ids
+# Range histograms stay exact up to this many distinct values and are bucketed beyond
+HISTOGRAM_MAX_BUCKETS = 4096
+# Integer keys spanning at most this many values are counted with bincount rather than sorted
+BINCOUNT_MAX_SPAN = 1 << 20
+
+
+class RangeStats:
+    """
+    Minimum, maximum and a cumulative histogram of a numeric or datetime
+    column, for estimating how many rows pass ``>=`` / ``<=`` bounds.
+
+    The histogram is exact (one point per distinct value) unless the column
+    has more than HISTOGRAM_MAX_BUCKETS distinct values, in which case each
+    point is a bucket's upper bound.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.dtype = values.dtype
+        keys = self._keys(values)
+        if keys.dtype.kind == "f":
+            keys = keys[~np.isnan(keys)]
+        elif self.dtype.kind == "M":
+            keys = keys[~np.isnat(values)]
+        self.size = len(values)
+        self.missing = self.size - len(keys)
+        # Datetime keys are counted in whole days when every value falls on midnight
+        self.divisor = 1
+        if self.dtype.kind == "M" and len(keys):
+            day = int(np.timedelta64(1, "D") // np.timedelta64(1, np.datetime_data(self.dtype)[0]))
+            if day > 1 and not np.any(keys % day):
+                self.divisor = int(day)
+                keys = keys // day
+
+        if not len(keys):
+            points, counts = keys[:0], np.zeros(0, dtype=np.int64)
+        elif keys.dtype.kind in "iu" and int(keys.max()) - int(keys.min()) <= BINCOUNT_MAX_SPAN:
+            low = int(keys.min())
+            tally = np.bincount((keys - low).astype(np.int64))
+            points = np.flatnonzero(tally) + low
+            counts = tally[tally > 0]
+        else:
+            points, counts = np.unique(keys, return_counts=True)
+        self.cardinality = len(points)
+        self.min = points[0] if len(points) else None
+        self.max = points[-1] if len(points) else None
+
+        cumulative = np.cumsum(counts)
+        self.exact = len(points) <= HISTOGRAM_MAX_BUCKETS
+        if not self.exact:
+            picks = np.unique(np.linspace(0, len(points) - 1, HISTOGRAM_MAX_BUCKETS).astype(int))
+            points, cumulative = points[picks], cumulative[picks]
+        self.points = points
+        self.cumulative = cumulative
+
+    @staticmethod
+    def _keys(values: np.ndarray) -> np.ndarray:
+        if values.dtype.kind == "M":
+            return values.view(np.int64)
+        if values.dtype.kind in "biu":
+            return values.astype(np.int64)
+        return values.astype(np.float64)
+
+    def _key(self, bound: Any, upper: bool) -> float:
+        if self.dtype.kind == "M":
+            key = np.datetime64(bound).astype(self.dtype).astype(np.int64)
+            # Rounded inwards, so "<= key" and ">= key" keep meaning the same rows
+            return key // self.divisor if upper else -(-key // self.divisor)
+        return float(bound)
+
+    def _at_most(self, key: float) -> int:
+        i = int(np.searchsorted(self.points, key, side="right"))
+        return int(self.cumulative[i - 1]) if i else 0
+
+    def at_least(self, bound: Any) -> Tuple[int, bool]:
+        """(rows >= bound, whether that count is exact)."""
+        if self.min is None:
+            return 0, True
+        key = self._key(bound, upper=False)
+        if key <= self.min:
+            return self.size - self.missing, True
+        if key > self.max:
+            return 0, True
+        i = int(np.searchsorted(self.points, key, side="left"))
+        below = int(self.cumulative[i - 1]) if i else 0
+        return self.size - self.missing - below, self.exact
+
+    def at_most(self, bound: Any) -> Tuple[int, bool]:
+        """(rows <= bound, whether that count is exact)."""
+        if self.min is None:
+            return 0, True
+        key = self._key(bound, upper=True)
+        if key >= self.max:
+            return self.size - self.missing, True
+        if key < self.min:
+            return 0, True
+        return self._at_most(key), self.exact
+
+    def describe(self) -> Dict[str, Any]:
+        low, high = self.min, self.max
+        if self.dtype.kind == "M" and low is not None:
+            unit = "D" if self.divisor > 1 else np.datetime_data(self.dtype)[0]
+            low, high = str(np.datetime64(int(low), unit)), str(np.datetime64(int(high), unit))
+        elif low is not None:
+            low, high = low.item(), high.item()
+        return {"cardinality": self.cardinality, "min": low, "max": high, "missing": self.missing}
+
+
+class ValueStats:
+    """Rows per distinct value of a column (for tags: rows carrying each tag)."""
+
+    def __init__(self, counts: Dict[str, int], size: int):
+        self.counts = counts
+        self.size = size
+        self.cardinality = len(counts)
+
+    def rows(self, values: List[str]) -> int:
+        return sum(self.counts.get(value, 0) for value in values)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"cardinality": self.cardinality}
+
+
+class Filter(NamedTuple):
+    """One active filter: a row predicate plus what the planner knows about it."""
+
+    field: str
+    column: str
+    # Boolean mask (a new array) for the given rows
+    predicate: Callable[[Rows], np.ndarray]
+    # Matching rows over the whole dataset
+    rows: int
+    # rows is a count rather than an estimate
+    exact: bool
+    # Nanoseconds to evaluate the predicate on one row of a contiguous block
+    cost: float
+
+    @property
+    def gather_cost(self) -> float:
+        """Nanoseconds per row when evaluated on scattered row ids instead."""
+        return GATHER_COST + GATHER_FACTOR * self.cost
+
+
+def rows_length(rows: Rows) -> int:
+    return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+
+class Plan:
+    """
+    Evaluation order for a query's filters.
+
+    Filters known to match every row are dropped, a filter known to match
+    nothing makes the whole result empty, and the rest run in ascending
+    ``cost / (1 - selectivity)``: cheap filters that discard many rows first,
+    expensive or unselective ones last. Each shard scans whole blocks until
+    so few rows survive that finishing on the survivors' ids is cheaper.
+    """
+
+    def __init__(self, filters: List[Filter], size: int):
+        self.size = size
+        self.skipped = [f for f in filters if f.exact and f.rows >= size]
+        self.empty = next((f for f in filters if f.exact and f.rows == 0), None)
+        # Filters that can reject rows, in evaluation order
+        self.active = sorted((f for f in filters if not (f.exact and f.rows >= size)), key=self._rank)
+        self.steps = [] if self.empty is not None else self.active
+        # Cost of every step after step i, scanning blocks and gathering ids
+        self._scan_after = [sum(f.cost for f in self.steps[i + 1:]) for i in range(len(self.steps))]
+        self._gather_after = [sum(f.gather_cost for f in self.steps[i + 1:]) for i in range(len(self.steps))]
+
+    def _rank(self, f: Filter) -> float:
+        discarded = 1 - f.rows / self.size if self.size else 1.0
+        return f.cost / discarded if discarded > 0 else float("inf")
+
+    def gather_after(self, step: int, block_rows: int, survivors: int) -> bool:
+        """Whether the steps after ``step`` are cheaper on the survivors' ids than on the block."""
+        scan = block_rows * self._scan_after[step]
+        return block_rows * TO_IDS_COST + survivors * self._gather_after[step] < scan
+
+    @property
+    def unfiltered(self) -> bool:
+        return self.empty is None and not self.steps
+
+    def explain(self, actual: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        The plan as JSON-ready data: each step's estimated selectivity and the
+        rows expected to survive it (assuming independent filters), plus what
+        was measured running it when ``actual`` is given.
+        """
+        steps = []
+        surviving = float(self.size)
+        for i, f in enumerate(self.steps):
+            selectivity = f.rows / self.size if self.size else 0.0
+            surviving *= selectivity
+            step = {
+                "filter": f.field,
+                "selectivity": round(selectivity, 6),
+                "estimate_exact": f.exact,
+                "cost_per_row": f.cost,
+                "estimated_rows_after": int(round(surviving)),
+            }
+            if actual is not None and i < len(actual):
+                step.update(actual[i])
+            steps.append(step)
+        return {
+            "rows": self.size,
+            "empty": self.empty.field if self.empty is not None else None,
+            "skipped": [f.field for f in self.skipped],
+            "steps": steps,
+        }
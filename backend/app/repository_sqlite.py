@@ -0,0 +1,693 @@
+import copy
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import QueryCache, filter_key
+from .engine import FACETS, INDEXED_FILTERS, RANGE_COLUMNS, SORT_COLUMNS
+from .metrics import stage
+from .models import AggregateQuery, SalesQuery
+from .pagination import Cursor, decode_cursor, encode_cursor
+from .planner import ValueStats
+from .rollups import COUNT, MEASURES, ROLLUP_DIMENSIONS, TIME_GRAINS, summarize
+from .snapshot import source_stamp
+
+# Database file; defaults to "<dataset csv>.sqlite" next to the CSV
+SQLITE_PATH = os.getenv("SQLITE_PATH", "")
+# CSV rows parsed and inserted per batch while building the database
+SQLITE_BUILD_ROWS = int(os.getenv("SQLITE_BUILD_ROWS", "100000"))
+# Page cache per connection (one connection per worker thread), in MiB
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+# Filter combinations whose matching row count is remembered per dataset version
+SQLITE_COUNT_CACHE_ENTRIES = int(os.getenv("SQLITE_COUNT_CACHE_ENTRIES", "1024"))
+
+# Bump when the table layout changes, so databases built by older code are rebuilt
+SQLITE_SCHEMA_VERSION = 1
+
+# SalesQuery text filter -> (column, FTS5 table, trigram tokenizer options, operator)
+TEXT_FILTERS = {
+    "customer_name": ("customer_name", "sales_names", "trigram", "LIKE"),
+    "phone": ("phone_number", "sales_phones", "trigram case_sensitive 1", "GLOB"),
+}
+# Characters that are wildcards for each operator; needles containing them skip the FTS index
+WILDCARDS = {"LIKE": "%_", "GLOB": "*?[]"}
+# FTS5 trigram indexes only answer needles of at least three characters
+TRIGRAM = 3
+
+# group_by time grain -> SQL expression for the day the bucket starts on
+TIME_BUCKETS = {
+    "day": "date(\"date\")",
+    "week": "date(\"date\", '-' || ((CAST(strftime('%w', \"date\") AS INTEGER) + 6) % 7) || ' days')",
+    "month": "date(\"date\", 'start of month')",
+}
+
+_versions = itertools.count(1)
+
+
+def database_path(csv_path: Path) -> Path:
+    return Path(SQLITE_PATH) if SQLITE_PATH else csv_path.with_name(csv_path.name + ".sqlite")
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _sql_type(dtype: Any) -> str:
+    if dtype.kind in "biu":
+        return "INTEGER"
+    if dtype.kind == "f":
+        return "REAL"
+    return "TEXT"
+
+
+def _sql_values(series: pd.Series) -> List[Any]:
+    """
+    One column as SQLite values, missing values as NULL. Dates are stored as
+    days (what the API serves) and float32 values by their shortest repr.
+    """
+    dtype = series.dtype
+    if dtype.kind == "M":
+        values = series.to_numpy()
+        days = values.astype("datetime64[D]").astype(str).astype(object)
+        days[np.isnat(values)] = None
+        return days.tolist()
+    if dtype.kind == "f":
+        values = series.to_numpy()
+        numbers = values.astype(str).astype(np.float64) if dtype == "float32" else values
+        numbers = numbers.astype(object)
+        numbers[np.isnan(values)] = None
+        return numbers.tolist()
+    if dtype.kind in "biu":
+        return series.tolist()
+    return series.to_numpy(dtype=object, na_value=None).tolist()
+
+
+def _unicode_lower(value: Any) -> Any:
+    """SQL ``unicode_lower(x)``: lower() that folds every letter, not just ASCII."""
+    return value.lower() if isinstance(value, str) else value
+
+
+def _tag_rows(tags: pd.Series, first_row: int) -> List[Tuple[int, str, str]]:
+    """(row_id, tag, lower-cased tag) for every tag of a comma-separated tags column."""
+    exploded = tags.reset_index(drop=True).fillna("").astype(str).str.split(",").explode().str.strip()
+    exploded = exploded[exploded != ""]
+    rows = (exploded.index.to_numpy() + first_row).tolist()
+    values = exploded.tolist()
+    return list(zip(rows, values, [value.lower() for value in values]))
+
+
+def _insert(db: sqlite3.Connection, columns: List[str], frame: pd.DataFrame, first_row: int) -> None:
+    frame = frame.reindex(columns=columns)
+    values = [_sql_values(frame[column]) for column in columns]
+    placeholders = ", ".join("?" * (len(columns) + 1))
+    db.executemany(
+        f"INSERT INTO sales VALUES ({placeholders})",
+        zip(range(first_row, first_row + len(frame)), *values),
+    )
+    if "tags" in columns:
+        db.executemany("INSERT INTO sales_tags VALUES (?, ?, ?)", _tag_rows(frame["tags"], first_row))
+    for field, (column, table, _, _) in TEXT_FILTERS.items():
+        if column in columns:
+            db.execute(
+                f"INSERT INTO {table} (rowid, {_quote(column)}) SELECT row_id, {_quote(column)} FROM sales WHERE row_id >= ?",
+                (first_row,),
+            )
+
+
+def _create_indexes(db: sqlite3.Connection, columns: List[str]) -> None:
+    """
+    B-tree indexes for the equality and range filters and the transaction id
+    cursors resume from, two per sort column (nulls last ascending, and
+    descending, both with row_id as the tie breaker) and trigram indexes for
+    the substring filters.
+    """
+    indexed = [*INDEXED_FILTERS.values(), *RANGE_COLUMNS, *SORT_COLUMNS.values(), "transaction_id"]
+    for column in dict.fromkeys(indexed):
+        if column in columns:
+            db.execute(f"CREATE INDEX sales_{column} ON sales ({_quote(column)})")
+    for column in SORT_COLUMNS.values():
+        if column in columns:
+            quoted = _quote(column)
+            db.execute(f"CREATE INDEX sales_{column}_asc ON sales ({quoted} IS NULL, {quoted}, row_id)")
+            db.execute(f"CREATE INDEX sales_{column}_desc ON sales ({quoted} DESC, row_id)")
+    db.execute("CREATE INDEX sales_tags_key ON sales_tags (tag_key, row_id)")
+    db.execute("CREATE INDEX sales_tags_row ON sales_tags (row_id, tag_key)")
+
+
+def _compute_stats(db: sqlite3.Connection, columns: List[str]) -> Dict[str, Any]:
+    """Row count, rows per facet value and range column bounds, saved with the database."""
+    counts: Dict[str, Dict[str, int]] = {}
+    for column in INDEXED_FILTERS.values():
+        if column in columns:
+            rows = db.execute(
+                f"SELECT {_quote(column)}, count(*) FROM sales WHERE {_quote(column)} IS NOT NULL GROUP BY 1"
+            )
+            counts[column] = {str(value): count for value, count in rows}
+    if "tags" in columns:
+        counts["tags"] = {tag: count for tag, count in db.execute("SELECT tag, count(*) FROM sales_tags GROUP BY 1")}
+    ranges = {}
+    for column in RANGE_COLUMNS:
+        if column in columns:
+            low, high, missing = db.execute(
+                f"SELECT min({_quote(column)}), max({_quote(column)}), count(*) - count({_quote(column)}) FROM sales"
+            ).fetchone()
+            ranges[column] = {"min": low, "max": high, "missing": missing}
+    (rows,) = db.execute("SELECT count(*) FROM sales").fetchone()
+    return {"rows": rows, "counts": counts, "ranges": ranges}
+
+
+def _merged_stats(stats: Dict[str, Any], rows: pd.DataFrame) -> Dict[str, Any]:
+    """``stats`` with appended ``rows`` counted in."""
+    merged = copy.deepcopy(stats)
+    merged["rows"] += len(rows)
+    for column, counts in merged["counts"].items():
+        if column == "tags":
+            added = pd.Series([tag for _, tag, _ in _tag_rows(rows[column], 0)], dtype=object).value_counts()
+        else:
+            added = rows[column].dropna().astype(str).value_counts()
+        for value, count in added.items():
+            counts[value] = counts.get(value, 0) + int(count)
+    for column, bounds in merged["ranges"].items():
+        values = [value for value in _sql_values(rows[column]) if value is not None]
+        bounds["missing"] += len(rows) - len(values)
+        if values:
+            bounds["min"] = min(values) if bounds["min"] is None else min(bounds["min"], min(values))
+            bounds["max"] = max(values) if bounds["max"] is None else max(bounds["max"], max(values))
+    return merged
+
+
+def _write_meta(db: sqlite3.Connection, **values: Any) -> None:
+    db.executemany(
+        "INSERT OR REPLACE INTO sales_meta VALUES (?, ?)",
+        [(key, json.dumps(value)) for key, value in values.items()],
+    )
+
+
+def _read_meta(db: sqlite3.Connection) -> Dict[str, Any]:
+    return {key: json.loads(value) for key, value in db.execute("SELECT key, value FROM sales_meta")}
+
+
+def _stored_meta(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        db = sqlite3.connect(path)
+        try:
+            return _read_meta(db)
+        finally:
+            db.close()
+    except (sqlite3.Error, ValueError):
+        return None
+
+
+def build_database(path: Path, stamp: Dict[str, int], chunks: Iterable[pd.DataFrame]) -> None:
+    """
+    Load the dataset into a new SQLite database at ``path``, one chunk of
+    normalized rows at a time, so the CSV never has to fit in memory. Built
+    under a temporary name and swapped in whole.
+    """
+    staging = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    staging.unlink(missing_ok=True)
+    db = sqlite3.connect(staging)
+    try:
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_MB * 1024}")
+        db.execute("CREATE TABLE sales_meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE sales_tags (row_id INTEGER, tag TEXT, tag_key TEXT)")
+        columns: Optional[List[str]] = None
+        rows = 0
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.columns)
+                definitions = ", ".join(f"{_quote(c)} {_sql_type(chunk[c].dtype)}" for c in columns)
+                db.execute(f"CREATE TABLE sales (row_id INTEGER PRIMARY KEY, {definitions})")
+                for field, (column, table, tokenizer, _) in TEXT_FILTERS.items():
+                    if column in columns:
+                        db.execute(
+                            f"CREATE VIRTUAL TABLE {table} USING fts5({_quote(column)}, content='sales', "
+                            f"content_rowid='row_id', tokenize='{tokenizer}')"
+                        )
+            _insert(db, columns, chunk, rows)
+            rows += len(chunk)
+        if columns is None:
+            raise ValueError("Dataset CSV has no header")
+        _create_indexes(db, columns)
+        _write_meta(
+            db,
+            schema=SQLITE_SCHEMA_VERSION,
+            source=stamp,
+            columns=columns,
+            stats=_compute_stats(db, columns),
+        )
+        db.execute("ANALYZE")
+        db.commit()
+    finally:
+        db.close()
+    os.replace(staging, path)
+
+
+class ColumnRange:
+    """Bounds of a range column as saved with the database (dates as YYYY-MM-DD)."""
+
+    def __init__(self, bounds: Dict[str, Any]):
+        self.min = bounds["min"]
+        self.max = bounds["max"]
+        self.missing = bounds["missing"]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"min": self.min, "max": self.max, "missing": self.missing}
+
+
+class SqliteEngine:
+    """
+    Sales queries answered by an on-disk SQLite database built from the CSV.
+
+    A drop-in alternative to the in-memory SalesEngine for datasets larger
+    than RAM: filters, sorting, paging, counts, facets and aggregates are
+    pushed down into SQL and served from indexes, so a worker only holds the
+    rows of the page it returns plus SQLite's page cache. Workers on the same
+    host share the database file.
+    """
+
+    def __init__(self, path: Path, meta: Dict[str, Any]):
+        self.path = path
+        self.columns: List[str] = meta["columns"]
+        # Per-thread read connections, shared with the handles append() derives
+        self._local = threading.local()
+        self._load_meta(meta)
+
+    def _load_meta(self, meta: Dict[str, Any]) -> None:
+        self.source: Optional[Dict[str, int]] = meta["source"]
+        self.stats: Dict[str, Any] = meta["stats"]
+        self.size: int = self.stats["rows"]
+        self.version = next(_versions)
+        self.count_cache = QueryCache(SQLITE_COUNT_CACHE_ENTRIES)
+        self.value_stats: Dict[str, ValueStats] = {
+            column: ValueStats(counts, self.size) for column, counts in self.stats["counts"].items()
+        }
+        self.range_stats: Dict[str, ColumnRange] = {
+            column: ColumnRange(bounds) for column, bounds in self.stats["ranges"].items()
+        }
+
+    @classmethod
+    def open(cls, csv_path: Path, read_chunks: Callable[[], Iterable[pd.DataFrame]]) -> "SqliteEngine":
+        """
+        The database for the dataset at ``csv_path``, (re)built from
+        ``read_chunks()`` first when it is missing, was built by an older
+        schema version or no longer matches the CSV's mtime and size.
+        """
+        path = database_path(csv_path)
+        stamp = source_stamp(csv_path)
+        meta = _stored_meta(path)
+        if meta is None or meta.get("schema") != SQLITE_SCHEMA_VERSION or meta.get("source") != stamp:
+            print(f"Building SQLite database {path}...")
+            start = time.perf_counter()
+            build_database(path, stamp, read_chunks())
+            meta = _stored_meta(path)
+            print(f"Loaded {meta['stats']['rows']} rows into {path} in {time.perf_counter() - start:.1f}s")
+        return cls(path, meta)
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        db.create_function("unicode_lower", 1, _unicode_lower, deterministic=True)
+        db.execute("PRAGMA query_only = 1")
+        db.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_MB * 1024}")
+        return db
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """This thread's read connection."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def disk_usage(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+    def append(self, rows: pd.DataFrame, source: Optional[Dict[str, int]] = None) -> "SqliteEngine":
+        """
+        New handle on the database with ``rows`` (already normalized) appended,
+        recording ``source`` as the CSV state it now reflects. Rows and source
+        are written in one transaction, and only if the database is still at
+        this handle's source: when another worker sharing the file already
+        caught up, nothing is inserted and the handle shows the database as is.
+        """
+        db = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            meta = _read_meta(db)
+            if meta["source"] == self.source and meta["stats"]["rows"] == self.size:
+                _insert(db, self.columns, rows, self.size)
+                meta["stats"] = _merged_stats(meta["stats"], rows)
+                meta["source"] = source if source is not None else self.source
+                _write_meta(db, source=meta["source"], stats=meta["stats"])
+            db.execute("COMMIT")
+        finally:
+            db.close()
+        handle = copy.copy(self)
+        handle._load_meta(meta)
+        return handle
+
+    def _clauses(self, params: SalesQuery, by_row: bool = False) -> Dict[str, Tuple[str, List[Any]]]:
+        """
+        One SQL condition (with its arguments) per active SalesQuery filter,
+        keyed by field. Text and tag filters select their matches through the
+        trigram and tag indexes, or test a single row when ``by_row`` is set.
+        """
+        columns = self.columns
+        clauses: Dict[str, Tuple[str, List[Any]]] = {}
+
+        for field, (column, table, _, operator) in TEXT_FILTERS.items():
+            needle = getattr(params, field)
+            if not needle or column not in columns:
+                continue
+            # LIKE and lower() only fold ASCII letters; other needles are matched with Python's lower()
+            ascii_case = operator != "LIKE" or needle.isascii()
+            indexed = len(needle) >= TRIGRAM and not any(c in needle for c in WILDCARDS[operator])
+            if not by_row and indexed and ascii_case:
+                pattern = f"%{needle}%" if operator == "LIKE" else f"*{needle}*"
+                clauses[field] = (f"row_id IN (SELECT rowid FROM {table} WHERE {_quote(column)} {operator} ?)", [pattern])
+            elif operator == "LIKE":
+                lower = "lower" if ascii_case else "unicode_lower"
+                clauses[field] = (f"instr({lower}({_quote(column)}), ?) > 0", [needle.lower()])
+            else:
+                clauses[field] = (f"instr({_quote(column)}, ?) > 0", [needle])
+
+        for field, column in INDEXED_FILTERS.items():
+            values = getattr(params, field)
+            if values and column in columns:
+                values = list(dict.fromkeys(values))
+                clauses[field] = (f"{_quote(column)} IN ({', '.join('?' * len(values))})", values)
+
+        if "age" in columns:
+            if params.age_min is not None:
+                clauses["age_min"] = ("age >= ?", [params.age_min])
+            if params.age_max is not None:
+                clauses["age_max"] = ("age <= ?", [params.age_max])
+
+        if params.tag and "tags" in columns:
+            keys = list(dict.fromkeys(tag.strip().lower() for tag in params.tag))
+            placeholders = ", ".join("?" * len(keys))
+            if by_row:
+                condition = f"EXISTS (SELECT 1 FROM sales_tags WHERE sales_tags.row_id = sales.row_id AND tag_key IN ({placeholders}))"
+            else:
+                condition = f"row_id IN (SELECT row_id FROM sales_tags WHERE tag_key IN ({placeholders}))"
+            clauses["tag"] = (condition, keys)
+
+        if "date" in columns:
+            # Days are stored as YYYY-MM-DD text, which compares in date order
+            if params.date_from:
+                clauses["date_from"] = ("\"date\" >= ?", [params.date_from.isoformat()])
+            if params.date_to:
+                clauses["date_to"] = ("\"date\" <= ?", [params.date_to.isoformat()])
+        return clauses
+
+    @staticmethod
+    def _where(clauses: Dict[str, Tuple[str, List[Any]]], extra: Iterable[Tuple[str, List[Any]]] = (), skip: Optional[str] = None) -> Tuple[str, List[Any]]:
+        conditions, args = [], []
+        for field, (condition, values) in itertools.chain(clauses.items(), ((None, item) for item in extra)):
+            if field is not None and field == skip:
+                continue
+            conditions.append(condition)
+            args.extend(values)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), args
+
+    def _order(self, params: SalesQuery) -> Tuple[str, Optional[str]]:
+        """ORDER BY clause for the requested sort, and the index that yields rows in that order."""
+        column = SORT_COLUMNS.get(params.sort_by, "date")
+        if column not in self.columns:
+            return "row_id", None
+        quoted = _quote(column)
+        # SQLite sorts NULL first ascending; the engine puts missing values last both ways
+        if params.order == "asc":
+            return f"{quoted} IS NULL, {quoted}, row_id", f"sales_{column}_asc"
+        return f"{quoted} DESC, row_id", f"sales_{column}_desc"
+
+    def _source(
+        self,
+        params: SalesQuery,
+        clauses: Dict[str, Tuple[str, List[Any]]],
+        total: int,
+        wanted: int,
+        index: Optional[str],
+    ) -> Tuple[str, Dict[str, Tuple[str, List[Any]]]]:
+        """
+        FROM clause and filter conditions for reading the first ``wanted``
+        matches in sort order. The sort index is pinned when walking it and
+        testing every row reaches them sooner than SQLite's usual plan for
+        filtered queries, which collects all matches through a filter index
+        and sorts them; with the exact count at hand, the walk reads about
+        ``wanted * size / total`` rows. Text and tag filters are then checked
+        on each row read instead of being looked up in full first.
+        """
+        if index is not None and clauses and total and wanted * self.size / total < total:
+            return f" FROM sales INDEXED BY {index}", self._clauses(params, by_row=True)
+        return " FROM sales", clauses
+
+    def _select(self) -> str:
+        return "SELECT row_id, " + ", ".join(_quote(column) for column in self.columns)
+
+    def _frame(self, rows: List[Tuple[Any, ...]]) -> pd.DataFrame:
+        """Rows as an object-dtype frame indexed by row id, ready for frame_to_records."""
+        return pd.DataFrame(
+            [row[1:] for row in rows],
+            index=pd.Index([row[0] for row in rows], dtype=np.int64),
+            columns=self.columns,
+            dtype=object,
+        )
+
+    def _count(self, clauses: Dict[str, Tuple[str, List[Any]]], params: SalesQuery) -> int:
+        if not clauses:
+            return self.size
+        key = filter_key(params)
+        total = self.count_cache.get(key)
+        if total is None:
+            where, args = self._where(clauses)
+            (total,) = self.db.execute(f"SELECT count(*) FROM sales{where}", args).fetchone()
+            self.count_cache.set(key, total, 64)
+        return total
+
+    def _page_sql(self, params: SalesQuery, clauses: Dict[str, Tuple[str, List[Any]]], total: int) -> Tuple[str, List[Any]]:
+        order_by, index = self._order(params)
+        start = (params.page - 1) * params.page_size
+        source, clauses = self._source(params, clauses, total, start + params.page_size, index)
+        where, args = self._where(clauses)
+        return f"{self._select()}{source}{where} ORDER BY {order_by} LIMIT ? OFFSET ?", args + [params.page_size, start]
+
+    def query(self, params: SalesQuery) -> Tuple[pd.DataFrame, int]:
+        """Filter, sort and paginate in SQL. Returns (page rows, total matching rows)."""
+        clauses = self._clauses(params)
+        with stage("count"):
+            total = self._count(clauses, params)
+        with stage("query"):
+            sql, args = self._page_sql(params, clauses, total)
+            rows = self.db.execute(sql, args).fetchall() if total else []
+        with stage("paginate"):
+            return self._frame(rows), total
+
+    def _cursor_row(self, cursor: Cursor) -> int:
+        """
+        The row id a cursor stopped at: its recorded row while that row still
+        holds the cursor's transaction, else the first row with that id.
+        """
+        transaction_id = cursor.transaction_id
+        if "transaction_id" not in self.columns:
+            try:
+                row = int(transaction_id)
+            except (TypeError, ValueError):
+                row = -1
+        else:
+            found = None
+            if cursor.row is not None:
+                found = self.db.execute(
+                    "SELECT row_id FROM sales WHERE row_id = ? AND transaction_id = ?", [cursor.row, transaction_id]
+                ).fetchone()
+            if found is None:
+                found = self.db.execute(
+                    "SELECT row_id FROM sales WHERE transaction_id = ? ORDER BY row_id LIMIT 1", [transaction_id]
+                ).fetchone()
+            row = found[0] if found else -1
+        if not 0 <= row < self.size:
+            raise ValueError("Invalid cursor")
+        return row
+
+    def _resume_after(self, params: SalesQuery, row: int) -> List[Tuple[str, List[Any], str, Optional[str]]]:
+        """
+        Conditions, in order, selecting the rows that follow the cursor row in
+        sort order, each with the ORDER BY and index it is read in: the rest of
+        the cursor's tie group, then strictly later values, then missing
+        values. Each one is an index range, so a page costs the same at any depth.
+        """
+        column = SORT_COLUMNS.get(params.sort_by, "date")
+        if column not in self.columns:
+            return [("row_id > ?", [row], "row_id", None)]
+        quoted = _quote(column)
+        (value,) = self.db.execute(f"SELECT {quoted} FROM sales WHERE row_id = ?", [row]).fetchone()
+        if value is None:
+            return [(f"{quoted} IS NULL AND row_id > ?", [row], "row_id", None)]
+        if params.order == "asc":
+            later = (f"{quoted} > ?", [value], f"{quoted}, row_id", f"sales_{column}")
+        else:
+            later = (f"{quoted} < ?", [value], *self._order(params))
+        return [
+            (f"{quoted} = ? AND row_id > ?", [value, row], "row_id", None),
+            later,
+            (f"{quoted} IS NULL", [], "row_id", None),
+        ]
+
+    def query_keyset(self, params: SalesQuery) -> Tuple[pd.DataFrame, int, Optional[str]]:
+        """
+        Cursor pagination: the cursor's row is looked up and the
+        read resumes right after it through the sort index. The total is
+        counted on the first page and carried forward in the cursor.
+        """
+        cursor = decode_cursor(params.cursor) if params.cursor else None
+        clauses = self._clauses(params)
+        if cursor is not None and cursor.total is not None:
+            total = cursor.total
+        else:
+            with stage("count"):
+                total = self._count(clauses, params)
+
+        # Fetch one extra row to know whether another page follows
+        limit = params.page_size + 1
+        with stage("query"):
+            if cursor is None:
+                segments = [("1", [], *self._order(params))]
+            else:
+                segments = self._resume_after(params, self._cursor_row(cursor))
+            rows: List[Tuple[Any, ...]] = []
+            for condition, values, order_by, index in segments:
+                source, conditions = self._source(params, clauses, total, limit, index)
+                where, args = self._where(conditions, [(condition, values)])
+                sql = f"{self._select()}{source}{where} ORDER BY {order_by} LIMIT ?"
+                rows.extend(self.db.execute(sql, args + [limit - len(rows)]).fetchall())
+                if len(rows) >= limit:
+                    break
+
+        page = self._frame(rows[:params.page_size])
+        next_cursor = None
+        if len(rows) > params.page_size:
+            last = page.iloc[-1]
+            column = SORT_COLUMNS.get(params.sort_by, "date")
+            sort_value = last[column] if column in self.columns else None
+            transaction_id = last["transaction_id"] if "transaction_id" in self.columns else int(page.index[-1])
+            next_cursor = encode_cursor(sort_value, transaction_id, total, row=int(page.index[-1]))
+        return page, total, next_cursor
+
+    def facet_counts(self, params: SalesQuery) -> Dict[str, Dict[str, int]]:
+        """
+        Per-value row counts for every facet under the current filters, each
+        facet ignoring its own filter, as one GROUP BY per facet.
+        """
+        clauses = self._clauses(params)
+        facets: Dict[str, Dict[str, int]] = {}
+        for field, column in FACETS.items():
+            stats = self.value_stats.get(column)
+            if stats is None:
+                continue
+            where, args = self._where(clauses, skip=field)
+            if not where:
+                facets[field] = dict(stats.counts)
+                continue
+            if column == "tags":
+                sql = f"SELECT tag, count(*) FROM sales_tags WHERE row_id IN (SELECT row_id FROM sales{where}) GROUP BY 1"
+            else:
+                sql = f"SELECT {_quote(column)}, count(*) FROM sales{where} GROUP BY 1"
+            counts = dict.fromkeys(stats.counts, 0)
+            for value, count in self.db.execute(sql, args):
+                if value is not None:
+                    counts[str(value)] = count
+            facets[field] = counts
+        return facets
+
+    def explain(self, params: SalesQuery) -> Dict[str, Any]:
+        """SQLite's query plans for the page and the count, and what running them took."""
+        clauses = self._clauses(params)
+        where, args = self._where(clauses)
+        count_sql = f"SELECT count(*) FROM sales{where}"
+        start = time.perf_counter()
+        (matched,) = self.db.execute(count_sql, args).fetchone()
+        count_ms = (time.perf_counter() - start) * 1000
+        page_sql, page_args = self._page_sql(params, clauses, matched)
+        start = time.perf_counter()
+        self.db.execute(page_sql, page_args).fetchall()
+        page_ms = (time.perf_counter() - start) * 1000
+        return {
+            "backend": "sqlite",
+            "rows": self.size,
+            "matched": matched,
+            "filters": list(clauses),
+            "page": {
+                "sql": page_sql,
+                "plan": [detail for *_, detail in self.db.execute("EXPLAIN QUERY PLAN " + page_sql, page_args)],
+                "ms": round(page_ms, 3),
+            },
+            "count": {
+                "sql": count_sql,
+                "plan": [detail for *_, detail in self.db.execute("EXPLAIN QUERY PLAN " + count_sql, args)],
+                "ms": round(count_ms, 3),
+            },
+        }
+
+    def distinct_values(self, column: str) -> List[str]:
+        stats = self.value_stats.get(column)
+        if stats is not None:
+            return sorted(stats.counts)
+        if column not in self.columns:
+            return []
+        rows = self.db.execute(f"SELECT DISTINCT {_quote(column)} FROM sales WHERE {_quote(column)} IS NOT NULL")
+        return sorted(str(value) for value, in rows)
+
+    def tag_values(self) -> List[str]:
+        stats = self.value_stats.get("tags")
+        return sorted(stats.counts) if stats else []
+
+    def iter_batches(self, params: SalesQuery, batch_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        The full filtered and sorted result in frames of ``batch_rows`` rows,
+        read from one SQL cursor as the export is consumed. Always yields at
+        least one (possibly empty) frame.
+        """
+        where, args = self._where(self._clauses(params))
+        # Its own connection: a streamed export resumes on whichever thread is free
+        db = self._connect(check_same_thread=False)
+        try:
+            cursor = db.execute(f"{self._select()} FROM sales{where} ORDER BY {self._order(params)[0]}", args)
+            rows = cursor.fetchmany(batch_rows)
+            yield self._frame(rows)
+            while len(rows) == batch_rows:
+                rows = cursor.fetchmany(batch_rows)
+                if rows:
+                    yield self._frame(rows)
+        finally:
+            db.close()
+
+    def aggregate(self, params: AggregateQuery) -> Tuple[List[Dict[str, Any]], str]:
+        """Grouped sums, counts and averages computed by a single GROUP BY. Returns (rows, "sqlite")."""
+        groups = [TIME_BUCKETS[name] if name in TIME_GRAINS else _quote(ROLLUP_DIMENSIONS[name]) for name in params.group_by]
+        measures = [m for m in MEASURES if m in self.columns]
+        # total() is 0.0 rather than NULL for groups with no values, like pandas' sum
+        selects = groups + [f"total({_quote(m)})" for m in measures] + ["count(*)"]
+        where, args = self._where(self._clauses(params))
+        sql = f"SELECT {', '.join(selects)} FROM sales{where}"
+        if groups:
+            sql += " GROUP BY " + ", ".join(str(i + 1) for i in range(len(groups)))
+        frame = pd.DataFrame(self.db.execute(sql, args).fetchall(), columns=params.group_by + measures + [COUNT])
+        for name in params.group_by:
+            if name in TIME_GRAINS:
+                frame[name] = pd.to_datetime(frame[name])
+        return summarize(frame, params.group_by), "sqlite"
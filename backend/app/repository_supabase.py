@@ -1,27 +1,51 @@
-from typing import List, Tuple, Dict, Any
-from functools import lru_cache
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple, Dict, Any
 
-import pandas as pd
 from postgrest import APIResponse
 
+from .cache import CACHE_TTL_SUPABASE, QueryCache, filter_key
 from .data_loader import get_supabase_client
-from .models import SalesQuery
+from .metrics import cache_samples, registry, stage
+from .models import AggregateQuery, SalesQuery
+from .pagination import Cursor, decode_cursor, encode_cursor
+from .rollups import MEASURES
+from .supabase_async import SUPABASE_UNREACHABLE, run_supabase
+from .utils import tag_pattern
 
 
-def query_supabase(params: SalesQuery) -> Tuple[List[Dict[str, Any]], int]:
-    """
-    Query Supabase directly with filters, sorting, and pagination.
-    Returns (list of dicts, total_count).
-    """
-    supabase = get_supabase_client()
-    
-    if not supabase:
-        # Fallback to old method if Supabase not configured
-        return [], 0
-    
-    # Start building the query
-    # Optimization: Use 'planned' count for unfiltered queries to avoid full table scan
-    # 'exact' count is slow on large tables. 'planned' uses Postgres statistics (instant).
+# How /api/sales totals are computed on Supabase:
+#   auto                         exact when filtered, planned otherwise, inline with the page
+#   exact | planned | estimated  that PostgREST count method, inline with the page
+#   capped                       probe up to SUPABASE_COUNT_CAP ids next to the page fetch
+#   parallel                     planned estimate inline while an exact count runs alongside
+COUNT_MODES = {"auto", "exact", "planned", "estimated", "capped", "parallel"}
+SUPABASE_COUNT_MODE = os.getenv("SUPABASE_COUNT_MODE", "auto").lower()
+if SUPABASE_COUNT_MODE not in COUNT_MODES:
+    print(f"Unknown SUPABASE_COUNT_MODE {SUPABASE_COUNT_MODE!r}, using 'auto'")
+    SUPABASE_COUNT_MODE = "auto"
+SUPABASE_COUNT_CAP = int(os.getenv("SUPABASE_COUNT_CAP", "10000"))
+SUPABASE_COUNT_TIMEOUT = float(os.getenv("SUPABASE_COUNT_TIMEOUT", "30"))
+
+# Filter signature -> (total, exact)
+count_cache = QueryCache(ttl=CACHE_TTL_SUPABASE)
+# Distinct filter values; also cleared whenever rows are ingested
+SUPABASE_META_TTL = float(os.getenv("SUPABASE_META_TTL", "600"))
+meta_cache = QueryCache(max_entries=1, ttl=SUPABASE_META_TTL)
+_background_counts: Dict[str, "asyncio.Task"] = {}
+registry.register_collector(
+    lambda: cache_samples("supabase_count", count_cache.stats()) + cache_samples("supabase_meta", meta_cache.stats())
+)
+
+SORT_COLUMNS = {
+    "date": "date",
+    "quantity": "quantity",
+    "customer_name": "customer_name",
+}
+
+
+def has_filters(params: SalesQuery) -> bool:
     def has_value(value: Any) -> bool:
         if value is None:
             return False
@@ -29,17 +53,16 @@ def query_supabase(params: SalesQuery) -> Tuple[List[Dict[str, Any]], int]:
             return len(value) > 0
         return bool(value)
 
-    has_filters = any([
+    return any([
         params.customer_name, params.phone, has_value(params.region), has_value(params.gender),
         params.age_min is not None, params.age_max is not None,
         has_value(params.product_category), has_value(params.tag), has_value(params.payment_method),
         params.date_from, params.date_to
     ])
-    
-    count_method = "exact" if has_filters else "planned"
-    query = supabase.table("sales").select("*", count=count_method)
-    
-    # Apply filters
+
+
+def apply_supabase_filters(query, params: SalesQuery):
+    """Push every SalesQuery filter down into a PostgREST query builder."""
     if params.customer_name:
         query = query.ilike("customer_name", f"%{params.customer_name}%")
     
@@ -66,8 +89,8 @@ def query_supabase(params: SalesQuery) -> Tuple[List[Dict[str, Any]], int]:
 
     tags = params.tag or []
     if tags:
-        tag_filters = ",".join([f"tags.ilike.%{tag}%" for tag in tags])
-        query = query.or_(tag_filters)
+        # Whole-tag match, case-insensitive regex (~*)
+        query = query.filter("tags", "imatch", tag_pattern(tags))
 
     methods = params.payment_method or []
     if methods:
@@ -78,14 +101,47 @@ def query_supabase(params: SalesQuery) -> Tuple[List[Dict[str, Any]], int]:
     
     if params.date_to:
         query = query.lte("date", params.date_to)
+
+    return query
+
+
+def default_count_method(params: SalesQuery) -> str:
+    # Optimization: Use 'planned' count for unfiltered queries to avoid full table scan
+    # 'exact' count is slow on large tables. 'planned' uses Postgres statistics (instant).
+    return "exact" if has_filters(params) else "planned"
+
+
+def _rows(response: APIResponse) -> List[Dict[str, Any]]:
+    """
+    The rows of a PostgREST response. Anything else, e.g. a gateway's HTML page
+    sent with status 200, raises TypeError so callers fall back as on any failure.
+    """
+    data = response.data
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise TypeError(f"Unexpected Supabase response: {type(data).__name__} instead of a list of rows")
+    return data
+
+
+def query_supabase(params: SalesQuery, count_method: Optional[str] = "auto") -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Query Supabase directly with filters, sorting, and pagination.
+    ``count_method`` is a PostgREST count method, "auto" for the default or
+    None to skip counting. Returns (list of dicts, total_count or None).
+    """
+    supabase = get_supabase_client()
+    
+    if not supabase:
+        # Fallback to old method if Supabase not configured
+        return [], 0
+    
+    # Start building the query
+    if count_method == "auto":
+        count_method = default_count_method(params)
+    query = supabase.table("sales").select("*", count=count_method)
+    query = apply_supabase_filters(query, params)
     
     # Apply sorting
-    column_map = {
-        "date": "date",
-        "quantity": "quantity",
-        "customer_name": "customer_name",
-    }
-    sort_column = column_map.get(params.sort_by, "date")
+    sort_column = SORT_COLUMNS.get(params.sort_by, "date")
     ascending = params.order == "asc"
     query = query.order(sort_column, desc=not ascending)
     
@@ -95,27 +151,425 @@ def query_supabase(params: SalesQuery) -> Tuple[List[Dict[str, Any]], int]:
     query = query.range(start, end)
     
     # Execute query
-    response: APIResponse = query.execute()
+    with stage("supabase.execute"):
+        response: APIResponse = query.execute()
     
     # Get total count
     total = response.count if hasattr(response, 'count') else 0
     
-    return response.data, total
+    return _rows(response), total
+
+
+def _quote(value: Any) -> str:
+    """Quote a value for use inside a PostgREST or=(...) expression."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def apply_keyset(query, sort_column: str, descending: bool, cursor: Cursor):
+    """Only keep rows after the cursor in (sort_column, transaction_id) order, nulls last."""
+    op = "lt" if descending else "gt"
+    if cursor.sort_value is None:
+        # Already inside the trailing block of NULL sort values
+        return query.is_(sort_column, "null").filter("transaction_id", op, cursor.transaction_id)
+    value, tid = _quote(cursor.sort_value), _quote(cursor.transaction_id)
+    return query.or_(
+        f"{sort_column}.{op}.{value},"
+        f"and({sort_column}.eq.{value},transaction_id.{op}.{tid}),"
+        f"{sort_column}.is.null"
+    )
+
+
+def query_supabase_keyset(
+    params: SalesQuery, count_method: Optional[str] = "auto"
+) -> Tuple[List[Dict[str, Any]], Optional[int], Optional[Dict[str, Any]]]:
+    """
+    Keyset (cursor) pagination: seek past the cursor's (sort value, transaction_id)
+    instead of using an offset, so deep pages cost the same as the first one.
+    Returns (list of dicts, total_count or None, last row if another page follows).
+    """
+    supabase = get_supabase_client()
+
+    if not supabase:
+        return [], 0, None
+
+    if count_method == "auto":
+        count_method = default_count_method(params)
+    cursor = decode_cursor(params.cursor) if params.cursor else None
+    sort_column = SORT_COLUMNS.get(params.sort_by, "date")
+    descending = params.order != "asc"
+
+    query = supabase.table("sales").select("*", count=count_method)
+    query = apply_supabase_filters(query, params)
+    if cursor is not None:
+        query = apply_keyset(query, sort_column, descending, cursor)
+    query = query.order(sort_column, desc=descending, nullsfirst=False).order("transaction_id", desc=descending)
+    # One extra row tells us whether another page follows
+    with stage("supabase.execute"):
+        response: APIResponse = query.limit(params.page_size + 1).execute()
+
+    data = _rows(response)
+    rows = data[:params.page_size]
+    last = rows[-1] if len(data) > params.page_size else None
+    return rows, response.count, last
+
+
+def export_supabase_batch(params: SalesQuery, after: Optional[Cursor], limit: int) -> List[Dict[str, Any]]:
+    """
+    Up to ``limit`` rows following ``after`` in the query's keyset order, for
+    exports. The caller stops at the first empty batch rather than trusting a
+    short one, since PostgREST may cap rows per request below ``limit``.
+    """
+    token = encode_cursor(after.sort_value, after.transaction_id, None) if after else None
+    batch = params.model_copy(update={"page_size": limit, "cursor": token})
+    rows, _, _ = query_supabase_keyset(batch, None)
+    return rows
+
+
+def next_export_cursor(params: SalesQuery, rows: List[Dict[str, Any]]) -> Cursor:
+    last = rows[-1]
+    return Cursor(last.get(SORT_COLUMNS.get(params.sort_by, "date")), last.get("transaction_id"), None)
+
+
+def count_supabase(params: SalesQuery, method: str) -> Tuple[int, bool]:
+    """
+    Count the rows matching the filters on their own, without fetching a page.
+    ``method`` is a PostgREST count method or "capped", which reads at most
+    SUPABASE_COUNT_CAP + 1 ids. Returns (total, whether the total is exact).
+    """
+    supabase = get_supabase_client()
+
+    if not supabase:
+        return 0, True
+
+    if method == "capped":
+        query = apply_supabase_filters(supabase.table("sales").select("transaction_id"), params)
+        with stage("supabase.count"):
+            matched = len(_rows(query.limit(SUPABASE_COUNT_CAP + 1).execute()))
+        return min(matched, SUPABASE_COUNT_CAP), matched <= SUPABASE_COUNT_CAP
+
+    query = supabase.table("sales").select("transaction_id", count=method, head=True)
+    with stage("supabase.count"):
+        response: APIResponse = apply_supabase_filters(query, params).execute()
+    return response.count or 0, method == "exact"
+
+
+async def _exact_count_in_background(signature: str, params: SalesQuery) -> Optional[Tuple[int, bool]]:
+    try:
+        result = await run_supabase(count_supabase, params, "exact", timeout=SUPABASE_COUNT_TIMEOUT)
+        count_cache.set(signature, result)
+        return result
+    except Exception as e:
+        print(f"Background exact count failed: {e!r}")
+        return None
+    finally:
+        _background_counts.pop(signature, None)
+
+
+def _background_count(signature: str, params: SalesQuery) -> "asyncio.Task":
+    # One exact count per filter signature, however many pages ask for it
+    task = _background_counts.get(signature)
+    if task is None:
+        task = asyncio.create_task(_exact_count_in_background(signature, params))
+        _background_counts[signature] = task
+    return task
+
+
+async def query_supabase_async(
+    params: SalesQuery,
+) -> Tuple[List[Dict[str, Any]], int, bool, Optional[str]]:
+    """
+    Fetch a page and its total as separate stages, using SUPABASE_COUNT_MODE to
+    decide how the total is computed. Totals are cached per filter signature,
+    so later pages and re-sorts of the same filters skip counting entirely.
+    Returns (list of dicts, total_count, total_is_exact, next_cursor).
+    """
+    mode = SUPABASE_COUNT_MODE
+    signature = filter_key(params)
+    known: Optional[Tuple[int, bool]] = count_cache.get(signature)
+    cursor = decode_cursor(params.cursor) if params.cursor else None
+    if known is None and cursor is not None and cursor.total is not None:
+        known = (cursor.total, cursor.total_exact)
+
+    fetch = query_supabase_keyset if params.pagination == "cursor" else query_supabase
+
+    if known is not None:
+        page = await run_supabase(fetch, params, None)
+        total, exact = known
+    elif mode == "capped":
+        page, (total, exact) = await asyncio.gather(
+            run_supabase(fetch, params, None),
+            run_supabase(count_supabase, params, "capped"),
+        )
+        count_cache.set(signature, (total, exact))
+    elif mode == "parallel":
+        # Planned estimate rides along with the page; the exact count runs
+        # alongside it and is used if it finishes first, else cached for later pages
+        task = _background_count(signature, params)
+        page = await run_supabase(fetch, params, "planned")
+        result = task.result() if task.done() else None
+        total, exact = result if result is not None else (page[1] or 0, False)
+    else:
+        method = "auto" if mode == "auto" else mode
+        page = await run_supabase(fetch, params, method)
+        total = page[1] or 0
+        exact = (default_count_method(params) if mode == "auto" else mode) == "exact"
+        count_cache.set(signature, (total, exact))
+
+    next_cursor = None
+    if params.pagination == "cursor" and page[2] is not None:
+        sort_column = SORT_COLUMNS.get(params.sort_by, "date")
+        last = page[2]
+        next_cursor = encode_cursor(last.get(sort_column), last.get("transaction_id"), total, exact)
+    return page[0], total, exact, next_cursor
+
+
+def _sql_literal(value: Any) -> str:
+    """
+    ``value`` as a Postgres string constant, for SQL sent through exec_sql,
+    which takes no bind parameters. Dollar quoting with a tag the value doesn't
+    contain needs no escaping and reads the same whatever
+    standard_conforming_strings is set to, so quotes and backslashes in user
+    input stay data. NUL can't be in a Postgres string at all and is refused.
+    """
+    text = str(value)
+    if "\0" in text:
+        raise ValueError("Filter values cannot contain NUL characters")
+    tag = "$v$"
+    n = 0
+    while tag in text or text.endswith(tag[:-1]):
+        n += 1
+        tag = f"$v{n}$"
+    return f"{tag}{text}{tag}"
+
+
+def _sql_in(column: str, values: List[str]) -> str:
+    return f"{column} IN ({', '.join(_sql_literal(value) for value in values)})"
+
+
+def sql_where(params: SalesQuery, exclude: Iterable[str] = ()) -> str:
+    """
+    The SalesQuery filters as a SQL boolean expression, for queries sent through
+    exec_sql. Filters named in ``exclude`` (SalesQuery field names) are left out.
+    """
+    skipped = set(exclude)
+    conditions = []
+
+    def add(field: str, condition: str) -> None:
+        if field not in skipped:
+            conditions.append(condition)
+
+    if params.customer_name:
+        add("customer_name", f"customer_name ILIKE {_sql_literal('%' + params.customer_name + '%')}")
+    if params.phone:
+        add("phone", f"phone_number ILIKE {_sql_literal('%' + params.phone + '%')}")
+    if params.region:
+        add("region", _sql_in("customer_region", params.region))
+    if params.gender:
+        add("gender", _sql_in("gender", params.gender))
+    if params.age_min is not None:
+        add("age_min", f"age >= {int(params.age_min)}")
+    if params.age_max is not None:
+        add("age_max", f"age <= {int(params.age_max)}")
+    if params.product_category:
+        add("product_category", _sql_in("product_category", params.product_category))
+    if params.tag:
+        add("tag", f"tags ~* {_sql_literal(tag_pattern(params.tag))}")
+    if params.payment_method:
+        add("payment_method", _sql_in("payment_method", params.payment_method))
+    if params.date_from:
+        add("date_from", f"date >= {_sql_literal(params.date_from.isoformat())}")
+    if params.date_to:
+        add("date_to", f"date <= {_sql_literal(params.date_to.isoformat())}")
+    return " AND ".join(conditions) or "TRUE"
+
+
+def _rpc_json(result: APIResponse) -> Any:
+    """Unwrap the single JSON value returned by the exec_sql RPC."""
+    data = result.data
+    if isinstance(data, list):
+        if len(data) != 1:
+            raise ValueError("Unexpected RPC response format")
+        data = data[0]
+    if isinstance(data, dict) and len(data) == 1:
+        data = next(iter(data.values()))
+    return data
+
+
+AGGREGATE_SQL_GROUPS = {
+    "region": "customer_region",
+    "category": "product_category",
+    "payment_method": "payment_method",
+    "store": "store_id",
+    "day": "date_trunc('day', date)::date",
+    "week": "date_trunc('week', date)::date",
+    "month": "date_trunc('month', date)::date",
+}
+
+
+def aggregate_supabase(params: AggregateQuery) -> List[Dict[str, Any]]:
+    """Grouped sums, counts and averages computed by Postgres in a single exec_sql call."""
+    supabase = get_supabase_client()
+
+    if not supabase:
+        return []
+
+    dimensions = [f"{AGGREGATE_SQL_GROUPS[name]} AS {name}" for name in params.group_by]
+    measures = ["count(*) AS count"]
+    for measure in MEASURES:
+        measures.append(f"round(sum({measure})::numeric, 2) AS {measure}_sum")
+        measures.append(f"round(avg({measure})::numeric, 2) AS {measure}_avg")
+    group_clause = ""
+    if params.group_by:
+        positions = ", ".join(str(i + 1) for i in range(len(params.group_by)))
+        group_clause = f" GROUP BY {positions} ORDER BY {positions}"
+    query = (
+        "SELECT COALESCE(json_agg(t), '[]'::json) FROM ("
+        f"SELECT {', '.join(dimensions + measures)} FROM sales WHERE {sql_where(params)}{group_clause}"
+        ") t"
+    )
+    return _rpc_json(supabase.rpc('exec_sql', {'query': query}).execute())
+
+
+# Facet name -> SQL expression yielding one value per row (tags: one per tag)
+FACET_SQL_VALUES = {
+    "region": "customer_region",
+    "gender": "gender",
+    "product_category": "product_category",
+    "payment_method": "payment_method",
+    "tag": "trim(unnest(string_to_array(tags, ',')))",
+}
+
+
+def facets_supabase(params: SalesQuery) -> Dict[str, Dict[str, int]]:
+    """
+    Per-value counts for every facet in a single exec_sql round-trip. Each facet
+    is counted under all filters except its own, like SalesEngine.facet_counts.
+    """
+    supabase = get_supabase_client()
+
+    if not supabase:
+        return {}
+
+    selects = []
+    for facet, expression in FACET_SQL_VALUES.items():
+        selects.append(
+            f"SELECT {_sql_literal(facet)} AS facet, v AS value, count(*) AS count "
+            f"FROM (SELECT {expression} AS v FROM sales WHERE {sql_where(params, exclude=[facet])}) f "
+            "WHERE v IS NOT NULL AND v <> '' GROUP BY v"
+        )
+    query = f"SELECT COALESCE(json_agg(t), '[]'::json) FROM ({' UNION ALL '.join(selects)}) t"
+    rows = _rpc_json(supabase.rpc('exec_sql', {'query': query}).execute()) or []
+
+    facets: Dict[str, Dict[str, int]] = {facet: {} for facet in FACET_SQL_VALUES}
+    for row in rows:
+        facets[row["facet"]][str(row["value"])] = int(row["count"])
+    return facets
 
 
-@lru_cache(maxsize=1)
 def get_metadata_from_supabase() -> dict:
-    """Get unique values for filters from Supabase. Cached for performance."""
+    """
+    Get unique values for filters from Supabase. Cached for SUPABASE_META_TTL seconds or until the next ingest.
+    Raises one of SUPABASE_UNREACHABLE when Supabase can't be reached at all.
+    """
+    metadata = meta_cache.get("meta")
+    if metadata is None:
+        metadata = _fetch_metadata_from_supabase()
+        # Don't pin an all-empty result from a failed fetch
+        if any(metadata.values()):
+            meta_cache.set("meta", metadata)
+    return metadata
+
+
+def get_catalog_from_supabase() -> Dict[str, Any]:
+    """
+    Row count, age and date ranges and per-value row counts of every facet for
+    the whole sales table, in two exec_sql round-trips. Raises when exec_sql is
+    unavailable.
+    """
+    supabase = get_supabase_client()
+
+    if not supabase:
+        return {}
+
+    query = (
+        "SELECT json_build_object('rows', count(*), 'age_min', min(age), 'age_max', max(age), "
+        "'date_min', min(date)::date, 'date_max', max(date)::date) FROM sales"
+    )
+    summary = _rpc_json(supabase.rpc('exec_sql', {'query': query}).execute())
+    return {**summary, "counts": facets_supabase(SalesQuery())}
+
+
+def get_ranges_from_supabase() -> Dict[str, Any]:
+    """Age and date minimum and maximum through plain reads of one row each, for when exec_sql is unavailable."""
+    supabase = get_supabase_client()
+    ranges: Dict[str, Any] = {}
+
+    if not supabase:
+        return ranges
+
+    for column in ("age", "date"):
+        for bound, descending in (("min", False), ("max", True)):
+            query = supabase.table("sales").select(column).not_.is_(column, "null")
+            rows = query.order(column, desc=descending).limit(1).execute().data
+            ranges[f"{column}_{bound}"] = rows[0][column] if rows else None
+    return ranges
+
+
+# Bumped whenever this process changes the sales table, so data derived from it knows to refresh
+table_version = 0
+
+
+def invalidate_supabase_caches() -> None:
+    """Forget cached totals and metadata after the sales table changed."""
+    global table_version
+    table_version += 1
+    count_cache.clear()
+    meta_cache.clear()
+
+
+def insert_supabase_rows(rows: List[Dict[str, Any]], batch_size: int = 1000) -> int:
+    """Insert rows into the sales table in batches. Returns the number of rows sent."""
+    supabase = get_supabase_client()
+
+    if not supabase:
+        return 0
+
+    for start in range(0, len(rows), batch_size):
+        supabase.table("sales").insert(rows[start:start + batch_size]).execute()
+    invalidate_supabase_caches()
+    return len(rows)
+
+
+# Column -> rows sampled from it when exec_sql is unavailable
+METADATA_SAMPLES = {
+    "customer_region": 10000,
+    "gender": 100,
+    "product_category": 10000,
+    "payment_method": 100,
+    "tags": 10000,
+}
+
+
+def _empty_metadata() -> dict:
+    return {
+        "regions": [],
+        "genders": [],
+        "product_categories": [],
+        "tags": [],
+        "payment_methods": []
+    }
+
+
+def _sample_column(supabase, column: str, limit: int) -> List[Dict[str, Any]]:
+    return supabase.table("sales").select(column).limit(limit).execute().data
+
+
+def _fetch_metadata_from_supabase() -> dict:
     supabase = get_supabase_client()
     
     if not supabase:
-        return {
-            "regions": [],
-            "genders": [],
-            "product_categories": [],
-            "tags": [],
-            "payment_methods": []
-        }
+        return _empty_metadata()
     
     try:
         # Optimized metadata query: Fetch all distinct values in a single round-trip
@@ -157,95 +611,30 @@ def get_metadata_from_supabase() -> dict:
         # If we get here, the result format wasn't as expected, fall through to fallback
         raise ValueError("Unexpected RPC response format")
 
+    except SUPABASE_UNREACHABLE:
+        # The sampled reads below would only wait out the same outage
+        raise
     except Exception as e:
         print(f"Error fetching metadata with RPC: {e}")
-        # Simplified fallback - use PostgREST's built-in distinct
+        # Simplified fallback - sample rows of each column, all reads in flight at once
         try:
-            # Much faster approach: query just 10k rows and get unique values
-            regions = supabase.table("sales").select("customer_region").limit(10000).execute()
-            genders = supabase.table("sales").select("gender").limit(100).execute()
-            categories = supabase.table("sales").select("product_category").limit(10000).execute()
-            payments = supabase.table("sales").select("payment_method").limit(100).execute()
-            tags = supabase.table("sales").select("tags").limit(10000).execute()
-            
+            with ThreadPoolExecutor(max_workers=len(METADATA_SAMPLES)) as pool:
+                samples = dict(zip(
+                    METADATA_SAMPLES,
+                    pool.map(lambda item: _sample_column(supabase, *item), METADATA_SAMPLES.items()),
+                ))
+
+            def distinct(column: str) -> List[str]:
+                return sorted({row[column] for row in samples[column] if row.get(column)})
+
             return {
-                "regions": sorted(list(set(r["customer_region"] for r in regions.data if r.get("customer_region")))),
-                "genders": sorted(list(set(g["gender"] for g in genders.data if g.get("gender")))),
-                "product_categories": sorted(list(set(c["product_category"] for c in categories.data if c.get("product_category")))),
-                "tags": sorted(list({tag.strip() for row in tags.data for tag in str(row.get("tags", "")).split(",") if tag.strip()})),
-                "payment_methods": sorted(list(set(p["payment_method"] for p in payments.data if p.get("payment_method"))))
+                "regions": distinct("customer_region"),
+                "genders": distinct("gender"),
+                "product_categories": distinct("product_category"),
+                "tags": sorted({tag.strip() for row in samples["tags"] for tag in str(row.get("tags", "")).split(",") if tag.strip()}),
+                "payment_methods": distinct("payment_method"),
             }
         except Exception as e2:
             print(f"Error in fallback metadata: {e2}")
-            return {
-                "regions": [],
-                "genders": [],
-                "product_categories": [],
-                "tags": [],
-                "payment_methods": []
-            }
-
-
-# Old pandas-based functions (kept for CSV fallback)
-def apply_filters(df: pd.DataFrame, params: SalesQuery) -> pd.DataFrame:
-    filtered = df
-
-    if params.customer_name and "customer_name" in filtered.columns:
-        mask = filtered["customer_name"].str.contains(params.customer_name, case=False, na=False)
-        filtered = filtered[mask]
-
-    if params.phone and "phone_number" in filtered.columns:
-        mask = filtered["phone_number"].astype(str).str.contains(params.phone, na=False)
-        filtered = filtered[mask]
-
-    if params.region and "customer_region" in filtered.columns:
-        filtered = filtered[filtered["customer_region"].isin(params.region)]
-
-    if params.gender and "gender" in filtered.columns:
-        filtered = filtered[filtered["gender"].isin(params.gender)]
-
-    if params.age_min is not None and "age" in filtered.columns:
-        filtered = filtered[filtered["age"] >= params.age_min]
-
-    if params.age_max is not None and "age" in filtered.columns:
-        filtered = filtered[filtered["age"] <= params.age_max]
-
-    if params.product_category and "product_category" in filtered.columns:
-        filtered = filtered[filtered["product_category"].isin(params.product_category)]
-
-    if params.tag and "tags" in filtered.columns:
-        lowered_tags = [t.lower() for t in params.tag]
-        filtered = filtered[filtered["tags"].astype(str).str.lower().apply(
-            lambda cell: any(tag in cell for tag in lowered_tags)
-        )]
-
-    if params.payment_method and "payment_method" in filtered.columns:
-        filtered = filtered[filtered["payment_method"].isin(params.payment_method)]
-
-    if params.date_from and "date" in filtered.columns:
-        filtered = filtered[filtered["date"] >= pd.to_datetime(params.date_from)]
-
-    if params.date_to and "date" in filtered.columns:
-        filtered = filtered[filtered["date"] <= pd.to_datetime(params.date_to)]
-
-    return filtered
-
-
-def apply_sort(df: pd.DataFrame, params: SalesQuery) -> pd.DataFrame:
-    column_map = {
-        "date": "date",
-        "quantity": "quantity",
-        "customer_name": "customer_name",
-    }
-    column = column_map.get(params.sort_by, "date")
-    if column not in df.columns:
-        return df
-    ascending = params.order == "asc"
-    return df.sort_values(by=column, ascending=ascending, na_position="last")
-
+            return _empty_metadata()
 
-def apply_pagination(df: pd.DataFrame, page: int, page_size: int) -> Tuple[pd.DataFrame, int]:
-    total = len(df)
-    start = (page - 1) * page_size
-    end = start + page_size
-    return df.iloc[start:end], total
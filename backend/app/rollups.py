@@ -0,0 +1,141 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .models import SalesQuery
+
+# group_by name -> column
+ROLLUP_DIMENSIONS: Dict[str, str] = {
+    "region": "customer_region",
+    "category": "product_category",
+    "payment_method": "payment_method",
+    "store": "store_id",
+}
+TIME_GRAINS = ("day", "week", "month")
+MEASURES = ["final_amount", "quantity", "discount_percentage"]
+
+# Filters the rollup can answer on its own (besides the date range)
+ROLLUP_FILTERS: Dict[str, str] = {
+    "region": "customer_region",
+    "product_category": "product_category",
+    "payment_method": "payment_method",
+}
+ROW_ONLY_FILTERS = ("customer_name", "phone", "gender", "age_min", "age_max", "tag")
+
+COUNT = "count"
+
+
+def time_bucket(dates: pd.Series, grain: str) -> pd.Series:
+    """Start date of the day, ISO week (Monday) or month each date falls in."""
+    days = dates.dt.normalize()
+    if grain == "week":
+        return days - pd.to_timedelta(days.dt.weekday, unit="D")
+    if grain == "month":
+        return days.dt.to_period("M").dt.start_time
+    return days
+
+
+def summarize(frame: pd.DataFrame, group_by: List[str]) -> List[Dict[str, Any]]:
+    """
+    Reduce a frame of measure sums plus a ``count`` column to one row per group,
+    with ``<measure>_sum`` and ``<measure>_avg`` for every measure.
+    """
+    measures = [m for m in MEASURES if m in frame.columns]
+    if group_by:
+        grouped = frame.groupby(group_by, observed=True, dropna=False, sort=True)[measures + [COUNT]].sum()
+        result = grouped.reset_index()
+    else:
+        result = frame[measures + [COUNT]].sum().to_frame().T
+
+    for name in group_by:
+        if name in TIME_GRAINS:
+            result[name] = result[name].dt.strftime("%Y-%m-%d")
+    counts = result[COUNT].to_numpy(dtype=np.float64)
+    for measure in measures:
+        sums = result[measure].to_numpy(dtype=np.float64)
+        result[f"{measure}_sum"] = sums.round(2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[f"{measure}_avg"] = np.where(counts > 0, sums / counts, np.nan).round(2)
+    result[COUNT] = result[COUNT].astype(np.int64)
+
+    columns = group_by + [COUNT] + [f"{m}_{kind}" for m in measures for kind in ("sum", "avg")]
+    result = result[columns].astype(object)
+    return result.where(result.notna(), None).to_dict(orient="records")
+
+
+class DailyRollup:
+    """
+    Measure sums and row counts per day x region x category x payment method x store.
+
+    Built once when the data loads and extended with ``append`` as new rows
+    arrive. Queries whose filters only touch rollup dimensions are answered
+    from this table instead of the raw rows.
+    """
+
+    def __init__(self, table: pd.DataFrame, keys: List[str]):
+        self.table = table
+        self.keys = keys
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "DailyRollup":
+        keys = [column for column in ROLLUP_DIMENSIONS.values() if column in df.columns]
+        measures = [m for m in MEASURES if m in df.columns]
+        if "date" not in df.columns or df.empty:
+            return cls(pd.DataFrame(columns=["day"] + keys + measures + [COUNT]), keys)
+        frame = df[keys + measures].astype({m: np.float64 for m in measures})
+        frame["day"] = df["date"].dt.normalize()
+        frame[COUNT] = 1
+        table = frame.groupby(["day"] + keys, observed=True, dropna=False).sum().reset_index()
+        return cls(table, keys)
+
+    def append(self, rows: pd.DataFrame) -> "DailyRollup":
+        """New rollup with ``rows`` folded in; only their groups are re-summed."""
+        delta = DailyRollup.from_frame(rows).table
+        if delta.empty:
+            return self
+        combined = pd.concat([self.table, delta], ignore_index=True)
+        table = combined.groupby(["day"] + self.keys, observed=True, dropna=False).sum().reset_index()
+        return DailyRollup(table, self.keys)
+
+    def covers(self, params: SalesQuery, group_by: List[str]) -> bool:
+        if any(getattr(params, field) not in (None, [], "") for field in ROW_ONLY_FILTERS):
+            return False
+        return all(name in TIME_GRAINS or ROLLUP_DIMENSIONS[name] in self.keys for name in group_by)
+
+    def aggregate(self, params: SalesQuery, group_by: List[str]) -> List[Dict[str, Any]]:
+        table = self.table
+        mask = np.ones(len(table), dtype=bool)
+        for field, column in ROLLUP_FILTERS.items():
+            values = getattr(params, field)
+            if values and column in table.columns:
+                mask &= table[column].isin(values).to_numpy()
+        if params.date_from:
+            mask &= (table["day"] >= pd.to_datetime(params.date_from)).to_numpy()
+        if params.date_to:
+            mask &= (table["day"] <= pd.to_datetime(params.date_to)).to_numpy()
+        return summarize(_with_groups(table[mask], group_by, "day"), group_by)
+
+
+def _with_groups(frame: pd.DataFrame, group_by: List[str], date_column: str) -> pd.DataFrame:
+    """Add one column per group_by name (dimension copy or time bucket)."""
+    out = frame.copy()
+    for name in group_by:
+        if name in TIME_GRAINS:
+            out[name] = time_bucket(frame[date_column], name)
+        else:
+            out[name] = frame[ROLLUP_DIMENSIONS[name]]
+    return out
+
+
+def aggregate_rows(df: pd.DataFrame, mask: Optional[np.ndarray], group_by: List[str]) -> List[Dict[str, Any]]:
+    """Aggregate raw rows for filters the rollup cannot answer."""
+    needed = [m for m in MEASURES if m in df.columns]
+    needed += [ROLLUP_DIMENSIONS[name] for name in group_by if name not in TIME_GRAINS]
+    if "date" in df.columns:
+        needed.append("date")
+    columns = list(dict.fromkeys(needed))
+    frame = df[columns] if mask is None else df.loc[mask, columns]
+    frame = frame.astype({m: np.float64 for m in MEASURES if m in frame.columns})
+    frame[COUNT] = 1
+    return summarize(_with_groups(frame, group_by, "date"), group_by)
@@ -0,0 +1,34 @@
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from ..circuit import CircuitOpenError
+from ..ingest import INGEST_TOKEN, ingest_csv
+from .sales import response_caches
+
+router = APIRouter(tags=["ingest"])
+
+
+@router.post("/ingest")
+async def ingest(request: Request, x_ingest_token: str | None = Header(None)) -> dict:
+    """
+    Append a CSV batch (same header as the dataset) to the active backend. Queries
+    started after this returns see the new rows; queries already running don't.
+    """
+    if not INGEST_TOKEN:
+        raise HTTPException(status_code=404, detail="Ingestion is disabled")
+    if not x_ingest_token or not hmac.compare_digest(x_ingest_token, INGEST_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid ingest token")
+
+    content = await request.body()
+    try:
+        result = await run_in_threadpool(ingest_csv, content)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except CircuitOpenError as exc:
+        raise HTTPException(status_code=503, detail="Supabase is unavailable, retry later") from exc
+
+    # CSV-path entries are keyed by engine version and go stale on their own
+    response_caches["supabase"].clear()
+    return result
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..metrics import registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Prometheus text format: latency histograms, per-stage timings, cache and fallback counters, dataset memory."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,36 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import os
+from typing import Dict, List, Optional
 
-from ..data_loader import load_data, get_supabase_client, load_data_from_csv
-from ..models import MetaResponse, SalesQuery, SalesResponse
-from ..repository import apply_filters, apply_pagination, apply_sort
-from ..repository_supabase import query_supabase, get_metadata_from_supabase
-from ..utils import distinct_tags, distinct_values, total_pages
+import numpy as np
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 
-router = APIRouter(tags=["sales"])
+from ..cache import CACHE_TTL_CSV, CACHE_TTL_SUPABASE, META_CACHE_CONTROL, SALES_CACHE_CONTROL, QueryCache, query_key
+from ..catalog import Catalog, build_catalog, current_catalog
+from ..export import EXPORT_BATCH_ROWS, EXPORT_FORMATS, SUPABASE_EXPORT_BATCH_ROWS, BatchEncoder
+from ..data_loader import Engine, dataset_version, load_engine, loaded_engine, get_supabase_client
+from ..engine import SalesEngine
+from ..metrics import cache_samples, count_fallback, count_hedge, flight_samples, registry, stage
+from ..models import AggregateQuery, AggregateResponse, MetaResponse, SalesQuery, SalesResponse
+from ..repository_supabase import (
+    SUPABASE_COUNT_MODE,
+    aggregate_supabase,
+    export_supabase_batch,
+    facets_supabase,
+    next_export_cursor,
+    query_supabase_async,
+)
+from ..supabase_async import SUPABASE_HEDGE_MS, run_supabase, supabase_breaker
+from ..serialization import (
+    RESPONSE_FORMAT_VERSION,
+    EncodedBody,
+    cached_json_response,
+    etag_for,
+    matched_etag,
+    frame_to_records,
+    not_modified,
+    sales_response_body,
+)
+from ..singleflight import SingleFlight
 
-DEFAULT_META = {
-    "regions": ["Central", "East", "North", "South", "West"],
-    "genders": ["Female", "Male"],
-    "product_categories": ["Beauty", "Clothing", "Electronics"],
-    "tags": [
-        "accessories",
-        "beauty",
-        "casual",
-        "cotton",
-        "fashion",
-        "formal",
-        "fragrance-free",
-        "gadgets",
-        "makeup",
-        "organic",
-        "portable",
-        "skincare",
-        "smart",
-        "unisex",
-        "wireless",
-    ],
-    "payment_methods": ["Cash", "Credit Card", "Debit Card", "Net Banking", "UPI", "Wallet"],
-}
+# Most queries one POST /api/sales/batch may carry
+SALES_BATCH_MAX_QUERIES = int(os.getenv("SALES_BATCH_MAX_QUERIES", "50"))
+
+router = APIRouter(tags=["sales"])
 
 
 def sales_query(
@@ -49,6 +59,10 @@ def sales_query(
     order: str = Query("desc"),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    pagination: str = Query("offset"),
+    cursor: str | None = Query(None),
+    facets: bool = Query(False),
+    explain: bool = Query(False),
 ) -> SalesQuery:
     return SalesQuery(
         customer_name=customer_name,
@@ -66,84 +80,382 @@ def sales_query(
         order=order,
         page=page,
         page_size=page_size,
+        pagination=pagination,
+        cursor=cursor,
+        facets=facets,
+        explain=explain,
     )
 
 
+# Page-level response caches; row-id sets are cached separately inside the engine
+response_caches = {
+    "supabase": QueryCache(ttl=CACHE_TTL_SUPABASE),
+    "csv": QueryCache(ttl=CACHE_TTL_CSV),
+}
+registry.register_collector(
+    lambda: [sample for name, cache in response_caches.items() for sample in cache_samples(f"sales_{name}", cache.stats())]
+)
+# In-flight /api/sales and /api/meta computations (and the first engine load), shared by identical requests
+_flights = SingleFlight()
+registry.register_collector(lambda: flight_samples("sales", _flights.stats()))
+
+
+def _use_supabase(endpoint: str) -> bool:
+    """Whether ``endpoint`` should try Supabase: it is configured and its circuit isn't open."""
+    if not get_supabase_client():
+        return False
+    if supabase_breaker.is_open():
+        # Known to be failing: answer locally now rather than after a timeout
+        count_fallback(endpoint)
+        return False
+    return True
+
+
+async def _supabase_facets(params: SalesQuery) -> dict | None:
+    # Facets are a nice-to-have: a failure here should not fail the page itself
+    try:
+        with stage("facets"):
+            return await run_supabase(facets_supabase, params)
+    except Exception as e:
+        print(f"Supabase facet counts failed: {e}")
+        count_fallback("facets")
+        return None
+
+
+async def _current_engine() -> Engine:
+    engine = loaded_engine()
+    if engine is not None:
+        return engine
+    # Startup herd: a single load on a worker thread, awaited by every request that needs it
+    return await _flights.run("engine", lambda: run_in_threadpool(load_engine))
+
+
+async def _supabase_body(params: SalesQuery, key: str) -> EncodedBody:
+    if params.facets:
+        (items, total, exact, next_cursor), facets = await asyncio.gather(
+            query_supabase_async(params),
+            _supabase_facets(params),
+        )
+    else:
+        items, total, exact, next_cursor = await query_supabase_async(params)
+        facets = None
+    with stage("serialize"):
+        body = sales_response_body(
+            items=items,
+            total=total,
+            page=params.page,
+            page_size=params.page_size,
+            total_exact=exact,
+            next_cursor=next_cursor,
+            facets=facets,
+        )
+    # No dataset version to derive it from: the ETag is a hash of the body
+    entry = EncodedBody(body)
+    # An estimate that a background exact count will soon replace isn't worth caching
+    if exact or SUPABASE_COUNT_MODE != "parallel":
+        response_caches["supabase"].set(key, entry)
+    return entry
+
+
+def _local_etag(engine: Engine, params: SalesQuery, key: str) -> str | None:
+    """
+    ETag of a local engine's answer, known before running the query: the same
+    query over the same data version and response format always gives the
+    same body. Not for explain=true, whose timings differ every run.
+    """
+    if params.explain:
+        return None
+    return etag_for(RESPONSE_FORMAT_VERSION, type(engine).__name__, dataset_version(engine), key)
+
+
+def _engine_body(
+    engine: Engine,
+    params: SalesQuery,
+    key: str,
+    csv_key: str,
+    mask: Optional[np.ndarray] = None,
+    facet_masks: Optional[Dict[str, np.ndarray]] = None,
+) -> EncodedBody:
+    if params.facets and mask is None and isinstance(engine, SalesEngine):
+        # Facets need every filter's own mask anyway; the row mask is their AND,
+        # so each filter runs once for both
+        with stage("filter"):
+            facet_masks = engine.filter_masks(params)
+            mask = engine.combined_mask(facet_masks)
+    # Precomputed masks only ever come from SalesEngine
+    shared = () if mask is None else (mask,)
+    next_cursor = None
+    try:
+        if params.pagination == "cursor":
+            page_df, total, next_cursor = engine.query_keyset(params, *shared)
+        else:
+            page_df, total = engine.query(params, *shared)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    facets = None
+    if params.facets:
+        with stage("facets"):
+            facets = engine.facet_counts(params) if facet_masks is None else engine.facet_counts(params, facet_masks)
+    plan = engine.explain(params) if params.explain else None
+    with stage("serialize"):
+        body = sales_response_body(
+            items=frame_to_records(page_df),
+            total=total,
+            page=params.page,
+            page_size=params.page_size,
+            next_cursor=next_cursor,
+            facets=facets,
+            plan=plan,
+        )
+    entry = EncodedBody(body, _local_etag(engine, params, key))
+    response_caches["csv"].set(csv_key, entry)
+    return entry
+
+
+async def _local_body(engine: Engine, params: SalesQuery, key: str) -> EncodedBody:
+    csv_key = f"{engine.version}:{key}"
+    cached = response_caches["csv"].get(csv_key)
+    if cached is not None:
+        return cached
+    return await _flights.run(("csv", csv_key), lambda: run_in_threadpool(_engine_body, engine, params, key, csv_key))
+
+
+def _retrieve(task: asyncio.Future) -> None:
+    # The losing side of a hedge may fail after nobody waits on it any more
+    if not task.cancelled():
+        task.exception()
+
+
+async def _hedged_supabase_body(params: SalesQuery, key: str) -> EncodedBody:
+    """
+    The Supabase page. If it takes longer than SUPABASE_HEDGE_MS and the local
+    engine is already loaded, the query also runs there and the first successful
+    answer is used; the slower call keeps running and fills its own cache.
+    """
+    remote = asyncio.ensure_future(_flights.run(("supabase", key), lambda: _supabase_body(params, key)))
+    remote.add_done_callback(_retrieve)
+    engine = loaded_engine()
+    if SUPABASE_HEDGE_MS <= 0 or engine is None:
+        return await remote
+    done, _ = await asyncio.wait({remote}, timeout=SUPABASE_HEDGE_MS / 1000)
+    if done:
+        return remote.result()
+
+    local = asyncio.ensure_future(_local_body(engine, params, key))
+    local.add_done_callback(_retrieve)
+    pending = {remote, local}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                count_hedge("supabase" if task is remote else "local")
+                return task.result()
+    # Both failed: report Supabase's error, as without hedging
+    return remote.result()
+
+
+async def _supabase_entry(params: SalesQuery, key: str) -> EncodedBody:
+    cached = response_caches["supabase"].get(key)
+    if cached is not None:
+        return cached
+    return await _hedged_supabase_body(params, key)
+
+
 @router.get("/sales", response_model=SalesResponse)
-async def get_sales(params: SalesQuery = Depends(sales_query)) -> SalesResponse:
-    supabase = get_supabase_client()
+async def get_sales(request: Request, params: SalesQuery = Depends(sales_query)) -> Response:
+    # Responses are encoded once into JSON bytes (and cached as such, with their
+    # ETag and compressed copies); the response_model only documents their shape.
+    # Identical requests that arrive while one is being computed wait for it
+    # instead of repeating it.
+    key = query_key(params)
+    cache_control = "no-store" if params.explain else SALES_CACHE_CONTROL
 
-    if supabase:
+    if _use_supabase("sales"):
         try:
-            items, total = query_supabase(params)
-            return SalesResponse(
-                items=items,
-                total=total,
-                page=params.page,
-                page_size=params.page_size,
-                total_pages=total_pages(total, params.page_size),
-            )
+            entry = await _supabase_entry(params, key)
+            return await cached_json_response(request, entry, cache_control)
+        except ValueError as exc:
+            # Malformed cursor: the CSV path would reject it too
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
         except Exception as e:
             # Graceful fallback to CSV to avoid hard failures on hosted DB timeouts
             print(f"Supabase query failed, falling back to CSV: {e}")
+            count_fallback("sales")
 
     try:
-        df = load_data()
+        with stage("load"):
+            engine = await _current_engine()
     except FileNotFoundError as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
-    filtered = apply_filters(df, params)
-    sorted_df = apply_sort(filtered, params)
-    page_df, total = apply_pagination(sorted_df, params.page, params.page_size)
+    etag = _local_etag(engine, params, key)
+    matched = matched_etag(request.headers.get("if-none-match"), etag) if etag is not None else None
+    if matched is not None:
+        # The client already holds this query's answer for this data version
+        return not_modified(matched, cache_control)
+    return await cached_json_response(request, await _local_body(engine, params, key), cache_control)
 
-    return SalesResponse(
-        items=page_df.fillna("").to_dict(orient="records"),
-        total=total,
-        page=params.page,
-        page_size=params.page_size,
-        total_pages=total_pages(total, params.page_size),
-    )
 
+def _engine_batch(engine: Engine, queries: List[SalesQuery], keys: List[str]) -> List[EncodedBody]:
+    """
+    Local answers for a batch, in order: cached ones as they are, the rest
+    computed together over filter masks shared between the queries.
+    """
+    entries: Dict[str, Optional[EncodedBody]] = {}
+    for key in keys:
+        if key not in entries:
+            entries[key] = response_caches["csv"].get(f"{engine.version}:{key}")
+    todo = {key: params for params, key in zip(queries, keys) if entries[key] is None}
+    if isinstance(engine, SalesEngine):
+        masks = engine.batch_masks(list(todo.values()))
+    else:
+        # SQLite plans and caches each statement itself
+        masks = [(None, None)] * len(todo)
+    for (key, params), (mask, facet_masks) in zip(todo.items(), masks):
+        entries[key] = _engine_body(engine, params, key, f"{engine.version}:{key}", mask, facet_masks)
+    return [entries[key] for key in keys]
 
-@router.get("/meta", response_model=MetaResponse)
-async def get_meta() -> MetaResponse:
-    supabase = get_supabase_client()
-    
-    if supabase:
+
+@router.post("/sales/batch", response_model=List[SalesResponse])
+async def get_sales_batch(request: Request, queries: List[SalesQuery] = Body(...)) -> Response:
+    """
+    Answer several /api/sales queries in one round-trip, in order. Locally, the
+    filters the queries have in common are evaluated once for all of them; on
+    Supabase the queries run concurrently, and any that fail are answered locally.
+    """
+    if not queries or len(queries) > SALES_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"A batch holds 1 to {SALES_BATCH_MAX_QUERIES} queries")
+    keys = [query_key(params) for params in queries]
+    entries: List[Optional[EncodedBody]] = [None] * len(queries)
+
+    if _use_supabase("sales"):
+        results = await asyncio.gather(
+            *(_supabase_entry(params, key) for params, key in zip(queries, keys)),
+            return_exceptions=True,
+        )
+        for i, result in enumerate(results):
+            if isinstance(result, ValueError):
+                raise HTTPException(status_code=400, detail=f"Query {i}: {result}") from result
+            if isinstance(result, Exception):
+                print(f"Supabase query {i} of a batch failed, falling back to CSV: {result}")
+                count_fallback("sales")
+            else:
+                entries[i] = result
+
+    missing = [i for i, entry in enumerate(entries) if entry is None]
+    if missing:
+        try:
+            with stage("load"):
+                engine = await _current_engine()
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+        local = await run_in_threadpool(_engine_batch, engine, [queries[i] for i in missing], [keys[i] for i in missing])
+        for i, entry in zip(missing, local):
+            entries[i] = entry
+
+    with stage("serialize"):
+        body = b"[" + b",".join(entry.body for entry in entries) + b"]"
+    return await cached_json_response(request, EncodedBody(body), "no-store")
+
+
+async def _stream_supabase_export(params: SalesQuery, encoder: BatchEncoder, rows: list):
+    # ``rows`` is the first batch, already fetched so failures there can still fall back to CSV
+    try:
+        while rows:
+            yield encoder.encode_rows(rows)
+            after = next_export_cursor(params, rows)
+            rows = await run_supabase(export_supabase_batch, params, after, SUPABASE_EXPORT_BATCH_ROWS)
+    except Exception as e:
+        # Headers are already sent: abort the transfer so the client sees it
+        # incomplete, rather than a clean end to partial data
+        print(f"Supabase export failed mid-stream: {e}")
+        raise
+    if encoder.first:
+        yield encoder.encode_rows([])
+    yield encoder.finish()
+
+
+def _stream_engine_export(engine, params: SalesQuery, encoder: BatchEncoder):
+    for batch in engine.iter_batches(params, EXPORT_BATCH_ROWS):
+        yield encoder.encode(batch)
+    yield encoder.finish()
+
+
+@router.get("/sales/export")
+async def export_sales(
+    params: SalesQuery = Depends(sales_query),
+    format: str = Query("csv", description="csv, ndjson or arrow"),
+) -> StreamingResponse:
+    """Stream every row matching the filters, in the requested sort order."""
+    try:
+        encoder = BatchEncoder(format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    media_type, extension = EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="sales.{extension}"'}
+
+    if _use_supabase("export"):
         try:
-            metadata = get_metadata_from_supabase()
-            # Always merge Supabase metadata with CSV distincts to ensure completeness across environments.
-            try:
-                df = load_data()
-                if df is None or df.empty:
-                    df = load_data_from_csv()
-                merged = {
-                    "regions": set(metadata.get("regions", [])) | set(distinct_values(df, "customer_region")),
-                    "genders": set(metadata.get("genders", [])) | set(distinct_values(df, "gender")),
-                    "product_categories": set(metadata.get("product_categories", [])) | set(distinct_values(df, "product_category")),
-                    "tags": set(metadata.get("tags", [])) | set(distinct_tags(df, "tags")),
-                    "payment_methods": set(metadata.get("payment_methods", [])) | set(distinct_values(df, "payment_method")),
-                }
-                # Final union with defaults to guarantee completeness
-                merged = {k: sorted(merged.get(k, set()) | set(DEFAULT_META[k])) for k in DEFAULT_META}
-                return MetaResponse(**merged)
-            except Exception as merge_exc:
-                print(f"Metadata merge fallback failed: {merge_exc}")
-                # Still ensure defaults are included
-                merged = {k: sorted(set(metadata.get(k, [])) | set(DEFAULT_META[k])) for k in DEFAULT_META}
-                return MetaResponse(**merged)
+            rows = await run_supabase(export_supabase_batch, params, None, SUPABASE_EXPORT_BATCH_ROWS)
+            return StreamingResponse(
+                _stream_supabase_export(params, encoder, rows), media_type=media_type, headers=headers
+            )
         except Exception as e:
-            print(f"Supabase metadata fetch failed, falling back to CSV: {e}")
+            print(f"Supabase export failed, falling back to CSV: {e}")
+            count_fallback("export")
 
     try:
-        df = load_data()
+        engine = await _current_engine()
     except FileNotFoundError as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
-    return MetaResponse(
-        regions=distinct_values(df, "customer_region"),
-        genders=distinct_values(df, "gender"),
-        product_categories=distinct_values(df, "product_category"),
-        tags=distinct_tags(df, "tags"),
-        payment_methods=distinct_values(df, "payment_method"),
-    )
+    return StreamingResponse(_stream_engine_export(engine, params, encoder), media_type=media_type, headers=headers)
+
+
+def aggregate_query(
+    params: SalesQuery = Depends(sales_query),
+    group_by: list[str] | None = Query(None),
+) -> AggregateQuery:
+    try:
+        return AggregateQuery(**params.model_dump(), group_by=group_by)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+
+
+@router.get("/sales/aggregate", response_model=AggregateResponse)
+async def get_sales_aggregate(params: AggregateQuery = Depends(aggregate_query)) -> AggregateResponse:
+    if _use_supabase("aggregate"):
+        try:
+            rows = await run_supabase(aggregate_supabase, params)
+            return AggregateResponse(group_by=params.group_by, rows=rows, source="supabase")
+        except Exception as e:
+            print(f"Supabase aggregate failed, falling back to CSV: {e}")
+            count_fallback("aggregate")
+
+    try:
+        engine = await _current_engine()
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+    # Unless a rollup answers it, an aggregate scans whole columns: keep it off the event loop
+    rows, source = await run_in_threadpool(engine.aggregate, params)
+    return AggregateResponse(group_by=params.group_by, rows=rows, source=source)
+
+
+async def _build_catalog() -> Catalog:
+    try:
+        with stage("load"):
+            return await run_in_threadpool(build_catalog)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@router.get("/meta", response_model=MetaResponse)
+async def get_meta(request: Request) -> Response:
+    # Served from the precomputed catalog; only the first call (with no
+    # catalog in memory or on disk) waits for a build, shared by concurrent calls
+    catalog = current_catalog()
+    if catalog is None:
+        catalog = await _flights.run("meta", _build_catalog)
+    return await cached_json_response(request, catalog.response, META_CACHE_CONTROL)
@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from .utils import total_pages
+
+try:
+    import brotli
+except ImportError:  # br encoding is optional; gzip is always available
+    brotli = None
+
+# Dates leave the API as plain days on both backends (Supabase DATE columns do the same)
+JSON_DATE_FORMAT = "%Y-%m-%d"
+
+# Bump whenever response bodies change shape, so ETags from before a deploy stop matching
+RESPONSE_FORMAT_VERSION = "1"
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+
+def _blank_missing(values: List[Any], missing: np.ndarray) -> List[Any]:
+    for i in np.flatnonzero(missing):
+        values[i] = ""
+    return values
+
+
+def _json_column(series: pd.Series) -> List[Any]:
+    """One column as a list of JSON-native values, missing values as ""."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        labels = dtype.categories.to_numpy().tolist() + [""]
+        # Code -1 (missing) picks the trailing ""
+        return [labels[code] for code in series.array.codes.tolist()]
+    if dtype.kind == "M":
+        values = series.to_numpy()
+        days = values.astype("datetime64[D]").astype(str).tolist()
+        return _blank_missing(days, np.isnat(values))
+    if dtype == "float32":
+        values = series.to_numpy()
+        # Shortest float32 repr, so 238.94 doesn't become 238.94000244140625
+        return _blank_missing(values.astype(str).astype(np.float64).tolist(), np.isnan(values))
+    if dtype.kind == "f":
+        values = series.to_numpy()
+        return _blank_missing(values.tolist(), np.isnan(values))
+    if dtype.kind in "biu":
+        return series.tolist()
+    return series.to_numpy(dtype=object, na_value="").tolist()
+
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convert a page of the compact-dtype frame into JSON-ready row dicts.
+
+    Works a column at a time (one vectorized conversion per column) and only
+    zips the rows together at the end.
+    """
+    names = list(df.columns)
+    columns = [_json_column(df[name]) for name in names]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def sales_response_body(
+    items: List[Dict[str, Any]],
+    total: int,
+    page: int,
+    page_size: int,
+    total_exact: bool = True,
+    next_cursor: Optional[str] = None,
+    facets: Optional[Dict[str, Dict[str, int]]] = None,
+    plan: Optional[Dict[str, Any]] = None,
+) -> bytes:
+    """Encode a SalesResponse straight to JSON bytes. ``items`` must already be JSON-native."""
+    return orjson.dumps(
+        {
+            "items": items,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": total_pages(total, page_size),
+            "total_exact": total_exact,
+            "next_cursor": next_cursor,
+            "facets": facets,
+            "plan": plan,
+        }
+    )
+
+
+def etag_for(*parts: Any) -> str:
+    """Strong ETag value (quoted) identifying ``parts``, e.g. a dataset version and a query key."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag value (quoted) for the bytes of ``body``."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+class EncodedBody:
+    """
+    A JSON response body with its ETag, plus the compressed copies clients have
+    asked for, made on first use and kept with it. Cached instead of the bare
+    bytes, so hot responses are compressed once rather than per request.
+    """
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag if etag is not None else content_etag(body)
+        # Content-Encoding -> compressed body
+        self.encoded: Dict[str, bytes] = {}
+
+    def encode(self, coding: str) -> bytes:
+        data = self.encoded.get(coding)
+        if data is None:
+            if coding == "br":
+                data = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                data = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+            self.encoded[coding] = data
+        return data
+
+
+def _accepted_codings(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def negotiate_encoding(header: Optional[str]) -> Optional[str]:
+    """The Content-Encoding to answer an ``Accept-Encoding`` header with: br, gzip or None for identity."""
+    if not header:
+        return None
+    accepted = _accepted_codings(header)
+    wildcard = accepted.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def matched_etag(header: Optional[str], etag: str) -> Optional[str]:
+    """
+    The tag in an ``If-None-Match`` header that matches ``etag``, or None.
+    Comparison is weak, as for GET it should be, and ignores the ``-gzip``/``-br``
+    suffix of tags sent with a compressed body, which stand for the same content.
+    The tag is returned as the client holds it, to be echoed in the 304.
+    """
+    if not header:
+        return None
+    if header.strip() == "*":
+        return etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        base = candidate
+        for coding in ("gzip", "br"):
+            if base.endswith(f'-{coding}"'):
+                base = base[:-len(coding) - 2] + '"'
+        if base == etag:
+            return candidate
+    return None
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+
+
+async def cached_json_response(request: Request, entry: EncodedBody, cache_control: str) -> Response:
+    """
+    Answer with ``entry``: 304 Not Modified when the client's If-None-Match
+    matches its ETag, otherwise the body, compressed when the client accepts it
+    and it is at least COMPRESS_MIN_BYTES. A compressed body gets its own strong
+    ETag (``-gzip``/``-br`` suffix), since its bytes differ. Compressing runs
+    in the threadpool, off the event loop, unless a cached copy is at hand.
+    """
+    matched = matched_etag(request.headers.get("if-none-match"), entry.etag)
+    if matched is not None:
+        return not_modified(matched, cache_control)
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    coding = negotiate_encoding(request.headers.get("accept-encoding")) if len(entry.body) >= COMPRESS_MIN_BYTES else None
+    if coding is None:
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+    headers["ETag"] = f'{entry.etag[:-1]}-{coding}"'
+    headers["Content-Encoding"] = coding
+    data = entry.encoded.get(coding)
+    if data is None:
+        data = await run_in_threadpool(entry.encode, coding)
+    return Response(content=data, media_type="application/json", headers=headers)
@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Bump when the normalized schema produced by the loader changes
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def snapshot_enabled() -> bool:
+    return os.getenv("DATA_SNAPSHOT", "1").lower() not in {"0", "false", "no"}
+
+
+def snapshot_dir(csv_path: Path) -> Path:
+    """Snapshots live next to the CSV as ``<name>.snapshot/``."""
+    return csv_path.with_name(csv_path.name + ".snapshot")
+
+
+def source_stamp(csv_path: Path) -> Dict[str, int]:
+    stat = csv_path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def read_snapshot(csv_path: Path, stamp: Optional[Dict[str, int]] = None) -> Optional[pd.DataFrame]:
+    """
+    Memory-map a snapshot written for this exact CSV, or return None if there
+    is none or it is stale (CSV mtime/size or snapshot version changed).
+    ``stamp`` is the CSV's source_stamp, if the caller already took it.
+
+    Numeric, date and category code columns stay backed by read-only memmaps,
+    so workers on the same host share those pages through the OS page cache.
+    """
+    directory = snapshot_dir(csv_path)
+    try:
+        manifest = json.loads((directory / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+    stamp = source_stamp(csv_path) if stamp is None else stamp
+    if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("source") != stamp:
+        return None
+
+    columns: Dict[str, pd.Series] = {}
+    for i, spec in enumerate(manifest["columns"]):
+        # Plain ndarray view over the memmap; pandas should not see the subclass
+        values = np.asarray(np.load(directory / f"{i}.npy", mmap_mode="r"))
+        kind = spec["kind"]
+        if kind == "numeric":
+            series = pd.Series(values, copy=False)
+        elif kind == "datetime":
+            series = pd.Series(values.view(spec["dtype"]), copy=False)
+        elif kind == "category":
+            categorical = pd.Categorical.from_codes(values, spec["categories"], validate=False)
+            series = pd.Series(categorical, copy=False)
+        else:
+            # Free-text columns are stored dictionary-encoded and decoded once here
+            uniques = np.asarray(spec["categories"], dtype=object)
+            decoded = uniques.take(np.maximum(values, 0))
+            decoded[values < 0] = np.nan
+            series = pd.Series(decoded).astype(spec["dtype"])
+        columns[spec["name"]] = series
+    return pd.DataFrame(columns, copy=False)
+
+
+def _encode_column(name: str, series: pd.Series) -> Dict[str, Any]:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return {
+            "name": name,
+            "kind": "category",
+            "categories": [str(value) for value in series.cat.categories],
+            "values": series.cat.codes.to_numpy(),
+        }
+    if series.dtype.kind == "M":
+        return {"name": name, "kind": "datetime", "dtype": str(series.dtype), "values": series.to_numpy().view(np.int64)}
+    if series.dtype.kind in "biuf":
+        return {"name": name, "kind": "numeric", "values": series.to_numpy()}
+    codes, uniques = pd.factorize(series)
+    smallest = np.int32 if len(uniques) < 2**31 else np.int64
+    return {
+        "name": name,
+        "kind": "string",
+        "dtype": str(series.dtype),
+        "categories": [str(value) for value in uniques],
+        "values": codes.astype(smallest),
+    }
+
+
+def _remove_superseded(target: Path, current: Path) -> None:
+    """Remove finished snapshot directories older than ``current`` that an earlier swap left behind."""
+    cutoff = current.stat().st_mtime
+    for path in target.parent.glob(target.name + ".*"):
+        if path == current or path.is_symlink() or not path.is_dir():
+            continue
+        try:
+            # Without a manifest it is still being written, maybe by another process
+            if (path / MANIFEST_NAME).exists() and path.stat().st_mtime <= cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            continue
+
+
+def write_snapshot(df: pd.DataFrame, csv_path: Path, stamp: Optional[Dict[str, int]] = None) -> None:
+    """
+    Write the normalized frame next to the CSV. ``stamp`` is the CSV state the
+    frame reflects (default: the CSV as it is now). Failures are reported, never raised.
+
+    Each snapshot goes into its own directory and ``<name>.snapshot`` is a
+    symlink swapped in with one rename, so readers see either the old or the
+    new snapshot, never a partial one or none. Processes still mapping the old
+    files keep them until they let go.
+    """
+    target = snapshot_dir(csv_path)
+    stamp = source_stamp(csv_path) if stamp is None else stamp
+    try:
+        staging = Path(tempfile.mkdtemp(prefix=target.name + ".", dir=target.parent))
+    except OSError as e:
+        print(f"Could not write data snapshot to {target}: {e}")
+        return
+
+    try:
+        specs = []
+        for i, column in enumerate(df.columns):
+            spec = _encode_column(column, df[column])
+            np.save(staging / f"{i}.npy", np.ascontiguousarray(spec.pop("values")))
+            specs.append(spec)
+        manifest = {"version": SNAPSHOT_VERSION, "source": stamp, "columns": specs}
+        (staging / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+        previous = target.resolve() if target.is_symlink() else None
+        if target.exists() and not target.is_symlink():
+            # Snapshot from before the symlink layout
+            shutil.rmtree(target, ignore_errors=True)
+        link = staging.with_name(staging.name + ".link")
+        os.symlink(staging.name, link)
+        os.replace(link, target)
+        if previous is not None and previous != staging.resolve():
+            shutil.rmtree(previous, ignore_errors=True)
+        _remove_superseded(target, staging)
+    except OSError as e:
+        print(f"Could not write data snapshot to {target}: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,101 @@
+import os
+import time
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+import anyio
+import httpx
+
+from .circuit import CircuitBreaker, CircuitOpenError
+from .metrics import circuit_samples, registry
+
+T = TypeVar("T")
+
+# Max Supabase calls in flight per worker, and the per-call deadline in seconds
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "10"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
+# Circuit breaker around every Supabase HTTP call: it opens once at least
+# SUPABASE_BREAKER_MIN_CALLS calls (0 disables it) finished within the last
+# SUPABASE_BREAKER_WINDOW seconds and SUPABASE_BREAKER_ERROR_RATE of them failed,
+# i.e. raised, got a 5xx or took longer than SUPABASE_BREAKER_SLOW_MS. While open,
+# requests go straight to the local engine; after SUPABASE_BREAKER_COOLDOWN seconds
+# SUPABASE_BREAKER_PROBES trial calls decide whether it closes again.
+SUPABASE_BREAKER_WINDOW = float(os.getenv("SUPABASE_BREAKER_WINDOW", "30"))
+SUPABASE_BREAKER_MIN_CALLS = int(os.getenv("SUPABASE_BREAKER_MIN_CALLS", "10"))
+SUPABASE_BREAKER_ERROR_RATE = float(os.getenv("SUPABASE_BREAKER_ERROR_RATE", "0.5"))
+SUPABASE_BREAKER_SLOW_MS = float(os.getenv("SUPABASE_BREAKER_SLOW_MS", "3000"))
+SUPABASE_BREAKER_COOLDOWN = float(os.getenv("SUPABASE_BREAKER_COOLDOWN", "10"))
+SUPABASE_BREAKER_PROBES = int(os.getenv("SUPABASE_BREAKER_PROBES", "1"))
+# Milliseconds a Supabase /api/sales page may take before the same query is also
+# run on the loaded local engine, answering with whichever finishes first (0 disables)
+SUPABASE_HEDGE_MS = float(os.getenv("SUPABASE_HEDGE_MS", "0"))
+
+supabase_breaker = CircuitBreaker(
+    window=SUPABASE_BREAKER_WINDOW,
+    min_calls=SUPABASE_BREAKER_MIN_CALLS,
+    error_rate=SUPABASE_BREAKER_ERROR_RATE,
+    cooldown=SUPABASE_BREAKER_COOLDOWN,
+    probes=SUPABASE_BREAKER_PROBES,
+)
+registry.register_collector(lambda: circuit_samples("supabase", supabase_breaker.stats()))
+# Errors meaning Supabase can't be reached at all, as opposed to rejecting one query
+SUPABASE_UNREACHABLE = (CircuitOpenError, httpx.TransportError)
+
+_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    # Created lazily: anyio primitives need a running event loop
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(SUPABASE_MAX_CONCURRENCY)
+    return _limiter
+
+
+async def run_supabase(func: Callable[..., T], *args: Any, timeout: Optional[float] = None) -> T:
+    """
+    Run a blocking Supabase call on a bounded worker-thread pool so the event
+    loop keeps serving other requests while the HTTP round-trip is in flight.
+
+    All calls share the client's keep-alive connection pool. Raises TimeoutError
+    once ``timeout`` (default SUPABASE_TIMEOUT) expires; the abandoned call is
+    left to finish in its thread and still holds its concurrency slot until then.
+    """
+    with anyio.fail_after(SUPABASE_TIMEOUT if timeout is None else timeout):
+        return await anyio.to_thread.run_sync(
+            partial(func, *args),
+            limiter=_get_limiter(),
+            abandon_on_cancel=True,
+        )
+
+
+class BreakerTransport(httpx.BaseTransport):
+    """httpx transport that admits and scores every request through a CircuitBreaker."""
+
+    def __init__(self, breaker: CircuitBreaker, transport: httpx.BaseTransport, slow: float):
+        self.breaker = breaker
+        self.transport = transport
+        self.slow = slow
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        probe = self.breaker.before()
+        start = time.perf_counter()
+        try:
+            response = self.transport.handle_request(request)
+        except Exception:
+            self.breaker.after(probe, failed=True)
+            raise
+        # HEAD requests are count-only; exact counts are allowed to be slow
+        slow = request.method != "HEAD" and time.perf_counter() - start > self.slow
+        self.breaker.after(probe, failed=response.status_code >= 500 or slow)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+def supabase_http_client() -> httpx.Client:
+    """The HTTP client for the Supabase client's PostgREST calls, guarded by supabase_breaker."""
+    transport = BreakerTransport(supabase_breaker, httpx.HTTPTransport(http2=True), SUPABASE_BREAKER_SLOW_MS / 1000)
+    return httpx.Client(transport=transport, timeout=SUPABASE_TIMEOUT, follow_redirects=True)
@@ -1,3 +1,4 @@
+import re
 from math import ceil
 from typing import Iterable, List
 
@@ -25,3 +26,13 @@ def distinct_tags(df: pd.DataFrame, column: str = "tags") -> List[str]:
         if tag.strip()
     )
     return sorted(set(tags))
+
+
+def tag_pattern(tags: List[str]) -> str:
+    """
+    Regex matching a comma-separated tags cell that contains any of ``tags`` as a
+    whole tag ("smart" matches "smart, wireless" but not "smartwatch"). Written
+    in the subset shared by Python ``re`` and PostgreSQL regular expressions.
+    """
+    alternatives = "|".join(re.escape(tag.strip()) for tag in tags)
+    return rf"(?:^|,)\s*(?:{alternatives})\s*(?:,|$)"
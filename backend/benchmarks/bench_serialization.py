@@ -0,0 +1,82 @@
+"""
+CPU cost of turning one /api/sales page into response bytes.
+
+Compares the previous path (fillna + to_dict, SalesResponse validation,
+jsonable_encoder, stdlib json) with app.serialization (column-wise conversion
+encoded straight to bytes with orjson), for frame pages (CSV engine) and for
+row dicts as returned by Supabase.
+
+Run from backend/ next to the dataset CSV:
+
+    python -m benchmarks.bench_serialization [--repeat 200]
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from app.data_loader import load_data_from_csv
+from app.models import SalesResponse
+from app.serialization import frame_to_records, sales_response_body
+from app.utils import total_pages
+
+
+def previous_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    out = df.copy()
+    for column in out.columns:
+        series = out[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            out[column] = series.astype(object)
+        elif series.dtype == "float32":
+            out[column] = series.astype(str).astype("float64").astype(object)
+    return out.fillna("").to_dict(orient="records")
+
+
+def previous_encode(items: List[Dict[str, Any]], total: int, page_size: int) -> bytes:
+    # What FastAPI did with the returned SalesResponse: validate, encode, json.dumps
+    response = SalesResponse(
+        items=items, total=total, page=1, page_size=page_size, total_pages=total_pages(total, page_size)
+    )
+    content = jsonable_encoder(SalesResponse.model_validate(response.model_dump()))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def timed(func: Callable[[], Any], repeat: int) -> float:
+    """Median microseconds per call."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    df = load_data_from_csv()
+    rng = np.random.default_rng(0)
+    total = len(df)
+
+    print(f"{'payload':<22}{'previous us':>14}{'new us':>10}{'speedup':>10}")
+    for page_size in (10, 100):
+        page = df.take(rng.integers(0, total, page_size))
+        old = timed(lambda: previous_encode(previous_records(page), total, page_size), args.repeat)
+        new = timed(lambda: sales_response_body(frame_to_records(page), total, 1, page_size), args.repeat)
+        print(f"{f'frame, {page_size} rows':<22}{old:>14.0f}{new:>10.0f}{old / new:>9.1f}x")
+
+        # Supabase rows arrive as JSON-native dicts; only the encoding differs
+        rows = json.loads(sales_response_body(frame_to_records(page), total, 1, page_size))["items"]
+        old = timed(lambda: previous_encode(rows, total, page_size), args.repeat)
+        new = timed(lambda: sales_response_body(rows, total, 1, page_size), args.repeat)
+        print(f"{f'supabase, {page_size} rows':<22}{old:>14.0f}{new:>10.0f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
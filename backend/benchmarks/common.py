@@ -0,0 +1,95 @@
+"""Shared helpers for the benchmark scripts: timing summaries and result files."""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Query-mix profile shared by the micro-benchmarks and the load test:
+# (name, weight, /api/sales query parameters). Values exist in generate.py data.
+QUERY_MIX: List[Tuple[str, int, Dict[str, Any]]] = [
+    ("first_page", 30, {}),
+    ("region_gender", 15, {"region": ["North", "East"], "gender": ["Female"]}),
+    ("category_sorted", 10, {"product_category": ["Electronics"], "sort_by": "quantity", "order": "asc"}),
+    ("tag", 10, {"tag": ["wireless"], "page_size": 20}),
+    ("name_search", 10, {"customer_name": "priya"}),
+    ("phone_search", 5, {"phone": "987"}),
+    ("age_date_range", 10, {"age_min": 25, "age_max": 40, "date_from": "2023-01-01", "date_to": "2023-12-31"}),
+    ("deep_page", 5, {"payment_method": ["UPI", "Cash"], "sort_by": "customer_name", "page": 50}),
+    ("facets", 5, {"region": ["South"], "facets": True}),
+]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for samples given in seconds."""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def time_calls(func: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Peak resident set size of ``pid`` (default: this process) in MiB."""
+    if pid is None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def environment() -> Dict[str, Any]:
+    """Where and on what the results were produced, so runs can be compared."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def write_results(results: Dict[str, Any], out: Optional[str]) -> None:
+    """Print results as JSON, and also write them to ``out`` when given."""
+    text = json.dumps({"environment": environment(), **results}, indent=2)
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(out).write_text(text + "\n")
+    print(text)
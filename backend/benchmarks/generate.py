@@ -0,0 +1,171 @@
+"""
+Deterministic synthetic dataset shaped like truestate_assignment_dataset.csv.
+
+Same header (COLUMN_MAP order) and realistic cardinalities: a few values for
+region/gender/category/payment/status columns, hundreds of products and
+names, ~one customer per four rows, 1-4 of 15 tags per row and ~1% missing
+tags. Output for a given --rows/--seed is byte-identical across runs.
+Rows are generated and written in chunks, so 10M rows need little memory.
+
+    python -m benchmarks.generate --rows 1m --out data/sales_1m.csv
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.data_loader import COLUMN_MAP, DATE_FORMAT
+
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+CHUNK_ROWS = 500_000
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Aditya", "Amit", "Ananya", "Arjun", "Divya", "Harsh", "Isha", "Kabir",
+    "Karan", "Kavya", "Manish", "Meera", "Neha", "Nikhil", "Pooja", "Priya", "Rahul", "Riya",
+    "Rohan", "Sakshi", "Sanjay", "Shreya", "Siddharth", "Sneha", "Tanvi", "Varun", "Vikram", "Zoya",
+]
+LAST_NAMES = [
+    "Agarwal", "Bose", "Chopra", "Das", "Desai", "Gupta", "Iyer", "Jain", "Joshi", "Kapoor",
+    "Khan", "Kumar", "Mehta", "Menon", "Mishra", "Nair", "Patel", "Rao", "Reddy", "Saxena",
+    "Sharma", "Singh", "Verma", "Yadav",
+]
+REGIONS = (["North", "South", "East", "West", "Central"], [0.24, 0.22, 0.2, 0.2, 0.14])
+GENDERS = (["Female", "Male"], [0.51, 0.49])
+CUSTOMER_TYPES = (["New", "Returning", "Loyal"], [0.3, 0.45, 0.25])
+CATEGORIES = ["Beauty", "Clothing", "Electronics"]
+# Product names and a price range per category
+PRODUCTS = {
+    "Beauty": (["Lipstick", "Perfume", "Face Wash", "Foundation", "Moisturizer"], (5.0, 120.0)),
+    "Clothing": (["T-Shirt", "Jeans", "Jacket", "Kurta", "Sneakers"], (8.0, 250.0)),
+    "Electronics": (["Smartphone", "Headphones", "Smartwatch", "Laptop", "Speaker"], (20.0, 2500.0)),
+}
+BRANDS = ["Apex", "Bloom", "Crest", "Dyna", "Elara", "Fable", "Glint", "Halo", "Ivory", "Jade", "Kairo", "Lumen"]
+TAGS = [
+    "accessories", "beauty", "casual", "cotton", "fashion", "formal", "fragrance-free", "gadgets",
+    "makeup", "organic", "portable", "skincare", "smart", "unisex", "wireless",
+]
+PAYMENT_METHODS = (["UPI", "Credit Card", "Debit Card", "Cash", "Net Banking", "Wallet"], [0.3, 0.22, 0.18, 0.12, 0.1, 0.08])
+ORDER_STATUSES = (["Completed", "Pending", "Cancelled", "Returned"], [0.7, 0.12, 0.1, 0.08])
+DELIVERY_TYPES = (["Standard", "Express", "Store Pickup"], [0.6, 0.25, 0.15])
+STORES = [("ST001", "Mumbai"), ("ST002", "Delhi"), ("ST003", "Bengaluru"), ("ST004", "Chennai"),
+          ("ST005", "Kolkata"), ("ST006", "Hyderabad"), ("ST007", "Pune"), ("ST008", "Ahmedabad")]
+EMPLOYEES = ["Amit", "Anjali", "Deepak", "Farah", "Gaurav", "Lakshmi", "Mohan", "Nisha", "Ravi", "Sita"]
+FIRST_DAY = np.datetime64("2021-01-01")
+DAYS = 5 * 365
+
+
+def parse_rows(value: str) -> int:
+    return SIZES.get(value.lower()) or int(value.replace("_", ""))
+
+
+def _choice(rng: np.random.Generator, spec, n: int) -> np.ndarray:
+    values, weights = spec
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=weights)]
+
+
+def _tag_strings(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Each row gets a 15-bit tag set with 1-4 bits; sets are rendered once per distinct mask
+    counts = rng.integers(1, 5, n)
+    picks = rng.integers(0, len(TAGS), (n, 4))
+    masks = np.zeros(n, dtype=np.int64)
+    for k in range(4):
+        masks |= np.where(counts > k, 1 << picks[:, k], 0)
+    uniques, inverse = np.unique(masks, return_inverse=True)
+    rendered = np.asarray(
+        [",".join(tag for bit, tag in enumerate(TAGS) if mask >> bit & 1) for mask in uniques.tolist()],
+        dtype=object,
+    )
+    tags = rendered[inverse]
+    tags[rng.random(n) < 0.01] = None
+    return tags
+
+
+def generate_chunk(start: int, n: int, total: int, seed: int) -> pd.DataFrame:
+    """Rows ``start``..``start + n`` of a ``total``-row dataset; depends only on its arguments."""
+    rng = np.random.default_rng([seed, start])
+    customers = max(total // 4, 1)
+
+    customer = rng.integers(1, customers + 1, n)
+    # Names and phone numbers follow the customer, as in the source data
+    first = np.asarray(FIRST_NAMES, dtype=object)[customer % len(FIRST_NAMES)]
+    last = np.asarray(LAST_NAMES, dtype=object)[(customer // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    phone = 6_000_000_000 + (customer * 7_919_993) % 3_999_999_999
+
+    category_ids = rng.integers(0, len(CATEGORIES), n)
+    product_slot = rng.integers(0, 5, n)
+    product_names = np.empty(n, dtype=object)
+    prices = np.empty(n)
+    for i, category in enumerate(CATEGORIES):
+        names, (low, high) = PRODUCTS[category]
+        rows = category_ids == i
+        product_names[rows] = np.asarray(names, dtype=object)[product_slot[rows]]
+        prices[rows] = np.exp(rng.uniform(np.log(low), np.log(high), int(rows.sum())))
+    prices = prices.round(2)
+    quantity = rng.integers(1, 11, n)
+    discount = rng.choice([0, 0, 0, 5, 10, 15, 20, 25, 30, 40, 50], n)
+    total_amount = (prices * quantity).round(2)
+    final_amount = (total_amount * (1 - discount / 100)).round(2)
+
+    stores = rng.integers(0, len(STORES), n)
+    salesperson = rng.integers(1, 101, n)
+    dates = FIRST_DAY + rng.integers(0, DAYS, n).astype("timedelta64[D]")
+
+    columns = {
+        "transaction_id": np.arange(start + 1, start + n + 1),
+        "date": pd.to_datetime(dates).strftime(DATE_FORMAT),
+        "customer_id": pd.Series(customer).map("CUST-{:05d}".format),
+        "customer_name": first + " " + last,
+        "phone_number": phone.astype(str),
+        "gender": _choice(rng, GENDERS, n),
+        "age": rng.integers(18, 66, n),
+        "customer_region": _choice(rng, REGIONS, n),
+        "customer_type": _choice(rng, CUSTOMER_TYPES, n),
+        "product_id": pd.Series(category_ids * 200 + product_slot * 40 + rng.integers(0, 40, n)).map("PROD-{:04d}".format),
+        "product_name": product_names,
+        "brand": np.asarray(BRANDS, dtype=object)[rng.integers(0, len(BRANDS), n)],
+        "product_category": np.asarray(CATEGORIES, dtype=object)[category_ids],
+        "tags": _tag_strings(rng, n),
+        "quantity": quantity,
+        "price_per_unit": prices,
+        "discount_percentage": discount,
+        "total_amount": total_amount,
+        "final_amount": final_amount,
+        "payment_method": _choice(rng, PAYMENT_METHODS, n),
+        "order_status": _choice(rng, ORDER_STATUSES, n),
+        "delivery_type": _choice(rng, DELIVERY_TYPES, n),
+        "store_id": np.asarray([store for store, _ in STORES], dtype=object)[stores],
+        "store_location": np.asarray([city for _, city in STORES], dtype=object)[stores],
+        "salesperson_id": pd.Series(salesperson).map("EMP{:03d}".format),
+        "employee_name": np.asarray(EMPLOYEES, dtype=object)[salesperson % len(EMPLOYEES)],
+    }
+    frame = pd.DataFrame({name: np.asarray(values) for name, values in columns.items()})
+    # Raw CSV headers, in COLUMN_MAP order
+    headers = {column: raw for raw, column in COLUMN_MAP.items()}
+    return frame[[column for column in dict.fromkeys(COLUMN_MAP.values())]].rename(columns=headers)
+
+
+def write_dataset(path: Path, rows: int, seed: int = 0) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as handle:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = generate_chunk(start, min(CHUNK_ROWS, rows - start), rows, seed)
+            chunk.to_csv(handle, index=False, header=start == 0)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic sales dataset CSV.")
+    parser.add_argument("--rows", default="100k", help="100k, 1m, 10m or a row count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="output CSV (default: benchmarks/data/sales_<rows>.csv)")
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    out = Path(args.out) if args.out else Path(__file__).parent / "data" / f"sales_{args.rows.lower()}.csv"
+    write_dataset(out, rows, args.seed)
+    print(f"Wrote {rows} rows to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+End-to-end load test of /api/sales and /api/meta.
+
+Starts the API under uvicorn against a dataset CSV, either on the in-memory
+CSV backend, the SQLite backend built from the CSV, or on the Supabase code
+path backed by benchmarks.postgrest_stub,
+then replays a deterministic, weighted QUERY_MIX (plus /api/meta calls) at a
+fixed concurrency. Reports per-class and overall p50/p95/p99 latency,
+throughput, errors, startup time and the server's peak RSS as JSON.
+
+    python -m benchmarks.load_test --backend csv --csv benchmarks/data/sales_1m.csv --out results/csv.json
+    python -m benchmarks.load_test --backend sqlite --csv benchmarks/data/sales_1m.csv
+    python -m benchmarks.load_test --backend supabase --csv benchmarks/data/sales_100k.csv
+    python -m benchmarks.load_test --url http://localhost:8000   # an already running server
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from .common import BACKEND_DIR, QUERY_MIX, peak_rss_mb, summarize, write_results
+
+# Relative weight of /api/meta among the QUERY_MIX weights
+META_WEIGHT = 10
+# Pages drawn for mix entries that don't pin one, so caches see more than one key per query
+RANDOM_PAGES = 5
+STARTUP_TIMEOUT = 600
+
+
+def build_schedule(requests: int, seed: int) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """The same (class, path, params) sequence for a given ``requests``/``seed``."""
+    rng = random.Random(seed)
+    classes = [(name, "/api/sales", query) for name, _, query in QUERY_MIX] + [("meta", "/api/meta", {})]
+    weights = [weight for _, weight, _ in QUERY_MIX] + [META_WEIGHT]
+    schedule = []
+    for name, path, query in rng.choices(classes, weights, k=requests):
+        params = {key: "true" if value is True else value for key, value in query.items()}
+        if path == "/api/sales" and "page" not in params:
+            params["page"] = rng.randint(1, RANDOM_PAGES)
+        schedule.append((name, path, params))
+    return schedule
+
+
+async def run_load(base_url: str, requests: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    schedule = iter(build_schedule(requests, seed))
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        for name, path, params in schedule:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[name].append(time.perf_counter() - start)
+            else:
+                errors[name] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    samples = [sample for values in latencies.values() for sample in values]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "errors": sum(errors.values()),
+        "latency": summarize(samples),
+        "by_class": {
+            name: {**summarize(latencies.get(name, [])), "errors": errors.get(name, 0)}
+            for name in sorted(set(latencies) | set(errors))
+        },
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url: str, process: subprocess.Popen) -> float:
+    """Seconds until ``url`` answers 200; fails if the process exits first."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < STARTUP_TIMEOUT:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=STARTUP_TIMEOUT).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {STARTUP_TIMEOUT}s")
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        for task in Path(f"/proc/{pid}/task").iterdir():
+            for child in (task / "children").read_text().split():
+                pids.extend(_process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def server_peak_rss_mb(pid: int) -> Optional[float]:
+    """Summed peak RSS of the server and its worker processes."""
+    peaks = [peak_rss_mb(process) for process in _process_tree(pid)]
+    peaks = [peak for peak in peaks if peak is not None]
+    return round(sum(peaks), 1) if peaks else None
+
+
+@contextmanager
+def _process(args: List[str], env: Dict[str, str]) -> Iterator[subprocess.Popen]:
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=subprocess.DEVNULL)
+    try:
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@contextmanager
+def _servers(args: argparse.Namespace, env: Dict[str, str]) -> Iterator[Tuple[str, subprocess.Popen]]:
+    """The API server (and, for --backend supabase, the PostgREST stand-in behind it)."""
+    port = _free_port()
+    uvicorn = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"]
+    if args.backend in ("csv", "sqlite"):
+        env.update(SUPABASE_URL="", SUPABASE_KEY="", SALES_BACKEND="memory" if args.backend == "csv" else "sqlite")
+        with _process(uvicorn, env) as server:
+            yield f"http://127.0.0.1:{port}", server
+        return
+
+    if not args.csv:
+        raise SystemExit("--backend supabase needs --csv for the stand-in to serve")
+    stub_port = _free_port()
+    stub = [
+        sys.executable, "-m", "benchmarks.postgrest_stub", "--csv", str(Path(args.csv).resolve()),
+        "--port", str(stub_port), "--latency-ms", str(args.stub_latency_ms),
+    ]
+    with _process(stub, {}) as stand_in:
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        _wait_for(f"{stub_url}/rest/v1/sales?limit=1", stand_in)
+        env.update(SUPABASE_URL=stub_url, SUPABASE_KEY="bench.bench.bench")
+        with _process(uvicorn, env) as server:
+            yield f"http://127.0.0.1:{port}", server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test /api/sales and /api/meta with a query mix.")
+    parser.add_argument("--backend", choices=["csv", "sqlite", "supabase"], default="csv")
+    parser.add_argument("--csv", help="dataset CSV (default: the app's dataset)")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true", help="disable response and row-id caches")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="added per PostgREST stand-in request")
+    parser.add_argument("--out", help="write JSON results here too")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"backend": args.backend, "dataset": args.csv, "seed": args.seed, "no_cache": args.no_cache}
+    if args.url:
+        results.update(backend="external", url=args.url)
+        results["load"] = asyncio.run(run_load(args.url, args.requests, args.concurrency, args.seed))
+        return write_results(results, args.out)
+
+    env = {"DATA_WATCH_INTERVAL": "0"}
+    if args.csv:
+        env["DATA_PATH"] = str(Path(args.csv).resolve())
+    if args.no_cache:
+        env.update(SALES_CACHE_MAX_ENTRIES="0", ROW_ID_CACHE_MAX_ENTRIES="0", SQLITE_COUNT_CACHE_ENTRIES="0")
+
+    with _servers(args, env) as (base_url, process):
+        # Health answers before any data is loaded; the first /api/sales pays for the load
+        started = time.perf_counter()
+        _wait_for(f"{base_url}/health", process)
+        _wait_for(f"{base_url}/api/sales", process)
+        results["startup_s"] = round(time.perf_counter() - started, 3)
+        results["load"] = asyncio.run(run_load(base_url, args.requests, args.concurrency, args.seed))
+        results["server_peak_rss_mb"] = server_peak_rss_mb(process.pid)
+    write_results(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmarks for the loader and the in-memory engine.
+
+Loader stages (CSV parse, snapshot write/read, engine build) are timed once
+per run; the query functions run every QUERY_MIX entry ``--repeat`` times.
+With ``--postgrest`` (e.g. a running benchmarks.postgrest_stub) query_supabase
+is timed against it as well.
+
+    python -m benchmarks.micro --csv benchmarks/data/sales_100k.csv --out results/micro.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import pandas as pd
+
+from app import utils
+from app.data_loader import find_data_path, read_csv_rows
+from app.engine import SalesEngine
+from app.models import SalesQuery
+from app.snapshot import read_snapshot, write_snapshot
+
+from .common import QUERY_MIX, peak_rss_mb, time_calls, write_results
+
+
+def _once(func):
+    start = time.perf_counter()
+    result = func()
+    return result, round((time.perf_counter() - start) * 1000, 3)
+
+
+def bench_loader(csv_path: Path) -> Tuple[Dict[str, Any], pd.DataFrame, SalesEngine]:
+    df, parse_ms = _once(lambda: read_csv_rows(csv_path))
+    # Snapshot round trip on a scratch copy, so the real snapshot is left alone
+    with tempfile.TemporaryDirectory() as scratch:
+        copy = Path(scratch) / csv_path.name
+        shutil.copyfile(csv_path, copy)
+        _, write_ms = _once(lambda: write_snapshot(df, copy))
+        _, read_ms = _once(lambda: read_snapshot(copy))
+    engine, engine_ms = _once(lambda: SalesEngine(df))
+    return {
+        "rows": len(df),
+        "csv_parse_ms": parse_ms,
+        "snapshot_write_ms": write_ms,
+        "snapshot_read_ms": read_ms,
+        "engine_build_ms": engine_ms,
+    }, df, engine
+
+
+def bench_engine(df: pd.DataFrame, engine: SalesEngine, repeat: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {
+        "distinct_values": time_calls(lambda: utils.distinct_values(df, "customer_region"), repeat),
+        "distinct_tags": time_calls(lambda: utils.distinct_tags(df), max(repeat // 10, 1)),
+        "engine.distinct_values": time_calls(lambda: engine.distinct_values("customer_region"), repeat),
+        "engine.tag_values": time_calls(engine.tag_values, repeat),
+    }
+    for name, _, query in QUERY_MIX:
+        params = SalesQuery(**query)
+        mask = engine.filter_mask(params)
+        results[name] = {
+            "engine.filter_mask": time_calls(lambda: engine.filter_mask(params), repeat),
+            # Sort and page over a precomputed mask
+            "engine.query_masked": time_calls(lambda: engine.query(params, mask), repeat),
+            "engine.query": time_calls(lambda: engine.query(params), repeat),
+        }
+        if params.facets:
+            results[name]["engine.facet_counts"] = time_calls(lambda: engine.facet_counts(params), repeat)
+    return results
+
+
+def bench_supabase(url: str, repeat: int) -> Dict[str, Any]:
+    # The client is created lazily from these on first use
+    os.environ["SUPABASE_URL"] = url
+    os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+    from app.repository_supabase import query_supabase
+
+    return {
+        name: time_calls(lambda: query_supabase(SalesQuery(**query)), repeat)
+        for name, _, query in QUERY_MIX
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark the loader and engine functions.")
+    parser.add_argument("--csv", help="dataset CSV (default: the app's dataset)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--postgrest", help="PostgREST base URL to also time query_supabase against")
+    parser.add_argument("--out", help="write JSON results here too")
+    args = parser.parse_args()
+
+    csv_path = Path(args.csv) if args.csv else find_data_path()
+    loader, df, engine = bench_loader(csv_path)
+    results: Dict[str, Any] = {"dataset": str(csv_path), "repeat": args.repeat, "loader": loader}
+    results["engine"] = bench_engine(df, engine, args.repeat)
+    if args.postgrest:
+        results["query_supabase"] = bench_supabase(args.postgrest, args.repeat)
+    results["peak_rss_mb"] = peak_rss_mb()
+    write_results(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
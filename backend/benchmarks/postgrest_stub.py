@@ -0,0 +1,258 @@
+"""
+Local PostgREST-compatible stand-in for Supabase, for load tests without a database.
+
+Serves the dataset CSV as the ``sales`` table at /rest/v1/sales, covering what
+the app's query builders send: eq/neq/gt/gte/lt/lte/in/like/ilike/match/imatch/
+is filters (with ``not.``), nested or=()/and() groups, select, order with
+nulls placement, limit/offset, HEAD and ``Prefer: count=...`` (answered in
+Content-Range), and inserts. There is no exec_sql function, so /rest/v1/rpc/*
+answers 404 and the app takes its non-RPC fallbacks.
+
+It scans rows in Python/numpy, so absolute numbers say nothing about Postgres;
+it is there to exercise the app's Supabase code path end to end.
+
+    python -m benchmarks.postgrest_stub --csv benchmarks/data/sales_100k.csv --port 54321
+"""
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from app.data_loader import read_csv_rows
+from app.serialization import JSON_DATE_FORMAT
+
+TABLE_PATH = "/rest/v1/sales"
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "and", "columns", "on_conflict"}
+
+
+def _split_top(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, escaped, start = [], 0, False, False, 0
+    for i, char in enumerate(text):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part for part in parts if part]
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+
+def _like_regex(pattern: str) -> str:
+    return "^" + ".*".join(re.escape(part) for part in re.split(r"[%*]", pattern)) + "$"
+
+
+class SalesTable:
+    """The sales table as plain columns: strings as objects, dates as ISO days, int64/float64 numbers."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = self._plain(df)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _plain(df: pd.DataFrame) -> pd.DataFrame:
+        columns = {}
+        for name in df.columns:
+            series = df[name]
+            if series.dtype.kind == "M":
+                series = series.dt.strftime(JSON_DATE_FORMAT).astype(object)
+            elif series.dtype == "float32":
+                # Shortest repr, as Postgres numeric would print it
+                series = series.astype(str).astype("float64")
+            elif series.dtype.kind in "biu":
+                series = series.astype("int64")
+            else:
+                series = series.astype(object)
+            columns[name] = series.reset_index(drop=True)
+        frame = pd.DataFrame(columns)
+        return frame.where(frame.notna(), None) if frame.isna().any().any() else frame
+
+    def insert(self, rows: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            added = self._plain(pd.DataFrame(rows, columns=self.df.columns))
+            self.df = pd.concat([self.df, added], ignore_index=True)
+
+    # -- filters ---------------------------------------------------------
+
+    def condition(self, df: pd.DataFrame, column: str, spec: str) -> np.ndarray:
+        negate = spec.startswith("not.")
+        if negate:
+            spec = spec[4:]
+        op, _, raw = spec.partition(".")
+        series = df[column]
+        numeric = series.dtype.kind in "iuf"
+
+        def typed(value: str) -> Any:
+            value = _unquote(value)
+            return float(value) if numeric else value
+
+        if op == "is":
+            mask = series.isna().to_numpy() if raw.lower() == "null" else (series == (raw.lower() == "true")).to_numpy()
+        elif op == "in":
+            values = [typed(value) for value in _split_top(raw.strip("()"))]
+            mask = series.isin(values).to_numpy()
+        elif op in ("like", "ilike", "match", "imatch"):
+            pattern = _like_regex(_unquote(raw)) if op.endswith("like") else _unquote(raw)
+            flags = re.IGNORECASE if op.startswith("i") else 0
+            mask = series.astype(str).str.contains(pattern, flags=flags, regex=True).to_numpy() & series.notna().to_numpy()
+        else:
+            value = typed(raw)
+            compare = {"eq": "__eq__", "neq": "__ne__", "gt": "__gt__", "gte": "__ge__", "lt": "__lt__", "lte": "__le__"}
+            if op not in compare:
+                raise ValueError(f"Unsupported operator {op!r}")
+            present = series.notna().to_numpy()
+            mask = np.zeros(len(series), dtype=bool)
+            mask[present] = getattr(series[present], compare[op])(value).to_numpy(dtype=bool)
+        return ~mask if negate else mask
+
+    def logic(self, df: pd.DataFrame, expression: str) -> np.ndarray:
+        """One or=()/and() member: ``col.op.value``, ``and(...)``, ``or(...)`` or their ``not.`` forms."""
+        negate = expression.startswith("not.")
+        body = expression[4:] if negate else expression
+        for name, combine in (("and(", np.logical_and), ("or(", np.logical_or)):
+            if body.startswith(name):
+                masks = [self.logic(df, part) for part in _split_top(body[len(name):-1])]
+                mask = combine.reduce(masks)
+                return ~mask if negate else mask
+        column, _, spec = expression.partition(".")
+        return self.condition(df, column, spec)
+
+    # -- reads -----------------------------------------------------------
+
+    def select(self, params: List[Tuple[str, str]]) -> Tuple[pd.DataFrame, int]:
+        df = self.df
+        mask = np.ones(len(df), dtype=bool)
+        for key, value in params:
+            if key in ("or", "and"):
+                mask &= self.logic(df, f"{key}{value}")
+            elif key not in RESERVED_PARAMS:
+                mask &= self.condition(df, key, value)
+        matched = np.flatnonzero(mask)
+
+        options = dict(params)
+        if options.get("order"):
+            matched = matched[self._order(df.iloc[matched], options["order"])]
+        offset = int(options.get("offset", 0))
+        limit = int(options["limit"]) if "limit" in options else len(matched)
+        page = df.iloc[matched[offset:offset + limit]]
+        select = options.get("select", "*")
+        if select != "*":
+            page = page[[column.strip() for column in select.split(",")]]
+        return page, len(matched)
+
+    @staticmethod
+    def _order(df: pd.DataFrame, order: str) -> np.ndarray:
+        keys = []
+        for term in order.split(","):
+            column, *modifiers = term.split(".")
+            descending = "desc" in modifiers
+            # Postgres puts nulls last ascending and first descending unless told otherwise
+            nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+            rank = df[column].rank(method="dense").to_numpy()
+            rank = np.where(np.isnan(rank), 0 if nulls_first != descending else len(rank) + 1, rank)
+            keys.append(-rank if descending else rank)
+        return np.lexsort(keys[::-1])
+
+
+class Handler(BaseHTTPRequestHandler):
+    table: SalesTable
+    latency: float = 0.0
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None, head: bool = False) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _error(self, status: int, message: str, code: str = "PGRST000") -> None:
+        self._send(status, orjson.dumps({"code": code, "message": message, "details": None, "hint": None}))
+
+    def _read(self, head: bool = False) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(self.path)
+        if url.path != TABLE_PATH:
+            return self._error(404, f"No route for {url.path}")
+        try:
+            page, total = self.table.select(parse_qsl(url.query, keep_blank_values=True))
+        except (KeyError, ValueError, re.error) as exc:
+            return self._error(400, str(exc))
+
+        offset = int(dict(parse_qsl(url.query)).get("offset", 0))
+        span = f"{offset}-{offset + len(page) - 1}" if len(page) else "*"
+        counted = "count=" in self.headers.get("Prefer", "")
+        headers = {"Content-Range": f"{span}/{total if counted else '*'}"}
+        records = page.astype(object).where(page.notna(), None).to_dict(orient="records")
+        self._send(200, orjson.dumps(records), headers, head=head)
+
+    def do_GET(self) -> None:
+        self._read()
+
+    def do_HEAD(self) -> None:
+        self._read(head=True)
+
+    def do_POST(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urlsplit(self.path).path
+        if path.startswith("/rest/v1/rpc/"):
+            return self._error(404, f"Could not find the function {path}", "PGRST202")
+        if path != TABLE_PATH:
+            return self._error(404, f"No route for {path}")
+        rows = orjson.loads(body)
+        rows = rows if isinstance(rows, list) else [rows]
+        self.table.insert(rows)
+        self._send(201, orjson.dumps(rows))
+
+
+def serve(csv_path: Path, host: str = "127.0.0.1", port: int = 54321, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Build the server; the caller runs ``serve_forever`` (possibly on a thread)."""
+    handler = type("SalesHandler", (Handler,), {"table": SalesTable(read_csv_rows(csv_path)), "latency": latency_ms / 1000})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a dataset CSV through a PostgREST-compatible API.")
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every request, to mimic a network hop")
+    args = parser.parse_args()
+
+    server = serve(Path(args.csv), args.host, args.port, args.latency_ms)
+    print(f"PostgREST stand-in on http://{args.host}:{server.server_port} (SUPABASE_KEY can be any a.b.c string)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import io
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app import data_loader
+from app.data_loader import read_csv_rows
+from app.engine import SalesEngine
+from app.main import app
+from app.routers import sales
+
+from .data import ROWS, make_csv
+
+
+@pytest.fixture(scope="session")
+def csv_text() -> str:
+    return make_csv(ROWS)
+
+
+@pytest.fixture(scope="session")
+def frame(csv_text) -> pd.DataFrame:
+    """The synthetic dataset as the loader normalizes it. Don't modify it."""
+    return read_csv_rows(io.StringIO(csv_text))
+
+
+@pytest.fixture(scope="session")
+def engine(frame) -> SalesEngine:
+    return SalesEngine(frame)
+
+
+@pytest.fixture
+def dataset(tmp_path, csv_text, monkeypatch) -> Path:
+    """The synthetic dataset written to a CSV that the app loads, with no engine loaded yet."""
+    path = tmp_path / "sales.csv"
+    path.write_text(csv_text)
+    monkeypatch.setattr(data_loader, "DATA_PATH", str(path))
+    monkeypatch.setattr(data_loader, "_engine", None)
+    monkeypatch.setenv("DATA_SNAPSHOT", "0")
+    data_loader.reset_loaded_data()
+    for cache in sales.response_caches.values():
+        cache.clear()
+    yield path
+    data_loader.reset_loaded_data()
+
+
+@pytest.fixture
+def client(dataset) -> TestClient:
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,35 @@
+import random
+
+HEADER = (
+    "Transaction ID,Date,Customer ID,Customer Name,Phone Number,Gender,Age,Customer Region,Customer Type,"
+    "Product ID,Product Name,Brand,Product Category,Tags,Quantity,Price per Unit,Discount Percentage,"
+    "Total Amount,Final Amount,Payment Method,Order Status,Delivery Type,Store ID,Store Location,"
+    "Salesperson ID,Employee Name"
+)
+NAMES = ["Rohan Das", "Anita Rao", "Karan Mehta", "Priya Nair", "Vikram Singh", "Neha Gupta"]
+REGIONS = ["North", "South", "East", "West", "Central"]
+GENDERS = ["Male", "Female"]
+CATEGORIES = ["Clothing", "Electronics", "Beauty"]
+TAGS = ["casual", "gadgets", "portable", "organic", "smart", "beauty"]
+PAYMENTS = ["Cash", "UPI", "Wallet", "Credit Card"]
+ROWS = 2000
+
+
+def make_rows(count: int, seed: int = 3, start: int = 1) -> str:
+    """``count`` dataset CSV rows (no header), with transaction ids from ``start``."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(start, start + count):
+        tags = ",".join(rng.sample(TAGS, rng.randint(1, 3)))
+        lines.append(
+            f"{i},2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},CUST-{i},{rng.choice(NAMES)},"
+            f"9{rng.randint(100000000, 999999999)},{rng.choice(GENDERS)},{rng.randint(18, 65)},"
+            f"{rng.choice(REGIONS)},Loyal,PROD-{i},Shirt,C,{rng.choice(CATEGORIES)},\"{tags}\","
+            f"{rng.randint(1, 5)},100.0,10,200.0,180.0,{rng.choice(PAYMENTS)},Completed,Standard,"
+            f"ST001,Mumbai,EMP001,Amit"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def make_csv(count: int, seed: int = 3) -> str:
+    return HEADER + "\n" + make_rows(count, seed)
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from app.models import AggregateQuery
+from app.rollups import aggregate_rows
+
+from .data import ROWS
+
+
+def reference(frame: pd.DataFrame, column: str) -> tuple:
+    """Per-group row counts and final_amount sums, straight from pandas."""
+    grouped = frame.groupby(column, observed=True)["final_amount"].agg(["count", "sum"])
+    counts = {str(key): int(count) for key, count in grouped["count"].items()}
+    return counts, {str(key): float(total) for key, total in grouped["sum"].items()}
+
+
+def by_group(rows: list, name: str) -> tuple:
+    return {row[name]: row["count"] for row in rows}, {row[name]: row["final_amount_sum"] for row in rows}
+
+
+def assert_groups(rows: list, name: str, expected: tuple) -> None:
+    counts, sums = by_group(rows, name)
+    assert counts == expected[0]
+    assert sums == pytest.approx(expected[1], abs=0.01)
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"product_category": ["Beauty"]},
+        {"date_from": "2023-04-01", "date_to": "2023-09-30"},
+    ],
+)
+def test_rollup_matches_rows(engine, filters):
+    params = AggregateQuery(group_by=["region", "month"], **filters)
+    rows, source = engine.aggregate(params)
+    assert source == "rollup"
+    assert rows == aggregate_rows(engine.df, engine.filter_mask(params), params.group_by)
+
+
+def test_row_filters_skip_the_rollup(engine, frame):
+    rows, source = engine.aggregate(AggregateQuery(group_by=["region"], gender=["Female"], age_min=40))
+    assert source == "rows"
+    expected = reference(frame[(frame["gender"] == "Female") & (frame["age"] >= 40)], "customer_region")
+    assert_groups(rows, "region", expected)
+
+
+def test_aggregate_endpoint(client, frame):
+    response = client.get("/api/sales/aggregate", params={"group_by": "category", "region": ["North", "South"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["group_by"] == ["category"] and body["source"] == "rollup"
+    expected = reference(frame[frame["customer_region"].isin(["North", "South"])], "product_category")
+    assert_groups(body["rows"], "category", expected)
+
+    totals = client.get("/api/sales/aggregate", params={"customer_name": "an"}).json()
+    assert totals["source"] == "rows"
+    assert totals["rows"][0]["count"] == int(frame["customer_name"].str.contains("an", case=False).sum())
+    assert client.get("/api/sales/aggregate").json()["rows"][0]["count"] == ROWS
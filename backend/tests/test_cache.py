@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app import cache
+from app.cache import QueryCache, estimate_size, filter_key, query_key
+from app.models import SalesQuery
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list:
+    """A controllable time.monotonic for the cache: set ``clock[0]`` to move time."""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_goes_first():
+    store = QueryCache(max_entries=3, max_bytes=10**6)
+    for key in "abc":
+        store.set(key, key, size=1)
+    assert store.get("a") == "a"
+    store.set("d", "d", size=1)
+    assert store.get("b") is None
+    assert [store.get(key) for key in "acd"] == ["a", "c", "d"]
+    assert store.stats() == {"entries": 3, "bytes": 3, "hits": 4, "misses": 1, "evictions": 1}
+
+
+def test_byte_budget():
+    store = QueryCache(max_entries=100, max_bytes=100)
+    store.set("a", "a", size=40)
+    store.set("b", "b", size=40)
+    store.set("c", "c", size=40)
+    assert store.get("a") is None
+    assert store.stats()["bytes"] == 80
+
+    # Replacing an entry frees its old size first
+    store.set("b", "B", size=10)
+    assert store.stats()["bytes"] == 50 and store.stats()["evictions"] == 1
+
+    # A value larger than the whole budget is not cached and evicts nothing
+    store.set("huge", "x", size=101)
+    assert store.get("huge") is None
+    assert store.stats()["entries"] == 2
+
+
+def test_ttl(clock):
+    store = QueryCache(ttl=30)
+    store.set("a", "a", size=1)
+    clock[0] += 29
+    assert store.get("a") == "a"
+    clock[0] += 2
+    assert store.get("a") is None
+    assert store.stats() == {"entries": 0, "bytes": 0, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_no_ttl_never_expires(clock):
+    store = QueryCache()
+    store.set("a", "a", size=1)
+    clock[0] += 10**9
+    assert store.get("a") == "a"
+
+
+@pytest.mark.parametrize("entries, size", [(0, 100), (10, 0)])
+def test_disabled(entries, size):
+    store = QueryCache(max_entries=entries, max_bytes=size)
+    assert not store.enabled
+    store.set("a", "a", size=0)
+    assert store.get("a") is None
+
+
+def test_clear_keeps_counters():
+    store = QueryCache()
+    store.set("a", "a", size=5)
+    store.get("a")
+    store.clear()
+    assert store.get("a") is None
+    assert store.stats() == {"entries": 0, "bytes": 0, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_concurrent_use_keeps_byte_count():
+    store = QueryCache(max_entries=50, max_bytes=10**6)
+
+    def work(offset):
+        for i in range(2000):
+            key = str((i * 7 + offset) % 120)
+            if store.get(key) is None:
+                store.set(key, key, size=len(key))
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = store.stats()
+    assert stats["entries"] <= 50
+    assert stats["bytes"] == sum(size for _, size, _ in store._entries.values())
+    assert stats["hits"] + stats["misses"] == 8000
+
+
+def test_estimate_size():
+    ids = np.arange(1000, dtype=np.int64)
+    assert estimate_size(ids) == 8000
+    assert estimate_size({"ids": ids}) > 8000
+    assert estimate_size([ids, ids]) > 16000
+
+
+def test_equivalent_queries_share_a_key():
+    first = SalesQuery(region=["South", "North", "North"], tag=["", "smart"], customer_name="")
+    second = SalesQuery(region=["North", "South"], tag=["smart"])
+    assert query_key(first) == query_key(second)
+    assert query_key(first) != query_key(second.model_copy(update={"page": 2}))
+    # The filter key ignores sort and paging
+    assert filter_key(second) == filter_key(second.model_copy(update={"page": 2, "sort_by": "quantity"}))
+    assert filter_key(second) != filter_key(second.model_copy(update={"gender": ["Male"]}))
@@ -0,0 +1,167 @@
+import pytest
+
+from app import circuit
+from app.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit.time, "monotonic", clock)
+    return clock
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    options = {"window": 10, "min_calls": 4, "error_rate": 0.5, "cooldown": 5}
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def call(cb: CircuitBreaker, failed: bool) -> None:
+    cb.after(cb.before(), failed)
+
+
+def trip(cb: CircuitBreaker) -> None:
+    for _ in range(cb.min_calls):
+        call(cb, True)
+    assert cb.state == OPEN
+
+
+def test_opens_once_enough_calls_fail(clock):
+    cb = breaker()
+    call(cb, True)
+    call(cb, True)
+    call(cb, True)
+    # Below min_calls nothing is decided yet
+    assert cb.state == CLOSED
+    call(cb, False)
+    assert cb.state == OPEN
+    assert cb.is_open()
+    with pytest.raises(CircuitOpenError):
+        cb.before()
+    assert cb.rejected == 1
+
+
+def test_stays_closed_below_error_rate(clock):
+    cb = breaker()
+    for failed in (True, False, False, False, True, False):
+        call(cb, failed)
+    assert cb.state == CLOSED
+    assert cb.stats()["failures"] == 2
+
+
+def test_old_calls_leave_the_window(clock):
+    cb = breaker()
+    for _ in range(3):
+        call(cb, True)
+    clock.now += 11
+    call(cb, True)
+    assert cb.state == CLOSED
+    assert cb.stats()["calls"] == 1
+
+
+def test_half_open_probe_success_closes(clock):
+    cb = breaker()
+    trip(cb)
+    clock.now += 4.9
+    assert cb.is_open()
+    clock.now += 0.1
+    assert not cb.is_open()
+    probe = cb.before()
+    assert probe is True
+    assert cb.state == HALF_OPEN
+    cb.after(probe, False)
+    assert cb.state == CLOSED
+    assert cb.transitions == {CLOSED: 1, HALF_OPEN: 1, OPEN: 1}
+    # Closed again with a clean slate
+    assert cb.before() is False
+    assert cb.stats()["calls"] == 0
+
+
+def test_half_open_probe_failure_reopens(clock):
+    cb = breaker()
+    trip(cb)
+    clock.now += 5
+    probe = cb.before()
+    cb.after(probe, True)
+    assert cb.state == OPEN
+    # The cooldown restarts from the failed probe
+    clock.now += 4
+    assert cb.is_open()
+    with pytest.raises(CircuitOpenError):
+        cb.before()
+    clock.now += 1
+    assert cb.before() is True
+    assert cb.transitions[OPEN] == 2
+
+
+def test_probe_slots(clock):
+    cb = breaker(probes=2)
+    trip(cb)
+    clock.now += 5
+    first = cb.before()
+    second = cb.before()
+    assert first is True and second is True
+    # Both slots taken
+    with pytest.raises(CircuitOpenError):
+        cb.before()
+    cb.after(first, False)
+    assert cb.state == HALF_OPEN
+    # A finished probe frees its slot, but one more success is enough to close
+    third = cb.before()
+    cb.after(second, False)
+    assert cb.state == CLOSED
+    # A probe finishing after the circuit closed changes nothing
+    cb.after(third, True)
+    assert cb.state == CLOSED
+    assert cb.stats()["calls"] == 0
+
+
+def test_probe_slot_freed_after_reopening(clock):
+    cb = breaker(probes=2)
+    trip(cb)
+    clock.now += 5
+    first = cb.before()
+    second = cb.before()
+    cb.after(first, True)
+    assert cb.state == OPEN
+    # The straggling probe is ignored and gives its slot back
+    cb.after(second, False)
+    assert cb.state == OPEN
+    clock.now += 5
+    assert cb.before() is True
+    assert cb.before() is True
+
+
+def test_calls_finishing_after_open_are_ignored(clock):
+    cb = breaker()
+    # Admitted while closed, finished only after the circuit opened
+    late = [cb.before() for _ in range(3)]
+    trip(cb)
+    for probe in late:
+        cb.after(probe, False)
+    assert cb.state == OPEN
+    assert cb.stats()["calls"] == 0
+    clock.now += 5
+    probe = cb.before()
+    # A late failure during half-open doesn't reopen the circuit either
+    cb.after(late[0], True)
+    assert cb.state == HALF_OPEN
+    cb.after(probe, False)
+    assert cb.state == CLOSED
+
+
+def test_disabled_with_zero_min_calls(clock):
+    cb = breaker(min_calls=0)
+    for _ in range(20):
+        call(cb, True)
+    assert cb.state == CLOSED
+    assert cb.before() is False
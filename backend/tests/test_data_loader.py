@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data_loader import (
+    CATEGORY_COLUMNS,
+    COLUMN_MAP,
+    FLOAT32_COLUMNS,
+    INTEGER_COLUMNS,
+    _memory_report,
+    read_csv_rows,
+)
+
+
+@pytest.fixture(scope="module")
+def plain(csv_text) -> pd.DataFrame:
+    """The dataset as plain read_csv gives it: object strings and 64-bit numbers."""
+    return pd.read_csv(io.StringIO(csv_text)).rename(columns=COLUMN_MAP)
+
+
+def test_compact_dtypes(frame):
+    for column in CATEGORY_COLUMNS:
+        assert isinstance(frame[column].dtype, pd.CategoricalDtype), column
+    assert {str(frame[column].dtype) for column in INTEGER_COLUMNS} == {"int8"}
+    assert {str(frame[column].dtype) for column in FLOAT32_COLUMNS} == {"float32"}
+    assert frame["date"].dtype.kind == "M"
+
+
+def test_values_survive_the_compact_schema(frame, plain):
+    for column in CATEGORY_COLUMNS + ["tags", "customer_name"]:
+        assert frame[column].astype(object).tolist() == plain[column].tolist(), column
+    for column in INTEGER_COLUMNS:
+        np.testing.assert_array_equal(frame[column].to_numpy(np.int64), plain[column].to_numpy())
+    for column in FLOAT32_COLUMNS:
+        np.testing.assert_allclose(frame[column].to_numpy(np.float64), plain[column].to_numpy(), rtol=1e-6)
+    assert frame["phone_number"].tolist() == plain["phone_number"].astype(str).tolist()
+    assert (frame["date"] == pd.to_datetime(plain["date"])).all()
+
+
+def edited(csv_text: str, **columns) -> pd.DataFrame:
+    """The first rows of the dataset with some raw CSV columns replaced, as the loader reads them."""
+    raw = pd.read_csv(io.StringIO(csv_text), dtype=str).head(4)
+    for column, values in columns.items():
+        raw[column] = values
+    return read_csv_rows(io.StringIO(raw.to_csv(index=False)))
+
+
+def test_integers_widen_only_as_far_as_needed(csv_text):
+    frame = edited(csv_text, Quantity=["1", "2", "3", "40000"], Age=["18", "300", "20", "21"])
+    assert frame["quantity"].dtype == np.int32
+    assert frame["age"].dtype == np.int16
+    assert frame["quantity"].tolist() == [1, 2, 3, 40000]
+
+
+def test_missing_or_fractional_integers_become_float32(csv_text):
+    frame = edited(csv_text, Age=["18", None, "20", "21"], Quantity=["1", "2.5", "3", "4"])
+    assert frame["age"].dtype == np.float32 and frame["quantity"].dtype == np.float32
+    assert frame["age"].isna().tolist() == [False, True, False, False]
+    assert frame["quantity"].tolist() == [1, 2.5, 3, 4]
+
+
+def test_phone_numbers_stay_strings(csv_text):
+    frame = edited(csv_text, **{"Phone Number": ["0987654321", None, "+91 98765", "9876543210"]})
+    # No numeric parsing: leading zeros and symbols survive, gaps are blank
+    assert frame["phone_number"].tolist() == ["0987654321", "", "+91 98765", "9876543210"]
+
+
+def test_dates_in_another_format_are_inferred(csv_text):
+    frame = edited(csv_text, Date=["03/15/2023", "04/01/2023", None, "12/31/2022"])
+    assert frame["date"].dt.strftime("%Y-%m-%d").tolist()[:2] == ["2023-03-15", "2023-04-01"]
+    assert frame["date"].isna().tolist() == [False, False, True, False]
+
+
+def test_memory_report(frame, plain):
+    used, baseline = _memory_report(frame)
+    assert used == frame.memory_usage(deep=True, index=False).sum()
+    assert used < plain.memory_usage(deep=True, index=False).sum()
+    assert used < baseline
@@ -0,0 +1,136 @@
+import io
+import random
+
+import pandas as pd
+import pytest
+
+from app.data_loader import read_csv_rows
+from app.engine import SalesEngine
+from app.models import SalesQuery
+
+from .data import CATEGORIES, GENDERS, NAMES, PAYMENTS, REGIONS, TAGS
+
+
+def reference(df: pd.DataFrame, params: SalesQuery) -> tuple:
+    """Filter, sort and page ``df`` the plain pandas way: the behavior SalesEngine must keep."""
+    keep = pd.Series(True, index=df.index)
+    if params.customer_name:
+        keep &= df["customer_name"].str.contains(params.customer_name, case=False, regex=False)
+    if params.phone:
+        keep &= df["phone_number"].astype(str).str.contains(params.phone, regex=False)
+    for field, column in (
+        ("region", "customer_region"),
+        ("gender", "gender"),
+        ("product_category", "product_category"),
+        ("payment_method", "payment_method"),
+    ):
+        if getattr(params, field):
+            keep &= df[column].isin(getattr(params, field))
+    if params.tag:
+        wanted = {tag.lower() for tag in params.tag}
+        keep &= df["tags"].map(lambda cell: bool(wanted & {tag.strip().lower() for tag in cell.split(",")}))
+    if params.age_min is not None:
+        keep &= df["age"] >= params.age_min
+    if params.age_max is not None:
+        keep &= df["age"] <= params.age_max
+    if params.date_from:
+        keep &= df["date"] >= pd.Timestamp(params.date_from)
+    if params.date_to:
+        keep &= df["date"] <= pd.Timestamp(params.date_to)
+
+    matched = df[keep.to_numpy()]
+    ordered = matched.sort_values(params.sort_by, ascending=params.order == "asc", kind="stable", na_position="last")
+    start = (params.page - 1) * params.page_size
+    return ordered.iloc[start:start + params.page_size], len(matched)
+
+
+def ids(frame: pd.DataFrame) -> list:
+    return [int(value) for value in frame["transaction_id"]]
+
+
+def assert_same(engine, frame, params: SalesQuery) -> None:
+    expected, expected_total = reference(frame, params)
+    page, total = engine.query(params)
+    assert total == expected_total
+    assert ids(page) == ids(expected)
+    assert page.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {},
+        {"tag": ["smart"]},
+        {"tag": ["Smart", "organic"], "region": ["West"]},
+        {"tag": ["smar"]},
+        {"age_min": 30},
+        {"age_max": 25, "sort_by": "quantity"},
+        {"age_min": 40, "age_max": 40, "order": "asc"},
+        {"age_min": 50, "age_max": 20},
+        {"date_from": "2023-06-01"},
+        {"date_to": "2023-02-15", "sort_by": "customer_name", "order": "asc"},
+        {"date_from": "2023-03-10", "date_to": "2023-03-20", "tag": ["beauty"]},
+        {"customer_name": "RAO", "page": 3, "page_size": 7},
+        {"phone": "123", "gender": ["Male"]},
+        {"product_category": ["Beauty", "Electronics"], "payment_method": ["Cash"], "page": 50, "page_size": 100},
+    ],
+)
+def test_matches_pandas(engine, frame, query):
+    assert_same(engine, frame, SalesQuery(**query))
+
+
+def test_random_queries_match_pandas(engine, frame):
+    rng = random.Random(11)
+    choices = {
+        "region": REGIONS,
+        "gender": GENDERS,
+        "product_category": CATEGORIES,
+        "payment_method": PAYMENTS,
+        "tag": TAGS,
+    }
+    for _ in range(60):
+        query = {}
+        for field, values in choices.items():
+            if rng.random() < 0.3:
+                query[field] = rng.sample(values, rng.randint(1, 2))
+        if rng.random() < 0.4:
+            query["age_min"] = rng.randint(18, 50)
+        if rng.random() < 0.3:
+            query["age_max"] = rng.randint(30, 70)
+        if rng.random() < 0.4:
+            query["date_from"] = f"2023-{rng.randint(1, 12):02d}-01"
+        if rng.random() < 0.3:
+            query["date_to"] = f"2023-{rng.randint(1, 12):02d}-28"
+        if rng.random() < 0.2:
+            query["customer_name"] = rng.choice(NAMES)[:rng.randint(2, 4)].lower()
+        query["sort_by"] = rng.choice(["date", "quantity", "customer_name"])
+        query["order"] = rng.choice(["asc", "desc"])
+        query["page"] = rng.randint(1, 4)
+        query["page_size"] = rng.choice([5, 10, 50])
+        assert_same(engine, frame, SalesQuery(**query))
+
+
+@pytest.fixture(scope="module")
+def gappy(csv_text):
+    """The dataset with missing ages, quantities, dates, names and tags scattered through it."""
+    raw = pd.read_csv(io.StringIO(csv_text))
+    for step, column in ((7, "Age"), (11, "Quantity"), (13, "Date"), (17, "Customer Name"), (5, "Tags")):
+        raw.loc[raw.index[::step], column] = None
+    frame = read_csv_rows(io.StringIO(raw.to_csv(index=False)))
+    return SalesEngine(frame), frame
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"order": "asc"},
+        {"sort_by": "quantity"},
+        {"sort_by": "quantity", "order": "asc", "page": 40, "page_size": 50},
+        {"sort_by": "customer_name", "order": "asc", "page": 39, "page_size": 50},
+        {"age_min": 30, "date_to": "2023-06-30"},
+        {"tag": ["casual"], "customer_name": "a"},
+    ],
+)
+def test_missing_values_match_pandas(gappy, query):
+    engine, frame = gappy
+    assert_same(engine, frame, SalesQuery(**query))
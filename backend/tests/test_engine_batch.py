@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.models import SalesQuery
+
+from .data import REGIONS, ROWS
+
+
+def _same_mask(a, b) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return np.array_equal(a, b)
+
+
+BATCHES = {
+    "overlapping": [
+        {"region": ["North", "South"], "age_min": 30},
+        {"region": ["North"], "age_min": 30, "tag": ["smart"]},
+        {"region": ["North", "East"], "age_min": 30, "gender": ["Female"]},
+    ],
+    "disjoint": [
+        {"region": ["North"], "date_from": "2023-03-01"},
+        {"region": ["South"], "date_from": "2023-03-01"},
+        {"region": ["West"], "payment_method": ["UPI"], "date_to": "2023-06-30"},
+    ],
+    "empty_result": [
+        {"age_min": 90, "region": ["North"]},
+        {"customer_name": "zzzz", "region": ["North"]},
+        {"region": ["Nowhere"]},
+    ],
+    "all_pass": [
+        {},
+        {"age_min": 0},
+        {"date_from": "2000-01-01", "region": REGIONS},
+    ],
+}
+
+
+@pytest.mark.parametrize("batch", sorted(BATCHES))
+def test_batch_masks_match_single_queries(engine, batch):
+    queries = [SalesQuery(facets=True, **q) for q in BATCHES[batch]]
+    # The same queries again without facets: their masks come without facet masks
+    queries += [SalesQuery(**q) for q in BATCHES[batch]]
+    for params, (mask, facet_masks) in zip(queries, engine.batch_masks(queries)):
+        assert _same_mask(mask, engine.filter_mask(params))
+        if params.facets:
+            assert engine.facet_counts(params, facet_masks) == engine.facet_counts(params)
+        else:
+            assert facet_masks is None
+
+
+def test_empty_and_all_pass_totals(engine):
+    queries = [SalesQuery(**q) for q in BATCHES["empty_result"] + BATCHES["all_pass"]]
+    for params, (mask, _) in zip(queries, engine.batch_masks(queries)):
+        _, total = engine.query(params, mask)
+        assert total == engine.query(params)[1]
+    assert [engine.query(q)[1] for q in queries[:3]] == [0, 0, 0]
+    assert all(engine.query(q)[1] == ROWS for q in queries[3:])
+
+
+def test_combined_filter_masks_match_filter_mask(engine):
+    for batch in BATCHES.values():
+        for q in batch:
+            params = SalesQuery(**q)
+            assert _same_mask(engine.combined_mask(engine.filter_masks(params)), engine.filter_mask(params))
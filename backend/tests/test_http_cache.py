@@ -0,0 +1,127 @@
+import gzip
+
+import pytest
+
+from app import serialization
+from app.cache import SALES_CACHE_CONTROL
+from app.routers import ingest as ingest_router
+from app.serialization import matched_etag, negotiate_encoding
+
+from .data import HEADER, make_rows
+
+IDENTITY = {"Accept-Encoding": "identity"}
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_revalidation_gives_304(client):
+    first = client.get("/api/sales", params={"region": "North"}, headers=IDENTITY)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == SALES_CACHE_CONTROL
+    assert "content-encoding" not in first.headers
+
+    again = client.get("/api/sales", params={"region": "North"}, headers={**IDENTITY, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert "Accept-Encoding" in again.headers["vary"]
+
+    other = client.get("/api/sales", params={"region": "South"}, headers={**IDENTITY, "If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+
+def test_gzip_body_has_its_own_etag(client):
+    plain = client.get("/api/sales", params={"page_size": 50}, headers=IDENTITY)
+    response = client.get("/api/sales", params={"page_size": 50}, headers=GZIP)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    # The client decodes it back to the same JSON
+    assert response.content == plain.content
+
+    # Either tag (and its weak form) stands for the same content
+    for tag in (response.headers["etag"], plain.headers["etag"], "W/" + response.headers["etag"]):
+        again = client.get("/api/sales", params={"page_size": 50}, headers={**GZIP, "If-None-Match": tag})
+        assert again.status_code == 304
+        assert again.headers["etag"] == tag.removeprefix("W/")
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get("/api/sales", params={"region": "Nowhere"}, headers=GZIP)
+    assert len(response.content) < serialization.COMPRESS_MIN_BYTES
+    assert "content-encoding" not in response.headers
+
+
+def test_compressed_copy_is_made_once(client, monkeypatch):
+    calls = []
+    compress = gzip.compress
+    monkeypatch.setattr(serialization.gzip, "compress", lambda *args, **kwargs: calls.append(1) or compress(*args, **kwargs))
+    for _ in range(3):
+        assert client.get("/api/sales", params={"page_size": 50}, headers=GZIP).status_code == 200
+    assert len(calls) == 1
+
+
+def test_etag_changes_with_the_data(client, monkeypatch):
+    etag = client.get("/api/sales", headers=IDENTITY).headers["etag"]
+    monkeypatch.setattr(ingest_router, "INGEST_TOKEN", "secret")
+    batch = (HEADER + "\n" + make_rows(1, seed=11, start=9000)).encode()
+    assert client.post("/api/ingest", content=batch, headers={"X-Ingest-Token": "secret"}).status_code == 200
+    response = client.get("/api/sales", headers={**IDENTITY, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_explain_is_not_cached(client):
+    response = client.get("/api/sales", params={"explain": True}, headers=IDENTITY)
+    assert response.headers["cache-control"] == "no-store"
+    again = client.get("/api/sales", params={"explain": True}, headers={**IDENTITY, "If-None-Match": '"anything"'})
+    assert again.status_code == 200
+
+
+def test_meta_revalidation(client):
+    etag = client.get("/api/meta", headers=IDENTITY).headers["etag"]
+    assert client.get("/api/meta", headers={**IDENTITY, "If-None-Match": etag}).status_code == 304
+
+
+@pytest.mark.parametrize(
+    "header, coding",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("GZIP;q=0.5", "gzip"),
+        ("gzip;q=0", None),
+        ("gzip;q=bogus", None),
+        ("deflate, *", "gzip"),
+        ("*;q=0, gzip", "gzip"),
+    ],
+)
+def test_negotiate_encoding_without_brotli(monkeypatch, header, coding):
+    monkeypatch.setattr(serialization, "brotli", None)
+    assert negotiate_encoding(header) == coding
+    assert negotiate_encoding(f"br, {header}" if header else "br") == coding
+
+
+@pytest.mark.skipif(serialization.brotli is None, reason="brotli is not installed")
+def test_negotiate_encoding_prefers_brotli():
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0") == "gzip"
+    assert negotiate_encoding("*") == "br"
+
+
+@pytest.mark.parametrize(
+    "header, matched",
+    [
+        (None, None),
+        ('"abc"', '"abc"'),
+        ('W/"abc"', '"abc"'),
+        ('"abc-gzip"', '"abc-gzip"'),
+        ('"abc-br"', '"abc-br"'),
+        ('"xyz", "abc"', '"abc"'),
+        ('"abcd"', None),
+        ('"abc-deflate"', None),
+        ("*", '"abc"'),
+    ],
+)
+def test_matched_etag(header, matched):
+    assert matched_etag(header, '"abc"') == matched
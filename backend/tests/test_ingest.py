@@ -0,0 +1,122 @@
+import pytest
+
+from app import data_loader, ingest
+from app.ingest import sync_with_source
+from app.routers import ingest as ingest_router
+from app.snapshot import read_snapshot, source_stamp
+
+from .data import HEADER, ROWS, make_rows
+
+TOKEN = "secret"
+
+
+@pytest.fixture
+def token(monkeypatch) -> dict:
+    monkeypatch.setattr(ingest_router, "INGEST_TOKEN", TOKEN)
+    return {"X-Ingest-Token": TOKEN}
+
+
+def batch(count: int, start: int) -> bytes:
+    return (HEADER + "\n" + make_rows(count, seed=11, start=start)).encode()
+
+
+def total(client, **params) -> int:
+    response = client.get("/api/sales", params=params)
+    assert response.status_code == 200
+    return response.json()["total"]
+
+
+def test_disabled_without_token(client):
+    assert client.post("/api/ingest", content=batch(1, 9000)).status_code == 404
+
+
+def test_rejects_wrong_token(client, token):
+    response = client.post("/api/ingest", content=batch(1, 9000), headers={"X-Ingest-Token": "nope"})
+    assert response.status_code == 401
+    assert total(client) == ROWS
+
+
+def test_appends_to_csv_and_engine(client, token, dataset):
+    assert total(client) == ROWS
+    response = client.post("/api/ingest", content=batch(5, 9000), headers=token)
+    assert response.status_code == 200
+    assert response.json() == {"rows": 5, "target": "csv", "total_rows": ROWS + 5}
+    # Cached responses from before the batch are not served
+    assert total(client) == ROWS + 5
+    assert dataset.read_text().endswith(make_rows(5, seed=11, start=9000))
+    assert data_loader.loaded_engine().source == source_stamp(dataset)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [b"", HEADER.encode() + b"\n", b"Wrong,Header\n1,2\n", batch(1, 9000).replace(b",Male,", b",Male,,")],
+)
+def test_malformed_batch(client, token, dataset, content):
+    before = dataset.read_bytes()
+    assert client.post("/api/ingest", content=content, headers=token).status_code == 400
+    assert dataset.read_bytes() == before
+    assert total(client) == ROWS
+
+
+def test_batch_after_file_without_trailing_newline(client, token, dataset):
+    dataset.write_bytes(dataset.read_bytes().rstrip(b"\n"))
+    data_loader.reset_loaded_data()
+    assert client.post("/api/ingest", content=batch(2, 9000), headers=token).status_code == 200
+    assert total(client) == ROWS + 2
+    # The last existing row and the first new one stay on separate lines
+    assert b"Amit\n9000," in dataset.read_bytes()
+
+
+def test_catches_up_with_external_appends(client, token, dataset):
+    assert total(client) == ROWS
+    with dataset.open("a") as csv:
+        csv.write(make_rows(3, seed=12, start=8000))
+    # The next batch folds in the other writer's rows before its own
+    response = client.post("/api/ingest", content=batch(2, 9000), headers=token)
+    assert response.json()["total_rows"] == ROWS + 5
+    assert total(client) == ROWS + 5
+
+
+def test_sync_leaves_partial_line_for_later(client, dataset):
+    assert total(client) == ROWS
+    line = make_rows(1, seed=12, start=8000)
+    with dataset.open("a") as csv:
+        csv.write(make_rows(2, seed=13, start=7000) + line[:20])
+    sync_with_source()
+    assert data_loader.loaded_engine().size == ROWS + 2
+    with dataset.open("a") as csv:
+        csv.write(line[20:])
+    sync_with_source()
+    assert data_loader.loaded_engine().size == ROWS + 3
+    assert data_loader.loaded_engine().source == source_stamp(dataset)
+
+
+def test_sync_reloads_rewritten_file(client, dataset):
+    assert total(client) == ROWS
+    dataset.write_text(HEADER + "\n" + make_rows(10))
+    sync_with_source()
+    assert data_loader.loaded_engine().size == 10
+    assert total(client) == 10
+
+
+def test_snapshot_written_after_ingest(client, token, dataset, monkeypatch):
+    monkeypatch.setenv("DATA_SNAPSHOT", "1")
+    assert total(client) == ROWS
+    assert client.post("/api/ingest", content=batch(4, 9000), headers=token).status_code == 200
+    # Wait for the snapshot writer to drain
+    ingest._snapshots.submit(lambda: None).result()
+    snapshot = read_snapshot(dataset)
+    assert snapshot is not None and len(snapshot) == ROWS + 4
+
+
+def test_stale_snapshot_write_is_skipped(dataset, frame, monkeypatch):
+    written = []
+    monkeypatch.setattr(ingest, "write_snapshot", lambda *args: written.append(args))
+    stamp = source_stamp(dataset)
+    with dataset.open("a") as csv:
+        csv.write(make_rows(1, start=9000))
+    # Queued for the CSV as it was: newer rows landed meanwhile, so it's dropped
+    ingest._write_snapshot(frame, dataset, stamp)
+    assert written == []
+    ingest._write_snapshot(frame, dataset, source_stamp(dataset))
+    assert len(written) == 1
@@ -0,0 +1,114 @@
+import base64
+import io
+import json
+
+import pytest
+
+from app.data_loader import iter_csv_chunks, read_csv_rows
+from app.engine import SalesEngine
+from app.models import SalesQuery
+from app.pagination import decode_cursor, encode_cursor
+from app.repository_sqlite import SqliteEngine
+
+from .data import make_rows
+
+# Transaction ids 1-300 appear twice: the CSV doesn't enforce uniqueness
+DUPLICATES = 300
+
+
+@pytest.fixture(scope="module", params=["memory", "sqlite"])
+def engine(request, tmp_path_factory, csv_text):
+    text = csv_text + make_rows(DUPLICATES, seed=5)
+    if request.param == "memory":
+        return SalesEngine(read_csv_rows(io.StringIO(text)))
+    path = tmp_path_factory.mktemp("keyset") / "sales.csv"
+    path.write_text(text)
+    return SqliteEngine.open(path, lambda: iter_csv_chunks(path, 500))
+
+
+def rows(frame) -> list:
+    """Row positions plus ids, since ids alone don't tell duplicates apart."""
+    return list(zip(frame.index.tolist(), frame["transaction_id"].tolist()))
+
+
+def walk(engine, params: SalesQuery) -> list:
+    seen = []
+    cursor = None
+    while True:
+        page, _, cursor = engine.query_keyset(params.model_copy(update={"cursor": cursor}))
+        seen += rows(page)
+        # A cursor that resumes too early would loop forever
+        assert len(seen) <= engine.size
+        if cursor is None:
+            return seen
+
+
+def offset_pages(engine, params: SalesQuery) -> list:
+    seen = []
+    page_number = 1
+    while True:
+        page, total = engine.query(params.model_copy(update={"page": page_number, "pagination": "offset"}))
+        seen += rows(page)
+        if page_number * params.page_size >= total:
+            return seen
+        page_number += 1
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {},
+        {"order": "asc"},
+        {"sort_by": "quantity"},
+        {"sort_by": "customer_name", "order": "asc", "region": ["North", "West"]},
+        {"tag": ["smart"], "age_min": 30},
+        {"region": ["Nowhere"]},
+    ],
+)
+def test_walk_visits_every_row_once(engine, query):
+    params = SalesQuery(pagination="cursor", page_size=37, **query)
+    seen = walk(engine, params)
+    assert len(set(seen)) == len(seen)
+    assert seen == offset_pages(engine, params)
+
+
+def test_total_rides_in_the_cursor(engine):
+    params = SalesQuery(pagination="cursor", page_size=10, region=["South"])
+    _, total, cursor = engine.query_keyset(params)
+    assert decode_cursor(cursor).total == total
+    _, carried, _ = engine.query_keyset(params.model_copy(update={"cursor": cursor}))
+    assert carried == total
+
+
+def after_first_match(engine, params: SalesQuery, transaction_id) -> list:
+    """The page following the first row with ``transaction_id`` in sort order."""
+    ordered = offset_pages(engine, params)
+    start = next(i for i, (_, tid) in enumerate(ordered) if tid == transaction_id) + 1
+    return ordered[start:start + params.page_size]
+
+
+def test_cursor_without_row_resumes_after_first_match(engine):
+    params = SalesQuery(pagination="cursor", page_size=10, sort_by="quantity")
+    _, _, cursor = engine.query_keyset(params)
+    # A cursor from before row positions were recorded: four fields
+    fields = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))[:4]
+    legacy = base64.urlsafe_b64encode(json.dumps(fields).encode()).decode().rstrip("=")
+    assert decode_cursor(legacy).row is None
+    page, _, _ = engine.query_keyset(params.model_copy(update={"cursor": legacy}))
+    assert rows(page) == after_first_match(engine, params, fields[1])
+
+
+def test_stale_row_falls_back_to_transaction_id(engine):
+    params = SalesQuery(pagination="cursor", page_size=10)
+    _, _, cursor = engine.query_keyset(params)
+    decoded = decode_cursor(cursor)
+    # The recorded position no longer holds that transaction (e.g. after a rewrite)
+    moved = encode_cursor(decoded.sort_value, decoded.transaction_id, decoded.total, row=decoded.row + 1)
+    page, _, _ = engine.query_keyset(params.model_copy(update={"cursor": moved}))
+    assert rows(page) == after_first_match(engine, params, decoded.transaction_id)
+
+
+@pytest.mark.parametrize("token", ["not-a-cursor", encode_cursor("2023-01-01", 10**9, None)])
+def test_invalid_cursor(engine, token):
+    with pytest.raises(ValueError):
+        engine.query_keyset(SalesQuery(pagination="cursor", cursor=token))
@@ -0,0 +1,36 @@
+import threading
+
+from app import metrics
+
+
+def test_server_timing_header(client):
+    response = client.get("/api/sales", params={"region": "North"})
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert "total;dur=" in timing and "filter" in timing
+
+
+def test_slow_request_profile_written_off_the_event_loop(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "PROFILE_SLOW_MS", 0.001)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path / "profiles"))
+    writers = []
+    write = metrics._write_profile
+
+    def recording_write(*args):
+        writers.append(threading.current_thread().name)
+        return write(*args)
+
+    def stop(samples):
+        stop_sampling(samples)
+        # However fast the request was, give it a stack to write
+        samples["get_sales (sales.py:1)"] += 1
+
+    stop_sampling = metrics._sampler.stop
+    monkeypatch.setattr(metrics, "_write_profile", recording_write)
+    monkeypatch.setattr(metrics._sampler, "stop", stop)
+    assert client.get("/api/sales", params={"tag": "smart"}).status_code == 200
+    # Wait for the writer to drain
+    metrics._profile_writer.submit(lambda: None).result()
+    assert writers and all(name.startswith("profile-writer") for name in writers)
+    profiles = list((tmp_path / "profiles").glob("*-GET-api_sales-*ms.folded"))
+    assert profiles
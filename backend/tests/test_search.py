@@ -0,0 +1,107 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data_loader import iter_csv_chunks, read_csv_rows
+from app.engine import NgramIndex, SalesEngine
+from app.models import SalesQuery
+from app.repository_sqlite import SqliteEngine
+
+# Names with wildcard and regex characters, case variants and gaps
+NAMES = [
+    "Rohan Das",
+    "ROHAN das",
+    "Anita Rao",
+    "100% Cotton_Co",
+    "1000 Cotton Co",
+    "a.b*c",
+    "O'Brien [Jr]",
+    "Ünal Şahin",
+    None,
+]
+NEEDLES = ["rohan", "ROHAN", "an", "a", "han d", "%", "0%", "_", "n_c", ".", "b*", "[jr]", "'", "ünal", "Şah", "zzz"]
+PHONES = ["9123456780", "9876543210", None, "9000012345"]
+PHONE_NEEDLES = ["9", "12", "345", "0000", "98765", "1234567890"]
+
+
+def text_csv(csv_text: str, rows: int) -> str:
+    raw = pd.read_csv(io.StringIO(csv_text), dtype={"Phone Number": str}).head(rows)
+    raw["Customer Name"] = [NAMES[row % len(NAMES)] for row in range(rows)]
+    raw["Phone Number"] = [PHONES[row % len(PHONES)] for row in range(rows)]
+    return raw.to_csv(index=False)
+
+
+def expected_rows(text: str, column: str, needle: str, case: bool) -> list:
+    values = pd.read_csv(io.StringIO(text), dtype=str)[column]
+    matched = values.str.contains(needle, case=case, regex=False, na=False)
+    return np.flatnonzero(matched.to_numpy()).tolist()
+
+
+@pytest.fixture(scope="module")
+def text(csv_text) -> str:
+    return text_csv(csv_text, len(NAMES) * len(PHONES) * 2)
+
+
+@pytest.fixture(scope="module", params=["memory", "appended", "sqlite"])
+def engine(request, tmp_path_factory, text):
+    if request.param == "memory":
+        return SalesEngine(read_csv_rows(io.StringIO(text)))
+    if request.param == "appended":
+        # Half the rows indexed up front, the rest through NgramIndex.extend
+        frame = read_csv_rows(io.StringIO(text))
+        half = len(frame) // 2
+        return SalesEngine(frame.iloc[:half].reset_index(drop=True)).append(frame.iloc[half:])
+    path = tmp_path_factory.mktemp("search") / "sales.csv"
+    path.write_text(text)
+    return SqliteEngine.open(path, lambda: iter_csv_chunks(path, 100))
+
+
+def matched_rows(engine, **query) -> list:
+    page, total = engine.query(SalesQuery(page_size=100, **query))
+    rows = sorted(page.index.tolist())
+    assert total == len(rows)
+    return rows
+
+
+@pytest.mark.parametrize("needle", NEEDLES)
+def test_name_search_is_case_insensitive_contains(engine, text, needle):
+    assert matched_rows(engine, customer_name=needle) == expected_rows(text, "Customer Name", needle, case=False)
+
+
+@pytest.mark.parametrize("needle", PHONE_NEEDLES)
+def test_phone_search_is_contains(engine, text, needle):
+    assert matched_rows(engine, phone=needle) == expected_rows(text, "Phone Number", needle, case=True)
+
+
+def test_search_combines_with_other_filters(engine, text):
+    region = pd.read_csv(io.StringIO(text))["Customer Region"].to_numpy()
+    expected = [
+        row for row in expected_rows(text, "Customer Name", "cotton", case=False) if region[row] in {"North", "East"}
+    ]
+    assert matched_rows(engine, customer_name="cotton", region=["North", "East"]) == expected
+
+
+@pytest.mark.parametrize("needle", NEEDLES)
+def test_index_matches_str_contains(needle):
+    series = pd.Series(NAMES * 3)
+    index = NgramIndex(series)
+    expected = series.str.contains(needle, case=False, regex=False, na=False).to_numpy()
+    np.testing.assert_array_equal(index.search(needle), expected)
+
+
+def test_extend_reuses_known_values():
+    index = NgramIndex(pd.Series(NAMES[:4]))
+    extended = index.extend(pd.Series([NAMES[1], "Neha Gupta", None, "neha"]))
+    # Only unseen values are added (missing ones as ""); the original index is left alone
+    assert extended.values == index.values + ["neha gupta", "", "neha"]
+    assert len(index.codes) == 4 and len(extended.codes) == 8
+    np.testing.assert_array_equal(extended.search("neha"), [False] * 5 + [True, False, True])
+    np.testing.assert_array_equal(index.search("neha"), [False] * 4)
+
+
+def test_case_sensitive_index():
+    index = NgramIndex(pd.Series(["Rohan", "rohan", "ROHAN"]), case_sensitive=True)
+    np.testing.assert_array_equal(index.search("Roh"), [True, False, False])
+    np.testing.assert_array_equal(index.search("oh"), [True, True, False])
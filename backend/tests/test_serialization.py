@@ -0,0 +1,72 @@
+import io
+import random
+
+import orjson
+import pandas as pd
+import pytest
+
+from app.data_loader import COLUMN_MAP, read_csv_rows
+from app.models import SalesResponse
+from app.serialization import frame_to_records, sales_response_body
+
+
+@pytest.fixture(scope="module")
+def gappy_csv(csv_text) -> str:
+    """The dataset with awkward two-decimal prices and gaps."""
+    raw = pd.read_csv(io.StringIO(csv_text))
+    rng = random.Random(7)
+    for column in ("Price per Unit", "Total Amount", "Final Amount"):
+        raw[column] = [round(rng.uniform(0, 5000), 2) for _ in range(len(raw))]
+    for step, column in ((7, "Age"), (11, "Final Amount"), (13, "Date"), (17, "Gender"), (19, "Phone Number")):
+        raw.loc[raw.index[::step], column] = None
+    # Whole numbers stay whole in the CSV, gaps or not
+    raw = raw.astype({"Age": "Int64", "Phone Number": "Int64"})
+    return raw.to_csv(index=False)
+
+
+def reference_records(text: str) -> list:
+    """What the API used to send: plain pandas rows with blanks for missing values, dates as days."""
+    frame = pd.read_csv(io.StringIO(text)).rename(columns=COLUMN_MAP)
+    frame["date"] = pd.to_datetime(frame["date"]).dt.strftime("%Y-%m-%d")
+    frame["phone_number"] = frame["phone_number"].map(lambda value: "" if pd.isna(value) else str(int(value)))
+    return orjson.loads(orjson.dumps(frame.astype(object).where(frame.notna(), "").to_dict(orient="records")))
+
+
+def test_records_match_plain_pandas(gappy_csv):
+    records = frame_to_records(read_csv_rows(io.StringIO(gappy_csv)))
+    assert records == reference_records(gappy_csv)
+    # Float32 columns keep their short form on the wire
+    assert b"00000" not in orjson.dumps(records)
+
+
+def test_records_of_a_page(gappy_csv):
+    frame = read_csv_rows(io.StringIO(gappy_csv))
+    rows = [5, 3, 1000, 7]
+    assert frame_to_records(frame.take(rows)) == [reference_records(gappy_csv)[row] for row in rows]
+    assert frame_to_records(frame.iloc[:0]) == []
+
+
+@pytest.mark.parametrize(
+    "total, page_size, cursor, facets",
+    [
+        (0, 10, None, None),
+        (95, 10, None, {"region": {"North": 40, "South": 55}}),
+        (100, 10, "abc", None),
+    ],
+)
+def test_body_matches_sales_response(total, page_size, cursor, facets):
+    items = [{"transaction_id": 1, "date": "2023-01-02", "age": 30, "final_amount": 12.5, "tags": ""}]
+    body = sales_response_body(
+        items=items, total=total, page=2, page_size=page_size, total_exact=False, next_cursor=cursor, facets=facets
+    )
+    expected = SalesResponse(
+        items=items,
+        total=total,
+        page=2,
+        page_size=page_size,
+        total_pages=-(-total // page_size),
+        total_exact=False,
+        next_cursor=cursor,
+        facets=facets,
+    )
+    assert orjson.loads(body) == expected.model_dump()
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from app import data_loader, snapshot
+from app.data_loader import load_data_from_csv, read_csv_rows
+from app.snapshot import MANIFEST_NAME, read_snapshot, snapshot_dir, source_stamp, write_snapshot
+
+from .data import make_rows
+
+
+@pytest.fixture
+def gappy(dataset) -> pd.DataFrame:
+    """The dataset CSV rewritten with gaps in numeric, date, category and text columns."""
+    raw = pd.read_csv(dataset)
+    for step, column in ((7, "Age"), (11, "Final Amount"), (13, "Date"), (17, "Gender"), (19, "Customer Name")):
+        raw.loc[raw.index[::step], column] = None
+    raw.astype({"Age": "Int64"}).to_csv(dataset, index=False)
+    return read_csv_rows(dataset)
+
+
+def test_round_trip(dataset, gappy):
+    write_snapshot(gappy, dataset)
+    loaded = read_snapshot(dataset)
+    assert loaded is not None
+    pd.testing.assert_frame_equal(loaded, gappy)
+    # Fixed-width columns come back memory-mapped, not copied
+    assert not loaded["quantity"].to_numpy().flags.writeable
+
+
+def test_stale_after_csv_changes(dataset, frame):
+    write_snapshot(frame, dataset)
+    assert read_snapshot(dataset) is not None
+    with dataset.open("a") as csv:
+        csv.write(make_rows(1, start=9000))
+    assert read_snapshot(dataset) is None
+
+
+def test_ignored_after_version_bump(dataset, frame, monkeypatch):
+    write_snapshot(frame, dataset)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+    assert read_snapshot(dataset) is None
+
+
+def test_stamp_recorded_is_the_one_given(dataset, frame):
+    stamp = source_stamp(dataset)
+    os.utime(dataset, ns=(stamp["mtime_ns"] + 10**9, stamp["mtime_ns"] + 10**9))
+    # The frame reflects the CSV as it was, not as it is now
+    write_snapshot(frame, dataset, stamp)
+    assert read_snapshot(dataset) is None
+    assert read_snapshot(dataset, stamp) is not None
+
+
+def test_swap_replaces_the_previous_snapshot(dataset, frame):
+    write_snapshot(frame, dataset)
+    first = snapshot_dir(dataset).resolve()
+    write_snapshot(frame.head(10), dataset)
+    assert snapshot_dir(dataset).is_symlink()
+    assert not first.exists()
+    assert len(read_snapshot(dataset)) == 10
+    leftovers = [path for path in dataset.parent.iterdir() if path.name.startswith(dataset.name + ".snapshot.")]
+    assert leftovers == [snapshot_dir(dataset).resolve()]
+
+
+def test_corrupt_manifest_is_ignored(dataset, frame):
+    write_snapshot(frame, dataset)
+    (snapshot_dir(dataset) / MANIFEST_NAME).write_text("{not json")
+    assert read_snapshot(dataset) is None
+
+
+def test_loader_writes_then_maps_the_snapshot(dataset, frame, monkeypatch):
+    monkeypatch.setenv("DATA_SNAPSHOT", "1")
+    parsed = load_data_from_csv()
+    manifest = json.loads((snapshot_dir(dataset) / MANIFEST_NAME).read_text())
+    assert manifest["source"] == source_stamp(dataset)
+
+    monkeypatch.setattr(data_loader, "read_csv_rows", lambda path: pytest.fail("CSV parsed again"))
+    mapped = load_data_from_csv()
+    pd.testing.assert_frame_equal(mapped, parsed)
+    pd.testing.assert_frame_equal(mapped, frame)
+    assert mapped.attrs["source"] == source_stamp(dataset)
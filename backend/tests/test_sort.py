@@ -0,0 +1,60 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data_loader import read_csv_rows
+from app.engine import SORT_COLUMNS, SalesEngine
+from app.models import SalesQuery
+
+from .data import make_rows
+
+ORDERS = [(column, ascending) for column in SORT_COLUMNS.values() for ascending in (True, False)]
+
+
+@pytest.fixture(scope="module")
+def gappy(csv_text) -> pd.DataFrame:
+    """The dataset with gaps in every sort column, plus names no other row has."""
+    raw = pd.read_csv(io.StringIO(csv_text + make_rows(200, seed=9, start=5000)))
+    raw.loc[raw.index[-100:], "Customer Name"] = [f"Zed {i % 7}" if i % 3 else f"Aaron {i % 5}" for i in range(100)]
+    for step, column in ((11, "Quantity"), (13, "Date"), (17, "Customer Name")):
+        raw.loc[raw.index[::step], column] = None
+    return read_csv_rows(io.StringIO(raw.to_csv(index=False)))
+
+
+def reference(frame: pd.DataFrame, column: str, ascending: bool) -> list:
+    """Row order of a stable pandas sort with missing values last."""
+    values = frame[column].astype(object) if isinstance(frame[column].dtype, pd.CategoricalDtype) else frame[column]
+    return values.sort_values(ascending=ascending, kind="stable", na_position="last").index.tolist()
+
+
+@pytest.mark.parametrize("column, ascending", ORDERS)
+def test_permutation_is_a_stable_sort(gappy, column, ascending):
+    engine = SalesEngine(gappy)
+    order = engine.orders[(column, ascending)]
+    assert order.dtype == np.int32
+    assert order.tolist() == reference(gappy, column, ascending)
+
+
+@pytest.mark.parametrize("split", [1, 1000, 2099])
+@pytest.mark.parametrize("column, ascending", ORDERS)
+def test_appended_order_matches_a_fresh_sort(gappy, column, ascending, split):
+    head = gappy.iloc[:split].reset_index(drop=True)
+    engine = SalesEngine(head).append(gappy.iloc[split:])
+    # Ties keep row order: existing rows before appended ones, as a full re-sort would
+    assert engine.orders[(column, ascending)].tolist() == reference(gappy, column, ascending)
+
+
+def test_repeated_appends(gappy):
+    engine = SalesEngine(gappy.iloc[:500].reset_index(drop=True))
+    for start in range(500, len(gappy), 400):
+        engine = engine.append(gappy.iloc[start:start + 400])
+    for column, ascending in ORDERS:
+        assert engine.orders[(column, ascending)].tolist() == reference(gappy, column, ascending)
+
+
+def test_unsorted_column_falls_back_to_row_order(gappy):
+    engine = SalesEngine(gappy.drop(columns=["quantity"]))
+    order = engine._order_for(SalesQuery(sort_by="quantity"))
+    assert order.tolist() == list(range(len(gappy)))
@@ -0,0 +1,141 @@
+import pytest
+
+from app import data_loader, repository_sqlite
+from app.data_loader import iter_csv_chunks
+from app.models import AggregateQuery, SalesQuery
+from app.repository_sqlite import SqliteEngine, database_path
+from app.routers import ingest as ingest_router
+from app.routers import sales
+
+from .data import HEADER, ROWS, make_rows
+
+QUERIES = [
+    {},
+    {"region": ["North", "East"], "sort_by": "quantity"},
+    {"tag": ["smart"], "gender": ["Female"], "order": "asc"},
+    {"age_min": 30, "age_max": 45, "sort_by": "customer_name", "order": "asc"},
+    {"date_from": "2023-03-01", "date_to": "2023-08-31", "payment_method": ["UPI", "Cash"]},
+    {"customer_name": "an", "product_category": ["Beauty"], "sort_by": "quantity", "order": "asc"},
+    {"phone": "99", "page": 2, "page_size": 5},
+    {"region": ["Nowhere"]},
+]
+
+
+@pytest.fixture(scope="module")
+def sqlite_engine(tmp_path_factory, csv_text) -> SqliteEngine:
+    path = tmp_path_factory.mktemp("sqlite") / "sales.csv"
+    path.write_text(csv_text)
+    # Several build chunks, so row ids have to carry across them
+    return SqliteEngine.open(path, lambda: iter_csv_chunks(path, 300))
+
+
+def ids(frame) -> list:
+    return [int(value) for value in frame["transaction_id"]]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_pages_match_memory(engine, sqlite_engine, query):
+    params = SalesQuery(**query)
+    expected, expected_total = engine.query(params)
+    page, total = sqlite_engine.query(params)
+    assert total == expected_total
+    assert ids(page) == ids(expected)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_facets_match_memory(engine, sqlite_engine, query):
+    params = SalesQuery(**query)
+    assert sqlite_engine.facet_counts(params) == engine.facet_counts(params)
+
+
+def walk(engine, params: SalesQuery) -> list:
+    seen = []
+    cursor = None
+    while True:
+        page, _, cursor = engine.query_keyset(params.model_copy(update={"cursor": cursor}))
+        seen += ids(page)
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("query", QUERIES[:6])
+def test_keyset_walk_matches_memory(engine, sqlite_engine, query):
+    params = SalesQuery(pagination="cursor", page_size=97, **{k: v for k, v in query.items() if k != "page"})
+    expected = walk(engine, params)
+    assert walk(sqlite_engine, params) == expected
+    assert len(expected) == engine.query(params)[1]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"group_by": ["region"]},
+        {"group_by": ["category", "month"], "date_from": "2023-02-01"},
+        {"group_by": ["payment_method"], "gender": ["Male"], "tag": ["organic"]},
+        {"group_by": ["week"], "customer_name": "ra"},
+    ],
+)
+def test_aggregates_match_memory(engine, sqlite_engine, query):
+    params = AggregateQuery(**query)
+    rows, _ = sqlite_engine.aggregate(params)
+    expected, _ = engine.aggregate(params)
+    assert rows == expected
+
+
+def use_sqlite(monkeypatch) -> None:
+    """Switch the app to SALES_BACKEND=sqlite, dropping the loaded engine and cached responses."""
+    monkeypatch.setattr(data_loader, "SALES_BACKEND", "sqlite")
+    monkeypatch.setattr(data_loader, "_engine", None)
+    for cache in sales.response_caches.values():
+        cache.clear()
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_api_matches_memory_backend(client, monkeypatch, query):
+    expected = client.get("/api/sales", params={**query, "facets": True}).json()
+    use_sqlite(monkeypatch)
+    assert client.get("/api/sales", params={**query, "facets": True}).json() == expected
+    assert isinstance(data_loader.loaded_engine(), SqliteEngine)
+
+
+def test_api_aggregate_and_export_match_memory_backend(client, monkeypatch):
+    params = {"group_by": ["region", "month"], "tag": ["smart"]}
+    aggregate = client.get("/api/sales/aggregate", params=params).json()
+    export = client.get("/api/sales/export", params={"region": ["South"], "sort_by": "quantity"}).text
+    use_sqlite(monkeypatch)
+    assert client.get("/api/sales/aggregate", params=params).json()["rows"] == aggregate["rows"]
+    assert client.get("/api/sales/export", params={"region": ["South"], "sort_by": "quantity"}).text == export
+
+
+def test_database_reused_until_csv_changes(dataset, monkeypatch):
+    use_sqlite(monkeypatch)
+    assert data_loader.load_engine().size == ROWS
+    built = database_path(dataset).stat().st_mtime_ns
+    build = repository_sqlite.build_database
+
+    # A restart opens the existing database
+    monkeypatch.setattr(data_loader, "_engine", None)
+    monkeypatch.setattr(repository_sqlite, "build_database", lambda *args: pytest.fail("database rebuilt"))
+    assert data_loader.load_engine().size == ROWS
+    assert database_path(dataset).stat().st_mtime_ns == built
+
+    # A rewritten CSV is stale against the database, which is rebuilt
+    monkeypatch.setattr(data_loader, "_engine", None)
+    monkeypatch.setattr(repository_sqlite, "build_database", build)
+    dataset.write_text(HEADER + "\n" + make_rows(10))
+    assert data_loader.load_engine().size == 10
+
+
+def test_api_ingest_appends_to_database(client, dataset, monkeypatch):
+    use_sqlite(monkeypatch)
+    monkeypatch.setattr(ingest_router, "INGEST_TOKEN", "secret")
+    assert client.get("/api/sales").json()["total"] == ROWS
+    batch = (HEADER + "\n" + make_rows(4, seed=11, start=9000)).encode()
+    response = client.post("/api/ingest", content=batch, headers={"X-Ingest-Token": "secret"})
+    assert response.json() == {"rows": 4, "target": "csv", "total_rows": ROWS + 4}
+    assert client.get("/api/sales", params={"sort_by": "date"}).json()["total"] == ROWS + 4
+
+    # The rows are in the database file, not just the handle: a restart sees them without a rebuild
+    monkeypatch.setattr(data_loader, "_engine", None)
+    monkeypatch.setattr(repository_sqlite, "build_database", lambda *args: pytest.fail("database rebuilt"))
+    assert data_loader.load_engine().size == ROWS + 4
@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+import pytest
+from supabase import ClientOptions, create_client
+
+from app import repository_supabase
+from app.models import SalesQuery
+from app.routers import sales
+
+from .data import ROWS
+
+
+def stub_client(handler):
+    """A Supabase client whose PostgREST calls are answered by ``handler``."""
+    options = ClientOptions(httpx_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    return create_client("http://supabase.test", "key", options=options)
+
+
+@pytest.fixture
+def gateway_page(monkeypatch):
+    """Supabase answering every call with an HTML page and status 200, as a misbehaving proxy would."""
+    client = stub_client(lambda request: httpx.Response(200, text="<html>gateway</html>", headers={"content-type": "text/html"}))
+    monkeypatch.setattr(repository_supabase, "get_supabase_client", lambda: client)
+    monkeypatch.setattr(sales, "get_supabase_client", lambda: client)
+    return client
+
+
+@pytest.mark.parametrize("pagination", ["offset", "cursor"])
+def test_non_list_payload_raises(gateway_page, pagination):
+    with pytest.raises(TypeError):
+        asyncio.run(repository_supabase.query_supabase_async(SalesQuery(pagination=pagination)))
+
+
+def test_non_list_payload_falls_back_to_csv(gateway_page, client):
+    response = client.get("/api/sales", params={"region": "North"})
+    assert response.status_code == 200
+    body = response.json()
+    assert isinstance(body["items"], list) and body["items"]
+    assert all(item["customer_region"] == "North" for item in body["items"])
+    # The bad payload is never cached as a Supabase answer
+    assert sales.response_caches["supabase"].stats()["entries"] == 0
+    assert client.get("/api/sales").json()["total"] == ROWS
+
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["O'Brien", "back\\slash", "\\'; DROP TABLE sales; --", "$v$", "a$v", "$v$ and $v1$", "trailing$", ""],
+)
+def test_sql_literal_is_verbatim(value):
+    literal = repository_supabase._sql_literal(value)
+    tag = literal[:literal.index("$", 1) + 1]
+    # A dollar-quoted constant ends at the first closing tag: it has to be the last one
+    assert literal == f"{tag}{value}{tag}"
+    assert literal.find(tag, len(tag)) == len(tag) + len(value)
+
+
+def test_sql_literal_refuses_nul():
+    with pytest.raises(ValueError):
+        repository_supabase._sql_literal("a\0b")
+
+
+def test_sql_where_quotes_user_input():
+    where = repository_supabase.sql_where(SalesQuery(customer_name="O'Brien\\", region=["North'--"], age_min=30))
+    assert where == "customer_name ILIKE $v$%O'Brien\\%$v$ AND customer_region IN ($v$North'--$v$) AND age >= 30"
@@ -0,0 +1,93 @@
+import io
+import re
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pandas as pd
+import pytest
+
+from app import repository_supabase
+from app.data_loader import iter_csv_chunks, read_csv_rows
+from app.engine import SalesEngine
+from app.models import SalesQuery
+from app.repository_sqlite import SqliteEngine
+from app.utils import tag_pattern
+
+from .test_supabase import stub_client
+
+# Cells that tell whole-tag matching from substring matching
+CELLS = [
+    "smart",
+    "smartwatch",
+    "Smart, wireless",
+    "organic,smart",
+    " smart ",
+    "casual,gadgets",
+    "un-smart,organic",
+    "",
+    "gadgets,portable,SMARTPHONE",
+    "a.b",
+    "axb",
+]
+QUERIES = [["smart"], ["SMART"], ["organic", "gadgets"], ["watch"], ["smartphone"], ["a.b"], ["wireless"]]
+
+
+def expected_rows(tags: list) -> list:
+    wanted = {tag.lower() for tag in tags}
+    return [
+        row for row in range(len(CELLS) * 20)
+        if wanted & {tag.strip().lower() for tag in CELLS[row % len(CELLS)].split(",")}
+    ]
+
+
+@pytest.fixture(scope="module", params=["memory", "sqlite"])
+def engine(request, tmp_path_factory, csv_text):
+    raw = pd.read_csv(io.StringIO(csv_text)).head(len(CELLS) * 20)
+    raw["Tags"] = [CELLS[row % len(CELLS)] for row in range(len(raw))]
+    text = raw.to_csv(index=False)
+    if request.param == "memory":
+        return SalesEngine(read_csv_rows(io.StringIO(text)))
+    path = tmp_path_factory.mktemp("tags") / "sales.csv"
+    path.write_text(text)
+    return SqliteEngine.open(path, lambda: iter_csv_chunks(path, 100))
+
+
+@pytest.mark.parametrize("tags", QUERIES)
+def test_whole_tag_match(engine, tags):
+    expected = expected_rows(tags)
+    page, total = engine.query(SalesQuery(tag=tags, page_size=100))
+    assert total == len(expected)
+    assert sorted(page.index.tolist()) == expected
+
+
+def test_tag_facets_count_whole_tags(engine):
+    expected = Counter(
+        tag.strip() for row in range(len(CELLS) * 20) for tag in CELLS[row % len(CELLS)].split(",") if tag.strip()
+    )
+    assert engine.facet_counts(SalesQuery())["tag"] == dict(expected)
+    # A tag filter narrows the other facets, not its own
+    assert engine.facet_counts(SalesQuery(tag=["smart"]))["tag"] == dict(expected)
+
+
+@pytest.mark.parametrize("tags", QUERIES)
+def test_postgrest_pattern_is_whole_tag(tags):
+    # PostgREST applies the pattern with ~* (case-insensitive); Python re agrees on this subset
+    pattern = re.compile(tag_pattern(tags), re.IGNORECASE)
+    matched = [row for row in range(len(CELLS) * 20) if pattern.search(CELLS[row % len(CELLS)])]
+    assert matched == expected_rows(tags)
+
+
+def test_postgrest_request_uses_the_pattern(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=[], headers={"content-range": "*/0"})
+
+    client = stub_client(handler)
+    monkeypatch.setattr(repository_supabase, "get_supabase_client", lambda: client)
+    repository_supabase.query_supabase(SalesQuery(tag=["smart", "a.b"]))
+    query = parse_qs(urlsplit(str(requests[0].url)).query)
+    assert query["tags"] == [f"imatch.{tag_pattern(['smart', 'a.b'])}"]
+    assert f"tags ~* $v${tag_pattern(['smart', 'a.b'])}$v$" in repository_supabase.sql_where(SalesQuery(tag=["smart", "a.b"]))
@@ -17,6 +17,8 @@ export interface SalesQueryParams {
   order?: SortOrder;
   page?: number;
   page_size?: number;
+  pagination?: "offset" | "cursor";
+  cursor?: string;
 }
 
 export interface SalesItem {
@@ -62,6 +64,9 @@ export interface SalesResponse {
   page: number;
   page_size: number;
   total_pages: number;
+  total_exact?: boolean;
+  next_cursor?: string | null;
+  facets?: Record<string, Record<string, number>> | null;
 }
 
 export interface MetaResponse {
@@ -70,4 +75,9 @@ export interface MetaResponse {
   product_categories: string[];
   tags: string[];
   payment_methods: string[];
+  counts?: Record<string, Record<string, number>> | null;
+  rows?: number | null;
+  age?: { min: number; max: number } | null;
+  date?: { min: string; max: string } | null;
+  version?: string | null;
 }